@@ -2,6 +2,10 @@
 ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP goes to Django; WebSocket connections are routed by
+``backend.pubsub.websocket_router`` (live club updates, see clubs.live).
+Serve it with an ASGI server, e.g. ``uvicorn backend.asgi:application``;
+``manage.py runserver`` only does so when daphne is installed.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -13,4 +17,17 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from .pubsub import websocket_router  # noqa: E402
+
+websocket_application = websocket_router(
+    [(r"/ws/clubs/(?P<club_id>[0-9]+)/", "clubs.live.club_socket")]
+)
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "websocket":
+        await websocket_application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -0,0 +1,43 @@
+"""
+DRF views whose handlers are coroutines.
+
+DRF dispatches synchronously. ``AsyncAPIView`` runs the same steps as
+``APIView.dispatch``: request parsing, authentication, permissions,
+throttling, content negotiation, exception handling and rendering. They
+surround an awaited handler, so a view that waits on something else (the
+password hashing pool of ``backend.hashing``) leaves the worker free
+meanwhile, and still answers with DRF's renderers and error shapes. The
+checks that may query the database run through ``sync_to_async``.
+"""
+
+import inspect
+
+from asgiref.sync import sync_to_async
+from rest_framework.views import APIView
+
+
+class AsyncAPIView(APIView):
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(
+                    self, request.method.lower(), self.http_method_not_allowed
+                )
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            # OPTIONS is answered by DRF's own synchronous handler.
+            if inspect.isawaitable(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
@@ -0,0 +1,190 @@
+"""
+JWT authentication that resolves the user without a query on most requests.
+
+Users are looked up in a small per-process LRU (``AUTH_USER_LOCAL_TTL``
+seconds), then in the Django cache (``AUTH_USER_CACHE_TTL``) when it is
+shared between processes, then in the database. Only ``AUTH_USER_FIELDS``
+and a fingerprint of the password hash are cached; the user is rebuilt
+with the other columns deferred. ``users.signals`` drops both entries
+whenever a user is saved or deleted, and again once the transaction
+commits, so profile edits, password changes and deactivation apply on the
+next request in this process and within ``AUTH_USER_LOCAL_TTL`` seconds in
+the others.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+# What authentication and permissions read from the request user, plus
+# the columns ``/api/me/`` returns so MeView serializes it as it is.
+AUTH_USER_FIELDS = (
+    "id",
+    "username",
+    "email",
+    "is_active",
+    "is_staff",
+    "is_superuser",
+    "is_admin",
+    "profile_image",
+    "profile_image_variants",
+    "updated_at",
+)
+
+
+class LocalLRU:
+    """Thread-safe LRU of ``key -> value`` entries expiring after ``ttl``."""
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl, size):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > size:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+local_users = LocalLRU()
+
+
+def user_key(user_id):
+    return f"auth-user:{user_id}"
+
+
+def load_user(user_id):
+    """``(AUTH_USER_FIELDS values, password fingerprint)``, or ``None``."""
+    row = (
+        get_user_model()
+        .objects.filter(**{api_settings.USER_ID_FIELD: user_id})
+        .values_list(*AUTH_USER_FIELDS, "password")
+        .first()
+    )
+    if row is None:
+        return None
+    *values, password = row
+    return values, get_md5_hash_password(password)
+
+
+def shared_cache():
+    # Not imported at the top: backend.cache imports DRF's views, which
+    # import the authentication classes of this module.
+    from .cache import cache_is_shared
+
+    return cache_is_shared()
+
+
+def get_cached_user(user_id):
+    """The user with ``USER_ID_FIELD == user_id``, or ``None``."""
+    key = user_key(user_id)
+    entry = local_users.get(key)
+    if entry is None:
+        shared = shared_cache()
+        entry = cache.get(key) if shared else None
+        if entry is None:
+            entry = load_user(user_id)
+            if entry is None:
+                return None
+            if shared:
+                cache.set(key, entry, settings.AUTH_USER_CACHE_TTL)
+        local_users.set(
+            key, entry, settings.AUTH_USER_LOCAL_TTL, settings.AUTH_USER_LOCAL_SIZE
+        )
+
+    # A new instance per request: views may modify and save it, and then
+    # only the loaded columns are written.
+    User = get_user_model()
+    values, fingerprint = entry
+    loaded = dict(zip(AUTH_USER_FIELDS, values))
+    user = User.from_db(
+        DEFAULT_DB_ALIAS,
+        list(loaded),
+        [
+            loaded[field.attname]
+            for field in User._meta.concrete_fields
+            if field.attname in loaded
+        ],
+    )
+    user.password_fingerprint = fingerprint
+    return user
+
+
+def password_fingerprint(user):
+    """What ``CHECK_REVOKE_TOKEN`` compares, without loading the hash."""
+    fingerprint = getattr(user, "password_fingerprint", None)
+    return fingerprint or get_md5_hash_password(user.password)
+
+
+def drop_users(user_ids):
+    keys = [user_key(user_id) for user_id in user_ids]
+    for key in keys:
+        local_users.delete(key)
+    if shared_cache():
+        cache.delete_many(keys)
+
+
+def invalidate_users(user_ids):
+    user_ids = list(user_ids)
+    drop_users(user_ids)
+    # Again after the commit: a request reading the old row meanwhile
+    # would have cached it.
+    transaction.on_commit(lambda: drop_users(user_ids))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(
+                _("Token contained no recognizable user identification")
+            ) from e
+
+        user = get_cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != password_fingerprint(user):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
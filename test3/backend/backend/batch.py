@@ -0,0 +1,179 @@
+"""
+Several GET requests in one round trip: ``POST /api/batch/``.
+
+Body: ``{"requests": ["/api/me/", "/api/clubs/me/liked-posts/?page_size=5"]}``.
+The access token is validated once; each path is then resolved against
+the URLconf and its view called directly with that user, skipping the
+middleware stack. Up to ``BATCH_CONCURRENCY`` sub-requests run at once on
+worker threads, each with its own database connection. The answer keeps
+the order of the request:
+
+    {"responses": [{"path": "/api/me/", "status": 200, "body": {...}}, ...]}
+
+Only GET is allowed, so sub-requests can't depend on each other and none
+of them needs the request body. A sub-request whose view raises is logged
+and answered with a 500 entry; the others are still returned.
+"""
+
+import asyncio
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.http import HttpRequest, HttpResponse, JsonResponse, QueryDict
+from django.urls import Resolver404, resolve
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework.exceptions import APIException
+
+from .authentication import CachedJWTAuthentication
+
+logger = logging.getLogger(__name__)
+
+# Request headers a sub-request must not inherit from the batch request.
+DROPPED_META = (
+    "CONTENT_LENGTH",
+    "CONTENT_TYPE",
+    "HTTP_IF_NONE_MATCH",
+    "HTTP_IF_MODIFIED_SINCE",
+    "HTTP_IF_MATCH",
+    "HTTP_IF_UNMODIFIED_SINCE",
+    "HTTP_RANGE",
+)
+
+
+def batch_error(message, status=400):
+    return JsonResponse({"detail": message}, status=status)
+
+
+def sub_request(parent, path, user, token):
+    path, _, query = path.partition("?")
+    request = HttpRequest()
+    request.method = "GET"
+    request.path = request.path_info = path
+    request.META = {
+        key: value for key, value in parent.META.items() if key not in DROPPED_META
+    }
+    request.META.update(
+        REQUEST_METHOD="GET",
+        PATH_INFO=path,
+        QUERY_STRING=query,
+        HTTP_ACCEPT="application/json",
+    )
+    request.GET = QueryDict(query)
+    if user is None:
+        # What AuthenticationMiddleware would have set.
+        request.user = AnonymousUser()
+    else:
+        # Picked up by DRF's Request: the token was validated by the batch.
+        request.user = request._force_auth_user = user
+        request._force_auth_token = token
+    return request
+
+
+def read_response(response):
+    """``(status, JSON bytes of the body)``; JSON bodies are kept as sent."""
+    if hasattr(response, "render"):
+        response.render()
+    if getattr(response, "streaming", False):
+        content = b"".join(response.streaming_content)
+    else:
+        content = response.content
+    if not content:
+        body = b"null"
+    elif response.get("Content-Type", "").startswith("application/json"):
+        body = content
+    else:
+        body = json.dumps(content.decode(response.charset or "utf-8", "replace"))
+        body = body.encode()
+    return response.status_code, body
+
+
+def call_view(match, request):
+    return read_response(match.func(request, *match.args, **match.kwargs))
+
+
+def call_view_threaded(match, request):
+    try:
+        return call_view(match, request)
+    finally:
+        # The worker thread opened its own connection.
+        connection.close()
+
+
+async def dispatch(parent, path, user, token, semaphore):
+    try:
+        return await dispatch_view(parent, path, user, token, semaphore)
+    except Exception:
+        logger.exception("Batch sub-request %s failed", path)
+        return 500, b'{"detail": "Internal server error."}'
+
+
+async def dispatch_view(parent, path, user, token, semaphore):
+    try:
+        match = resolve(path.partition("?")[0])
+    except Resolver404:
+        return 404, b'{"detail": "Not found."}'
+    if match.func is batch:
+        return 400, b'{"detail": "Batches can\'t be nested."}'
+
+    request = sub_request(parent, path, user, token)
+    request.resolver_match = match
+    async with semaphore:
+        if asyncio.iscoroutinefunction(match.func):
+            response = await match.func(request, *match.args, **match.kwargs)
+            return read_response(response)
+        if settings.BATCH_CONCURRENCY > 1:
+            run = sync_to_async(call_view_threaded, thread_sensitive=False)
+        else:
+            run = sync_to_async(call_view)
+        return await run(match, request)
+
+
+@csrf_exempt
+@require_POST
+async def batch(request):
+    try:
+        data = json.loads(request.body or b"{}")
+        paths = data["requests"]
+        if not isinstance(paths, list) or not all(
+            isinstance(path, str) for path in paths
+        ):
+            raise ValueError
+    except (ValueError, TypeError, KeyError):
+        return batch_error('Expected {"requests": ["/api/...", ...]}.')
+    if len(paths) > settings.BATCH_MAX_REQUESTS:
+        return batch_error(
+            f"At most {settings.BATCH_MAX_REQUESTS} requests per batch."
+        )
+    if not all(path.startswith("/api/") for path in paths):
+        return batch_error("Paths must start with /api/.")
+
+    try:
+        authenticated = await sync_to_async(CachedJWTAuthentication().authenticate)(
+            request
+        )
+    except APIException as exc:
+        return JsonResponse(
+            {"detail": str(exc.detail)} if isinstance(exc.detail, str) else exc.detail,
+            status=exc.status_code,
+        )
+    user, token = authenticated or (None, None)
+
+    semaphore = asyncio.Semaphore(settings.BATCH_CONCURRENCY)
+    results = await asyncio.gather(
+        *(dispatch(request, path, user, token, semaphore) for path in paths)
+    )
+    # The bodies are spliced in as rendered, not decoded and encoded again.
+    parts = [
+        b'{"path": %s, "status": %d, "body": %s}'
+        % (json.dumps(path).encode(), status, body)
+        for path, (status, body) in zip(paths, results)
+    ]
+    return HttpResponse(
+        b'{"responses": [' + b", ".join(parts) + b"]}",
+        content_type="application/json",
+    )
@@ -0,0 +1,128 @@
+import copy
+import hashlib
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+from .relations import linked_ids
+
+
+# Backends whose entries only the current process sees.
+PROCESS_LOCAL_BACKENDS = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+def get_cache():
+    return caches[settings.PAYLOAD_CACHE_ALIAS]
+
+
+def cache_is_shared(alias="default"):
+    """Whether the other worker processes see what is written to ``alias``."""
+    return settings.CACHES[alias]["BACKEND"] not in PROCESS_LOCAL_BACKENDS
+
+
+def version_key(scope):
+    return f"version:{scope}"
+
+
+def get_versions(scopes):
+    """Current version of every scope, creating the missing ones."""
+    cache = get_cache()
+    keys = [version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # A fresh timestamp never matches a payload cached under a
+            # version that was evicted earlier.
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_versions(*scopes):
+    """Invalidate every payload cached under ``scopes``."""
+    cache = get_cache()
+    for scope in set(scopes):
+        try:
+            cache.incr(version_key(scope))
+        except ValueError:
+            cache.set(version_key(scope), time.time_ns(), timeout=None)
+
+
+class CachedPayloadMixin:
+    """
+    Cache the serialized payload of a read view under versioned scopes.
+
+    The cache key holds the current version of each scope returned by
+    ``get_cache_scopes()``, so bumping a scope makes every payload built
+    from it unreachable; the stale entries then age out through the cache's
+    own TTL/LRU eviction. ``get_cache_variant()`` returns whatever else
+    besides the URL the payload depends on. ``personal_fields`` lists the
+    per-user flags as ``(container, flag, model label, m2m name)``: they are
+    stored as False and filled in on every hit with one lookup on the
+    through table.
+    """
+
+    cache_scopes = ()
+    personal_fields = ()
+
+    def get_cache_scopes(self):
+        return self.cache_scopes
+
+    def get_cache_variant(self):
+        return None
+
+    def cached_response(self, build):
+        scopes = list(self.get_cache_scopes())
+        versions = get_versions(scopes)
+        raw_key = (
+            f"{scopes}:{versions}:{self.get_cache_variant()}:"
+            f"{self.request.build_absolute_uri()}"
+        )
+        key = "payload:" + hashlib.md5(raw_key.encode()).hexdigest()
+
+        cache = get_cache()
+        data = cache.get(key)
+        if data is None:
+            response = build()
+            if response.status_code == 200:
+                cache.set(key, self.depersonalize(copy.deepcopy(response.data)))
+            return response
+
+        self.personalize(data)
+        return Response(data)
+
+    def personal_items(self, data, container):
+        if container is None:
+            return [data]
+        return data.get(container) or []
+
+    def depersonalize(self, data):
+        for container, flag, _, _ in self.personal_fields:
+            for item in self.personal_items(data, container):
+                if flag in item:
+                    item[flag] = False
+        return data
+
+    def personalize(self, data):
+        user = self.request.user
+        if not user.is_authenticated:
+            return data
+        for container, flag, label, m2m_name in self.personal_fields:
+            # Left out by ?fields= or ?omit= (backend.sparse).
+            items = [
+                item for item in self.personal_items(data, container) if flag in item
+            ]
+            if not items:
+                continue
+            linked = linked_ids(
+                apps.get_model(label), m2m_name, user, [item["id"] for item in items]
+            )
+            for item in items:
+                item[flag] = item["id"] in linked
+        return data
@@ -0,0 +1,134 @@
+"""
+Brotli or gzip compression of API responses.
+
+Bodies of at least ``COMPRESS_MIN_SIZE`` bytes are compressed with brotli
+when the client accepts it and the ``brotli`` package is installed, with
+gzip otherwise. Only the types listed in ``COMPRESSIBLE_TYPES`` are
+touched. Files are never compressed, text ones included: ``FileResponse``
+keeps its file for the server's sendfile, and ``backend.media`` answers
+ranges and ETags of the bytes on disk (``Accept-Ranges``). Streamed
+responses, such as the calendar feeds, are compressed chunk by chunk
+whatever their size; async streams, served under ASGI, stay async.
+"""
+
+from django.conf import settings
+from django.http import FileResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "application/msgpack", "text/")
+
+# Random bytes in the gzip header, against BREACH-style length probing;
+# the same as Django's GZipMiddleware.
+GZIP_RANDOM_BYTES = 100
+
+
+def accepted_encodings(header):
+    """Codings of an Accept-Encoding header, without those refused with q=0."""
+    codings = set()
+    for item in header.split(","):
+        coding, _, params = item.partition(";")
+        name, _, value = params.partition("=")
+        if name.strip().lower() == "q":
+            try:
+                if float(value) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if coding.strip():
+            codings.add(coding.strip().lower())
+    return codings
+
+
+def choose_encoding(header):
+    codings = accepted_encodings(header)
+    if brotli is not None and "br" in codings:
+        return "br"
+    if "gzip" in codings:
+        return "gzip"
+    return None
+
+
+def brotli_sequence(sequence):
+    compressor = brotli.Compressor(quality=settings.COMPRESS_BROTLI_QUALITY)
+    for chunk in sequence:
+        data = compressor.process(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def abrotli_sequence(sequence):
+    compressor = brotli.Compressor(quality=settings.COMPRESS_BROTLI_QUALITY)
+    async for chunk in sequence:
+        data = compressor.process(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def agzip_sequence(sequence):
+    # One gzip member per chunk, as Django's GZipMiddleware does.
+    async for chunk in sequence:
+        yield compress_string(chunk, max_random_bytes=GZIP_RANDOM_BYTES)
+
+
+def compress_body(content, encoding):
+    if encoding == "br":
+        return brotli.compress(content, quality=settings.COMPRESS_BROTLI_QUALITY)
+    return compress_string(content, max_random_bytes=GZIP_RANDOM_BYTES)
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    def process_response(self, request, response):
+        if response.has_header("Content-Encoding") or response.status_code == 206:
+            return response
+        if isinstance(response, FileResponse) or response.has_header("Accept-Ranges"):
+            return response
+        content_type = response.get("Content-Type", "")
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESS_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ["Accept-Encoding"])
+        encoding = choose_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if encoding is None:
+            return response
+
+        if response.streaming and response.is_async:
+            if encoding == "br":
+                content = abrotli_sequence(response.streaming_content)
+            else:
+                content = agzip_sequence(response.streaming_content)
+            response.streaming_content = content
+            del response.headers["Content-Length"]
+        elif response.streaming:
+            if encoding == "br":
+                content = brotli_sequence(response.streaming_content)
+            else:
+                content = compress_sequence(
+                    response.streaming_content, max_random_bytes=GZIP_RANDOM_BYTES
+                )
+            response.streaming_content = content
+            del response.headers["Content-Length"]
+        else:
+            compressed = compress_body(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers["Content-Length"] = str(len(compressed))
+
+        # The compressed body is another representation: a strong ETag
+        # becomes weak, which If-None-Match still matches.
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = encoding
+        return response
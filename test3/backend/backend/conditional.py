@@ -0,0 +1,50 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+class ConditionalGetMixin:
+    """
+    Answer GET with 304 Not Modified when the client's validators match.
+
+    Subclasses implement ``get_validators()`` returning ``(last_modified,
+    version)`` for the resource, computed without serializing it (at most
+    one small query), or ``None`` to skip the check. The ETag also covers
+    the request URL and the user, since the payload holds per-user flags,
+    and the negotiated media type (JSON or MessagePack).
+    ``version`` is anything else that must change the ETag, such as a row
+    count catching deletions; when it is set, If-Modified-Since alone is
+    not trusted and only If-None-Match can produce a 304.
+    """
+
+    def get_validators(self):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        validators = self.get_validators()
+        if validators is None:
+            return super().get(request, *args, **kwargs)
+
+        last_modified, version = validators
+        media_type = getattr(request, "accepted_media_type", "")
+        raw = (
+            f"{request.get_full_path()}:{request.user.pk}:{media_type}:"
+            f"{last_modified}:{version}"
+        )
+        etag = quote_etag(hashlib.md5(raw.encode()).hexdigest())
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=timestamp if version is None else None,
+        )
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+            if timestamp is not None:
+                response["Last-Modified"] = http_date(timestamp)
+            patch_vary_headers(response, ["Authorization", "Accept"])
+        return response
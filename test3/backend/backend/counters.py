@@ -0,0 +1,102 @@
+from django.db.models import F, Func, IntegerField, OuterRef, Subquery
+from django.db.models.signals import m2m_changed, pre_delete
+from django.utils import timezone
+
+# (model, m2m field name, counter field name) for every tracked relation.
+TRACKED_COUNTERS = []
+
+
+def counter_changes(model, counter_name, value):
+    """
+    UPDATE keyword arguments that set ``counter_name`` to ``value``.
+
+    ``updated_at`` moves with the counter, so it stays usable as the
+    conditional-GET validator of the row.
+    """
+    changes = {counter_name: value}
+    if any(field.name == "updated_at" for field in model._meta.concrete_fields):
+        changes["updated_at"] = timezone.now()
+    return changes
+
+
+def track_m2m_counter(model, m2m_name, counter_name):
+    """
+    Keep ``model.<counter_name>`` equal to the number of rows of the
+    ``m2m_name`` relation.
+
+    The counter is moved with ``F()`` updates from ``m2m_changed`` so it is
+    changed in the same transaction as the through-table rows, from both
+    sides of the relation, and decremented when a related user is deleted.
+    """
+    field = model._meta.get_field(m2m_name)
+    through = field.remote_field.through
+    source = field.m2m_field_name()
+    target = field.m2m_reverse_field_name()
+    pending = f"_{model._meta.model_name}_{counter_name}_pending"
+
+    def adjust(queryset, delta):
+        if delta:
+            queryset.update(
+                **counter_changes(model, counter_name, F(counter_name) + delta)
+            )
+
+    def linked(**lookups):
+        return through.objects.filter(**lookups)
+
+    def on_change(sender, instance, action, reverse, pk_set, **kwargs):
+        if not reverse:
+            objects = model.objects.filter(pk=instance.pk)
+            if action == "post_add":
+                adjust(objects, len(pk_set))
+            elif action == "pre_remove":
+                removed = linked(**{source: instance.pk, f"{target}__in": pk_set})
+                setattr(instance, pending, removed.count())
+            elif action == "post_remove":
+                adjust(objects, -instance.__dict__.pop(pending, 0))
+            elif action == "post_clear":
+                objects.update(**counter_changes(model, counter_name, 0))
+            return
+
+        if action == "post_add":
+            adjust(model.objects.filter(pk__in=pk_set), 1)
+        elif action in ("pre_remove", "pre_clear"):
+            lookups = {target: instance.pk}
+            if action == "pre_remove":
+                lookups[f"{source}__in"] = pk_set
+            ids = list(linked(**lookups).values_list(f"{source}_id", flat=True))
+            setattr(instance, pending, ids)
+        elif action in ("post_remove", "post_clear"):
+            ids = instance.__dict__.pop(pending, [])
+            adjust(model.objects.filter(pk__in=ids), -1)
+
+    def on_target_delete(sender, instance, **kwargs):
+        # Cascading deletes of through rows don't send m2m_changed.
+        ids = linked(**{target: instance.pk}).values(f"{source}_id")
+        adjust(model.objects.filter(pk__in=ids), -1)
+
+    uid = f"{model._meta.label}.{counter_name}"
+    m2m_changed.connect(on_change, sender=through, weak=False, dispatch_uid=uid)
+    pre_delete.connect(
+        on_target_delete, sender=field.related_model, weak=False, dispatch_uid=uid
+    )
+    TRACKED_COUNTERS.append((model, m2m_name, counter_name))
+
+
+def actual_count(model, m2m_name):
+    """Subquery counting the ``m2m_name`` rows of the outer ``model`` row."""
+    field = model._meta.get_field(m2m_name)
+    through = field.remote_field.through
+    return Subquery(
+        through.objects.filter(**{field.m2m_field_name(): OuterRef("pk")})
+        .annotate(total=Func("pk", function="COUNT"))
+        .values("total"),
+        output_field=IntegerField(),
+    )
+
+
+def counter_for(model, m2m_name):
+    """Name of the counter field tracking ``model.<m2m_name>``."""
+    for tracked_model, tracked_m2m, counter_name in TRACKED_COUNTERS:
+        if tracked_model is model and tracked_m2m == m2m_name:
+            return counter_name
+    raise LookupError(f"{model._meta.label}.{m2m_name} has no tracked counter")
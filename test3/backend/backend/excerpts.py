@@ -0,0 +1,39 @@
+"""
+Short plain-text excerpts of long text fields, stored next to them.
+
+``track_excerpt`` fills the excerpt field from ``pre_save``, so list
+screens can show two lines of a post or a description without loading
+the full text (see ``backend.sparse``). Like ``updated_at``, the excerpt
+is only written by ``save(update_fields=...)`` when listed there next to
+its source. Bulk writes bypass the signal: they call ``make_excerpt``
+themselves, and ``manage.py fill_excerpts`` backfills existing rows.
+"""
+
+import re
+
+from django.conf import settings
+from django.db.models.signals import pre_save
+
+# (model, source field name, excerpt field name) for every tracked excerpt.
+TRACKED_EXCERPTS = []
+
+
+def make_excerpt(text, length=None):
+    """``text`` on one line, cut at a word boundary to at most ``length``."""
+    length = length or settings.EXCERPT_LENGTH
+    text = re.sub(r"\s+", " ", text or "").strip()
+    if len(text) <= length:
+        return text
+    cut = text[: length - 1]
+    if " " in cut:
+        cut = cut.rsplit(" ", 1)[0]
+    return cut.rstrip(" .,;:!?") + "…"
+
+
+def track_excerpt(model, source, target="excerpt"):
+    def on_save(sender, instance, update_fields=None, **kwargs):
+        if update_fields is None or source in update_fields:
+            setattr(instance, target, make_excerpt(getattr(instance, source)))
+
+    pre_save.connect(on_save, sender=model, weak=False)
+    TRACKED_EXCERPTS.append((model, source, target))
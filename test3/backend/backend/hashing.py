@@ -0,0 +1,132 @@
+"""
+Password hashing off the request path, with bounded concurrency.
+
+PBKDF2 holds a CPU for tens of milliseconds and releases the GIL, so a
+burst of logins run directly on the workers starves every other endpoint.
+Hashing jobs go to one process-wide pool of ``PASSWORD_HASHING_WORKERS``
+threads instead. At most ``PASSWORD_HASHING_QUEUE`` jobs may wait; beyond
+that ``HashingOverloaded`` is raised, which DRF answers with a 503 and
+``Retry-After`` so clients back off, from the admin views as well. The
+time each job waited for a thread is kept in ``stats`` and sent back in a
+``Server-Timing`` header.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from rest_framework.exceptions import APIException
+
+
+class HashingOverloaded(APIException):
+    status_code = 503
+    default_detail = "Too many sign-ins at the moment, retry shortly."
+    default_code = "hashing_overloaded"
+    # Sent as Retry-After by DRF's exception handler.
+    wait = 1
+
+
+class HashingStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.jobs = 0
+        self.rejected = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+    def record(self, wait_ms):
+        with self.lock:
+            self.jobs += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+    def reject(self):
+        with self.lock:
+            self.rejected += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "jobs": self.jobs,
+                "rejected": self.rejected,
+                "mean_wait_ms": self.total_wait_ms / self.jobs if self.jobs else 0.0,
+                "max_wait_ms": self.max_wait_ms,
+            }
+
+
+class HashingPool:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.executor = None
+        self.pending = 0
+
+    def submit(self, func, *args):
+        """Queue ``func(*args)``; the future resolves to ``(wait_ms, result)``."""
+        with self.lock:
+            if self.pending >= settings.PASSWORD_HASHING_WORKERS + settings.PASSWORD_HASHING_QUEUE:
+                stats.reject()
+                raise HashingOverloaded
+            self.pending += 1
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(
+                    max_workers=settings.PASSWORD_HASHING_WORKERS,
+                    thread_name_prefix="password-hashing",
+                )
+        queued = time.perf_counter()
+
+        def job():
+            wait_ms = (time.perf_counter() - queued) * 1000
+            try:
+                return wait_ms, func(*args)
+            finally:
+                with self.lock:
+                    self.pending -= 1
+                stats.record(wait_ms)
+
+        try:
+            return self.executor.submit(job)
+        except BaseException:
+            with self.lock:
+                self.pending -= 1
+            raise
+
+    async def run(self, func, *args):
+        return await asyncio.wrap_future(self.submit(func, *args))
+
+    def run_sync(self, func, *args):
+        return self.submit(func, *args).result()
+
+
+pool = HashingPool()
+stats = HashingStats()
+
+
+def verify(password, encoded):
+    """``(valid, must_rehash)``: rehash when the preferred hasher or its
+    work factor changed since ``encoded`` was made."""
+    rehash = []
+    valid = check_password(password, encoded, setter=lambda raw: rehash.append(True))
+    return valid, bool(rehash)
+
+
+async def averify_password(password, encoded):
+    """``(wait_ms, (valid, must_rehash))``."""
+    return await pool.run(verify, password, encoded)
+
+
+async def amake_password(password):
+    """``(wait_ms, encoded)``."""
+    return await pool.run(make_password, password)
+
+
+def make_password_bounded(password):
+    """``make_password`` for sync views, through the same bounded pool."""
+    return pool.run_sync(make_password, password)[1]
+
+
+def server_timing(response, wait_ms):
+    response["Server-Timing"] = f"hash-wait;dur={wait_ms:.1f}"
+    return response
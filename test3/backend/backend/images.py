@@ -0,0 +1,191 @@
+"""
+Resized WebP variants of uploaded club and profile images.
+
+Uploads are stored as is. Once the saving transaction commits, a small
+thread pool renders one WebP per ``IMAGE_VARIANTS`` entry under
+``variants/`` and records their storage names in the model's JSON variants
+field; until then the field is empty and clients use the original. When an
+image is replaced or cleared, the files of its previous variants are deleted
+after commit, and a worker still rendering the old image deletes the files
+it wrote instead of recording them.
+Serializers expose the variants with ``ImageVariantsField``.
+"""
+
+import io
+import logging
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from PIL import Image, ImageOps
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+# ``invalidate(pks)`` drops the cached payloads showing the image.
+ImageSpec = namedtuple("ImageSpec", ["image", "variants", "invalidate"], defaults=[None])
+
+IMAGE_FIELDS = {
+    "clubs.Club": ImageSpec("image", "image_variants", "clubs.cache.invalidate_clubs"),
+    "users.User": ImageSpec(
+        "profile_image",
+        "profile_image_variants",
+        "backend.authentication.invalidate_users",
+    ),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_VARIANT_WORKERS,
+                thread_name_prefix="image-variants",
+            )
+        return _executor
+
+
+def variant_name(name, variant):
+    root, _ = os.path.splitext(name)
+    return f"variants/{root}.{variant}.webp"
+
+
+def render_variants(field_file):
+    """Write every variant of ``field_file``; returns ``{variant: name}``."""
+    storage = field_file.storage
+    with storage.open(field_file.name, "rb") as file:
+        image = Image.open(file)
+        image.load()
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if image.mode in ("LA", "P") else "RGB")
+
+    names = {}
+    for variant, size in settings.IMAGE_VARIANTS.items():
+        resized = image.copy()
+        resized.thumbnail(size, Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        resized.save(buffer, "WEBP", quality=settings.IMAGE_VARIANT_QUALITY)
+        name = variant_name(field_file.name, variant)
+        storage.delete(name)
+        names[variant] = storage.save(name, ContentFile(buffer.getvalue()))
+    return names
+
+
+def generate_variants(label, pk):
+    """Render the variants of the ``label`` row ``pk`` and store their names."""
+    model = apps.get_model(label)
+    spec = IMAGE_FIELDS[label]
+    instance = model.objects.filter(pk=pk).only(spec.image).first()
+    if instance is None:
+        return
+    field_file = getattr(instance, spec.image)
+    if not field_file:
+        return
+    try:
+        variants = render_variants(field_file)
+    except (OSError, Image.DecompressionBombError):
+        logger.warning("Cannot render variants of %s %s", label, pk, exc_info=True)
+        return
+
+    changes = {spec.variants: variants}
+    if any(field.name == "updated_at" for field in model._meta.concrete_fields):
+        changes["updated_at"] = timezone.now()
+    # Skip the write if the image was replaced while rendering.
+    updated = model.objects.filter(pk=pk, **{spec.image: field_file.name}).update(
+        **changes
+    )
+    if not updated:
+        delete_files(field_file.storage, variants.values())
+    elif spec.invalidate:
+        import_string(spec.invalidate)([pk])
+
+
+def run_in_worker(label, pk):
+    try:
+        generate_variants(label, pk)
+    except Exception:
+        logger.exception("Variant generation of %s %s failed", label, pk)
+    finally:
+        connection.close()
+
+
+def schedule_variants(instance):
+    """Generate the variants of ``instance`` once the transaction commits."""
+    label = instance._meta.label
+    pk = instance.pk
+
+    def submit():
+        if settings.IMAGE_VARIANT_WORKERS:
+            get_executor().submit(run_in_worker, label, pk)
+        else:
+            generate_variants(label, pk)
+
+    transaction.on_commit(submit)
+
+
+def delete_files(storage, names):
+    for name in names:
+        try:
+            storage.delete(name)
+        except OSError:
+            logger.warning("Cannot delete variant %s", name, exc_info=True)
+
+
+def delete_variants(storage, names):
+    """Delete the variant files ``names`` once the transaction commits."""
+    if names:
+        transaction.on_commit(lambda: delete_files(storage, names))
+
+
+def save_with_variants(serializer, **kwargs):
+    """
+    ``serializer.save(**kwargs)``; if the request changed the image, the
+    previous variants are dropped and new ones scheduled.
+    """
+    spec = IMAGE_FIELDS[serializer.Meta.model._meta.label]
+    changed = spec.image in serializer.validated_data
+    previous = {}
+    if changed:
+        if serializer.instance is not None:
+            previous = getattr(serializer.instance, spec.variants) or {}
+        kwargs[spec.variants] = {}
+    instance = serializer.save(**kwargs)
+    if previous:
+        storage = getattr(instance, spec.image).storage
+        delete_variants(storage, list(previous.values()))
+    if changed and getattr(instance, spec.image):
+        schedule_variants(instance)
+    return instance
+
+
+class ImageVariantsField(serializers.Field):
+    """``{variant: URL}`` of the generated variants of the row's image."""
+
+    def __init__(self, **kwargs):
+        kwargs["source"] = "*"
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        spec = IMAGE_FIELDS[instance._meta.label]
+        field_file = getattr(instance, spec.image)
+        if not field_file:
+            return {}
+        request = self.context.get("request")
+        urls = {}
+        for variant, name in (getattr(instance, spec.variants) or {}).items():
+            url = field_file.storage.url(name)
+            urls[variant] = request.build_absolute_uri(url) if request else url
+        return urls
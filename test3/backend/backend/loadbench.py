@@ -0,0 +1,321 @@
+"""
+Load benchmark: replay a weighted mix of API traffic at a fixed concurrency
+and report throughput and latency percentiles per route.
+
+Requests go over HTTP to a running server (``HttpTransport``) or straight
+into the ASGI application in-process (``AsgiTransport``). In-process, Django
+runs every sync view on the one thread of ``sync_to_async(thread_sensitive=
+True)``, so requests are served one at a time whatever the concurrency:
+its numbers are flagged ``serialized`` and only compare with each other.
+Throughput under concurrency needs a real server.
+
+Workers log in through the JWT login endpoint as the ``seed_load`` users,
+discover club and post ids through the API, ordered by their follower and
+like counters, then pick them with the same power law as the dataset so
+hot objects stay hot.
+"""
+
+import asyncio
+import http.client
+import json
+import random
+import time
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+from .synthetic import PowerLaw
+
+Route = namedtuple("Route", ["method", "path", "ids"])
+
+ROUTES = {
+    "club_list": Route("GET", "/api/clubs/", None),
+    "club_detail": Route("GET", "/api/clubs/{}/", "clubs"),
+    "post_list": Route("GET", "/api/clubs/{}/posts/", "clubs"),
+    "like_toggle": Route("POST", "/api/clubs/posts/{}/like/", "posts"),
+    "event_list": Route("GET", "/api/events/", None),
+    "feed": Route("GET", "/api/clubs/me/feed/", None),
+    "profile": Route("GET", "/api/me/", None),
+}
+
+DEFAULT_MIX = {
+    "club_list": 20,
+    "club_detail": 20,
+    "post_list": 20,
+    "like_toggle": 10,
+    "event_list": 15,
+    "feed": 10,
+    "profile": 5,
+}
+
+PERCENTILES = (50, 95, 99)
+
+
+def parse_mix(value):
+    """``"club_list=3,like_toggle=1"`` -> ``{"club_list": 3, "like_toggle": 1}``."""
+    mix = {}
+    for item in filter(None, value.split(",")):
+        name, _, weight = item.partition("=")
+        if name not in ROUTES:
+            raise ValueError(f"unknown route {name!r}, expected one of {list(ROUTES)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class AsgiTransport:
+    """Calls an ASGI application in-process, without a socket."""
+
+    # Sync views all run on one thread: no two requests overlap.
+    serialized = True
+
+    def __init__(self, application):
+        self.application = application
+
+    async def request(self, method, path, headers=None, body=b""):
+        path, _, query = path.partition("?")
+        headers = {**(headers or {}), "Content-Length": str(len(body))}
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": [
+                (b"host", b"testserver"),
+                *((k.lower().encode(), v.encode()) for k, v in headers.items()),
+            ],
+            "server": ("testserver", 80),
+            "client": ("127.0.0.1", 0),
+        }
+        messages = [{"type": "http.request", "body": body, "more_body": False}]
+        status, chunks = None, []
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            # Only reached once the response is sent; wait to be cancelled.
+            await asyncio.Future()
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.application(scope, receive, send)
+        return status, b"".join(chunks)
+
+
+class HttpTransport:
+    """Sends requests to a running server, one blocking connection per call
+    run in a thread, so ``--concurrency`` is the number of open sockets."""
+
+    serialized = False
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.https = parts.scheme == "https"
+        self.netloc = parts.netloc
+        self.prefix = parts.path.rstrip("/")
+
+    def send(self, method, path, headers, body):
+        cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        connection = cls(self.netloc, timeout=30)
+        try:
+            connection.request(method, self.prefix + path, body or None, headers or {})
+            response = connection.getresponse()
+            return response.status, response.read()
+        finally:
+            connection.close()
+
+    async def request(self, method, path, headers=None, body=b""):
+        return await asyncio.to_thread(self.send, method, path, headers, body)
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of sorted ``values``."""
+    if not values:
+        return None
+    rank = max(1, -(-p * len(values) // 100))
+    return values[int(rank) - 1]
+
+
+def summarize(samples, elapsed):
+    """Per-route and overall stats from ``(route, status, ms)`` samples."""
+    by_route = {}
+    for route, status, ms in samples:
+        by_route.setdefault(route, []).append((status, ms))
+    by_route["all"] = [(status, ms) for _, status, ms in samples]
+
+    routes = {}
+    for route, rows in by_route.items():
+        latencies = sorted(ms for _, ms in rows)
+        stats = {
+            "requests": len(rows),
+            "errors": sum(1 for status, _ in rows if status >= 400),
+            "rps": round(len(rows) / elapsed, 1) if elapsed else None,
+            "mean_ms": round(sum(latencies) / len(latencies), 2),
+        }
+        for p in PERCENTILES:
+            stats[f"p{p}_ms"] = round(percentile(latencies, p), 2)
+        routes[route] = stats
+    return routes
+
+
+class LoadBenchmark:
+    def __init__(
+        self,
+        transport,
+        usernames,
+        password,
+        mix=None,
+        concurrency=10,
+        requests=1000,
+        duration=None,
+        warmup=0,
+        seed=0,
+    ):
+        self.transport = transport
+        self.usernames = usernames
+        self.password = password
+        self.mix = mix or DEFAULT_MIX
+        self.concurrency = concurrency
+        self.requests = requests
+        self.duration = duration
+        self.warmup = warmup
+        self.rng = random.Random(seed)
+        self.ids = {}
+
+    async def call(self, method, path, token=None, data=None):
+        headers = {}
+        body = b""
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        if data is not None:
+            headers["Content-Type"] = "application/json"
+            body = json.dumps(data).encode()
+        return await self.transport.request(method, path, headers, body)
+
+    async def login(self, username):
+        status, body = await self.call(
+            "POST",
+            "/api/auth/login/",
+            data={"username": username, "password": self.password},
+        )
+        if status != 200:
+            raise RuntimeError(f"login as {username!r} failed with {status}: {body[:200]!r}")
+        return json.loads(body)["access"]
+
+    async def get_json(self, path, token):
+        status, body = await self.call("GET", path, token)
+        if status != 200:
+            raise RuntimeError(f"GET {path} failed with {status}")
+        return json.loads(body)
+
+    async def discover(self, token):
+        """Collect the ids the routes pick from, most popular first."""
+        clubs, url = [], "/api/clubs/?page_size=100&omit=description"
+        while url:
+            page = await self.get_json(url, token)
+            clubs += page["results"]
+            url = page["next"]
+            if url:
+                # The link is absolute; the transports take paths.
+                parts = urlsplit(url)
+                url = f"{parts.path}?{parts.query}"
+        clubs.sort(key=lambda club: (-club["followers_count"], club["id"]))
+        self.ids["clubs"] = [club["id"] for club in clubs]
+        posts = []
+        for club in self.ids["clubs"][:10]:
+            page = await self.get_json(
+                f"/api/clubs/{club}/posts/?page_size=100&omit=content", token
+            )
+            posts += page["results"]
+        posts.sort(key=lambda post: (-post["likes_count"], post["id"]))
+        self.ids["posts"] = [post["id"] for post in posts]
+        for name, ids in self.ids.items():
+            if not ids and any(
+                ROUTES[route].ids == name for route, weight in self.mix.items() if weight
+            ):
+                raise RuntimeError(f"no {name} found; seed the database first")
+        self.laws = {name: PowerLaw(self.rng, len(ids)) for name, ids in self.ids.items()}
+
+    def pick(self):
+        name = self.rng.choices(list(self.mix), weights=list(self.mix.values()))[0]
+        route = ROUTES[name]
+        path = route.path
+        if route.ids:
+            ids = self.ids[route.ids]
+            path = path.format(ids[self.laws[route.ids].draw()])
+        return name, route.method, path
+
+    async def worker(self, token, budget, samples):
+        while budget["left"] > 0 and time.perf_counter() < budget["deadline"]:
+            budget["left"] -= 1
+            name, method, path = self.pick()
+            start = time.perf_counter()
+            status, _ = await self.call(method, path, token)
+            samples.append((name, status, (time.perf_counter() - start) * 1000))
+
+    async def phase(self, tokens, requests, duration):
+        samples = []
+        budget = {
+            "left": requests if requests else float("inf"),
+            "deadline": time.perf_counter() + duration if duration else float("inf"),
+        }
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(
+                self.worker(tokens[i % len(tokens)], budget, samples)
+                for i in range(self.concurrency)
+            )
+        )
+        return samples, time.perf_counter() - start
+
+    async def run(self):
+        tokens = [await self.login(username) for username in self.usernames]
+        await self.discover(tokens[0])
+        if self.warmup:
+            await self.phase(tokens, self.warmup, None)
+        samples, elapsed = await self.phase(tokens, self.requests, self.duration)
+        return {
+            "config": {
+                "concurrency": self.concurrency,
+                "requests": len(samples),
+                "duration_s": round(elapsed, 3),
+                "accounts": len(self.usernames),
+                "mix": self.mix,
+                "serialized": self.transport.serialized,
+            },
+            "routes": summarize(samples, elapsed),
+        }
+
+
+def format_report(result, baseline=None):
+    """Table of the route stats, with the change against ``baseline``."""
+    header = ["route", "requests", "errors", "rps", "mean_ms"] + [
+        f"p{p}_ms" for p in PERCENTILES
+    ]
+    rows = [header]
+    for route, stats in result["routes"].items():
+        row = [route]
+        for column in header[1:]:
+            value = stats[column]
+            old = ((baseline or {}).get("routes", {}).get(route) or {}).get(column)
+            if old and column not in ("requests", "errors"):
+                value = f"{value} ({(value - old) / old:+.0%})"
+            row.append(str(value))
+        rows.append(row)
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    lines = ["  ".join(v.ljust(w) for v, w in zip(row, widths)) for row in rows]
+    lines.insert(1, "  ".join("-" * width for width in widths))
+    if result["config"].get("serialized"):
+        lines.append(
+            "In-process run: requests were served one at a time, rps is not "
+            "the throughput of a server."
+        )
+    return "\n".join(lines)
@@ -0,0 +1,145 @@
+"""
+Production serving of ``MEDIA_ROOT``.
+
+Responses carry a strong ETag built from the file's mtime and size, a
+Last-Modified date and Cache-Control: names under
+``MEDIA_IMMUTABLE_PREFIXES`` are content-addressed and cached for a year as
+immutable, the rest for ``MEDIA_MAX_AGE`` seconds and then revalidated.
+With ``MEDIA_ACCEL_REDIRECT`` (nginx) or ``MEDIA_SENDFILE_HEADER``
+(Apache/lighttpd) set, the transfer is handed to the front proxy, which
+also answers Range requests. Otherwise whole files go out through
+``FileResponse`` (sendfile through ``wsgi.file_wrapper`` where the server
+supports it) and a single ``bytes=`` range is streamed as a 206.
+"""
+
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header, size):
+    """
+    ``(start, end)`` (inclusive) of a single-range ``Range`` header, ``None``
+    to send the whole file (no header, several ranges, or a syntax this view
+    doesn't handle), or ``False`` if the range is unsatisfiable.
+    """
+    match = RANGE_RE.match(header.replace(" ", "")) if header else None
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last ``last`` bytes.
+        length = int(last)
+        if not length:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def cache_control(path):
+    if path.startswith(tuple(settings.MEDIA_IMMUTABLE_PREFIXES)):
+        return f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+    return f"public, max-age={settings.MEDIA_MAX_AGE}"
+
+
+def read_range(fullpath, start, end):
+    with open(fullpath, "rb") as file:
+        file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = file.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+@require_safe
+def serve_media(request, path):
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    try:
+        stat = os.stat(fullpath)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404
+    if not os.path.isfile(fullpath):
+        raise Http404
+
+    size = stat.st_size
+    etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+    last_modified = int(stat.st_mtime)
+    content_type, encoding = mimetypes.guess_type(fullpath)
+    if encoding or not content_type:
+        # Compressed files are sent as they are, not with Content-Encoding.
+        content_type = "application/octet-stream"
+    headers = {
+        "ETag": etag,
+        "Last-Modified": http_date(last_modified),
+        "Cache-Control": cache_control(path),
+        "Accept-Ranges": "bytes",
+        "X-Content-Type-Options": "nosniff",
+    }
+
+    conditional = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if conditional is not None:
+        for header, value in headers.items():
+            conditional[header] = value
+        return conditional
+
+    if settings.MEDIA_ACCEL_REDIRECT or settings.MEDIA_SENDFILE_HEADER:
+        response = HttpResponse(content_type=content_type)
+        if settings.MEDIA_ACCEL_REDIRECT:
+            response["X-Accel-Redirect"] = settings.MEDIA_ACCEL_REDIRECT + quote(path)
+        else:
+            response[settings.MEDIA_SENDFILE_HEADER] = fullpath
+    else:
+        byte_range = parse_range(request.headers.get("Range"), size)
+        if_range = request.headers.get("If-Range")
+        if byte_range is not None and if_range and if_range != etag:
+            if parse_http_date_safe(if_range) != last_modified:
+                # The client's copy is stale: send the whole new file.
+                byte_range = None
+
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+        elif byte_range is not None and byte_range != (0, size - 1):
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                read_range(fullpath, start, end) if request.method == "GET" else (),
+                status=206,
+                content_type=content_type,
+            )
+            response["Content-Range"] = f"bytes {start}-{end}/{size}"
+            response["Content-Length"] = end - start + 1
+        elif request.method == "HEAD":
+            response = HttpResponse(content_type=content_type)
+            response["Content-Length"] = size
+        else:
+            response = FileResponse(open(fullpath, "rb"), content_type=content_type)
+
+    for header, value in headers.items():
+        response[header] = value
+    return response
@@ -0,0 +1,111 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetCursorPagination(BasePagination):
+    """
+    Forward-only keyset pagination.
+
+    The cursor holds the ordering values of the last row of the page, and the
+    next page is selected with ``WHERE (a, b) > (x, y)`` instead of an OFFSET,
+    so deep pages cost the same as the first one. The last ordering field must
+    be unique (``id``) for the ordering to be stable.
+    """
+
+    ordering = ("id",)
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.model = queryset.model
+
+        values = self.decode_cursor(request)
+        if values is not None:
+            queryset = queryset.filter(self.keyset_filter(values))
+
+        rows = list(queryset.order_by(*self.ordering)[: self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[: self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                return _positive_int(
+                    request.query_params[self.page_size_query_param],
+                    strict=True,
+                    cutoff=self.max_page_size,
+                )
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def get_fields(self):
+        return [
+            self.model._meta.get_field(name.lstrip("-")) for name in self.ordering
+        ]
+
+    def keyset_filter(self, values):
+        condition = Q()
+        for index, name in enumerate(self.ordering):
+            lookup = "lt" if name.startswith("-") else "gt"
+            clause = Q(**{f"{name.lstrip('-')}__{lookup}": values[index]})
+            for previous, value in zip(self.ordering[:index], values[:index]):
+                clause &= Q(**{previous.lstrip("-"): value})
+            condition |= clause
+        return condition
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            raw = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+            fields = self.get_fields()
+            if not isinstance(raw, list) or len(raw) != len(fields):
+                raise ValueError
+            return [field.to_python(value) for field, value in zip(fields, raw)]
+        except (TypeError, ValueError, binascii.Error, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, instance):
+        raw = [field.value_to_string(instance) for field in self.get_fields()]
+        encoded = base64.urlsafe_b64encode(json.dumps(raw).encode("ascii"))
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded.decode("ascii")
+        )
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
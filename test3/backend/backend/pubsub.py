@@ -0,0 +1,248 @@
+"""
+Publish/subscribe for the live updates pushed to WebSocket clients.
+
+Views publish JSON-serializable messages to named channels from sync code;
+WebSocket connections served by ``backend.asgi`` subscribe to one channel
+and forward what arrives. Brokers keep the last ``PUSH_HISTORY`` messages of
+each channel, so a client reconnecting with ``?last_seq=`` gets what it
+missed.
+
+``LocalBroker`` delivers within this process only: with several server
+processes a message published by one never reaches the sockets of the
+others, and ``active()`` only knows the local sockets. Set ``PUSH_BROKER``
+to ``RedisBroker`` (``PUSH_REDIS_URL``, the ``redis`` package) there; it
+delivers through Redis pub/sub and its ``active()`` asks Redis.
+
+A subscriber that falls ``PUSH_QUEUE_SIZE`` messages behind is
+disconnected rather than buffered without bound; it reconnects and
+refetches.
+"""
+
+import asyncio
+import json
+import re
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+try:
+    import redis
+    import redis.asyncio
+except ImportError:
+    redis = None
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+class Overflow(Exception):
+    pass
+
+
+class Subscription:
+    def __init__(self, broker, channel):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        self.overflowed = False
+
+    def deliver(self, message):
+        # Runs on the subscriber's event loop.
+        if self.queue.qsize() >= settings.PUSH_QUEUE_SIZE:
+            self.overflowed = True
+        self.queue.put_nowait(message)
+
+    async def get(self):
+        message = await self.queue.get()
+        if self.overflowed:
+            raise Overflow
+        return message
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = {}
+        self.history = {}
+        self.seq = 0
+
+    def publish(self, channel, message):
+        """Send ``message`` to the subscribers of ``channel``; thread-safe."""
+        with self.lock:
+            self.seq += 1
+            message = {"seq": self.seq, **message}
+            history = self.history.setdefault(
+                channel, deque(maxlen=settings.PUSH_HISTORY)
+            )
+            history.append(message)
+            subscriptions = list(self.subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+            except RuntimeError:
+                # Its event loop is closed.
+                self.unsubscribe(subscription)
+
+    def subscribe(self, channel, last_seq=None):
+        """
+        Subscribe the running event loop to ``channel``. Messages published
+        after ``last_seq`` that are still in the history are queued first.
+        """
+        subscription = Subscription(self, channel)
+        with self.lock:
+            self.subscriptions.setdefault(channel, set()).add(subscription)
+            if last_seq is not None:
+                for message in self.history.get(channel, ()):
+                    if message["seq"] > last_seq:
+                        subscription.deliver(message)
+        return subscription
+
+    def active(self):
+        """False when no socket of this process could receive a message."""
+        return bool(self.subscriptions)
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.channel)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self.subscriptions[subscription.channel]
+
+
+class RedisBroker:
+    # Seconds an active() answer is reused, so a burst of likes costs one
+    # round trip.
+    active_ttl = 1.0
+
+    def __init__(self):
+        self.prefix = settings.PUSH_REDIS_PREFIX
+        self.client = redis.Redis.from_url(settings.PUSH_REDIS_URL)
+        self.lock = threading.Lock()
+        self.checked_until = 0.0
+        self.was_active = False
+
+    def publish(self, channel, message):
+        seq = self.client.incr(f"{self.prefix}seq")
+        text = json.dumps({"seq": seq, **message}, default=str)
+        history = f"{self.prefix}history:{channel}"
+        pipe = self.client.pipeline()
+        pipe.rpush(history, text)
+        pipe.ltrim(history, -settings.PUSH_HISTORY, -1)
+        pipe.publish(self.prefix + channel, text)
+        pipe.execute()
+
+    def subscribe(self, channel, last_seq=None):
+        subscription = Subscription(self, channel)
+        subscription.listener = asyncio.ensure_future(self.listen(subscription, last_seq))
+        return subscription
+
+    async def listen(self, subscription, last_seq):
+        client = redis.asyncio.Redis.from_url(settings.PUSH_REDIS_URL)
+        pubsub = client.pubsub()
+        try:
+            # Subscribed before reading the history, so nothing falls in
+            # between; what arrives twice is skipped by seq.
+            await pubsub.subscribe(self.prefix + subscription.channel)
+            seen = last_seq
+            if last_seq is not None:
+                history = f"{self.prefix}history:{subscription.channel}"
+                for text in await client.lrange(history, 0, -1):
+                    message = json.loads(text)
+                    if message["seq"] > seen:
+                        subscription.deliver(message)
+                        seen = message["seq"]
+            async for item in pubsub.listen():
+                if item["type"] != "message":
+                    continue
+                message = json.loads(item["data"])
+                if seen is None or message["seq"] > seen:
+                    subscription.deliver(message)
+                    seen = message["seq"]
+        finally:
+            await pubsub.aclose()
+            await client.aclose()
+
+    def active(self):
+        """Whether any process has a subscriber, rechecked every ``active_ttl``."""
+        with self.lock:
+            now = time.monotonic()
+            if now >= self.checked_until:
+                self.was_active = bool(self.client.pubsub_channels(f"{self.prefix}*"))
+                self.checked_until = now + self.active_ttl
+            return self.was_active
+
+    def unsubscribe(self, subscription):
+        subscription.listener.cancel()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(settings.PUSH_BROKER)()
+        return _broker
+
+
+def publish(channel, message):
+    get_broker().publish(channel, message)
+
+
+async def serve_channel(receive, send, channel, last_seq=None):
+    """Accept the WebSocket and forward ``channel`` until either side closes."""
+    await send({"type": "websocket.accept"})
+    subscription = get_broker().subscribe(channel, last_seq)
+    disconnected = asyncio.ensure_future(wait_disconnect(receive))
+    try:
+        while True:
+            message = asyncio.ensure_future(subscription.get())
+            done, _ = await asyncio.wait(
+                {message, disconnected}, return_when=asyncio.FIRST_COMPLETED
+            )
+            if disconnected in done:
+                message.cancel()
+                return
+            try:
+                text = json.dumps(message.result(), default=str)
+            except Overflow:
+                # 1013: try again later.
+                await send({"type": "websocket.close", "code": 1013})
+                return
+            await send({"type": "websocket.send", "text": text})
+    finally:
+        subscription.close()
+        disconnected.cancel()
+
+
+async def wait_disconnect(receive):
+    while (await receive())["type"] != "websocket.disconnect":
+        pass
+
+
+def websocket_router(routes):
+    """
+    ASGI app for ``websocket`` scopes. ``routes`` maps path regexes to
+    ``"module.handler"`` paths called as ``handler(scope, receive, send,
+    **groups)``; unknown paths are refused before the handshake.
+    """
+    compiled = [(re.compile(pattern), handler) for pattern, handler in routes]
+
+    async def app(scope, receive, send):
+        if (await receive())["type"] != "websocket.connect":
+            return
+        for pattern, handler in compiled:
+            match = pattern.fullmatch(scope["path"])
+            if match:
+                await import_string(handler)(scope, receive, send, **match.groupdict())
+                return
+        await send({"type": "websocket.close", "code": 4404})
+
+    return app
+
@@ -0,0 +1,253 @@
+from collections import namedtuple
+
+from django.apps import apps
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.constants import OnConflict
+from django.http import Http404
+from django.utils.module_loading import import_string
+from rest_framework import serializers
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .counters import actual_count, counter_changes, counter_for
+
+# ``invalidate(pks)`` drops the cached payloads of the objects whose relation
+# changed; the optional ``on_change(user, linked, unlinked)`` runs any other
+# side effect of a user (un)linking objects.
+RelationKind = namedtuple(
+    "RelationKind", ["model", "m2m_name", "invalidate", "on_change"], defaults=[None]
+)
+
+RELATION_KINDS = {
+    "club_follow": RelationKind(
+        "clubs.Club",
+        "followers",
+        "clubs.cache.invalidate_clubs",
+        "clubs.feed.update_timeline",
+    ),
+    "post_like": RelationKind(
+        "clubs.ClubPost",
+        "liked_by",
+        "clubs.cache.invalidate_post_likes",
+        "clubs.live.likes_changed",
+    ),
+    "event_follow": RelationKind(
+        "events.Event", "followers", "events.cache.invalidate_events"
+    ),
+}
+MAX_SYNC_OPERATIONS = 500
+
+
+def set_relation(model, m2m_name, pk, user, state=None):
+    """
+    Link or unlink ``user`` and the ``model`` row ``pk`` through ``m2m_name``.
+
+    ``state=None`` toggles, ``True``/``False`` force the final state so a
+    retried request is a no-op. Works straight on the through table: a
+    conditional DELETE, then an insert-ignore if nothing was deleted, and an
+    ``F()`` update of the stored counter. The related set is never loaded.
+    Returns the final state; raises ``Http404`` if the row doesn't exist.
+    """
+    field = model._meta.get_field(m2m_name)
+    through = field.remote_field.through
+    source = field.m2m_column_name()
+    target = field.m2m_reverse_name()
+    counter_name = counter_for(model, m2m_name)
+    objects = model.objects.filter(pk=pk)
+
+    def adjust(delta):
+        changes = counter_changes(model, counter_name, F(counter_name) + delta)
+        if not objects.update(**changes):
+            raise Http404
+
+    with transaction.atomic():
+        if state is not True:
+            deleted, _ = through.objects.filter(
+                **{source: pk, target: user.pk}
+            ).delete()
+            if deleted:
+                adjust(-1)
+                return False
+            if state is False:
+                if not objects.exists():
+                    raise Http404
+                return False
+
+        if insert_ignore(through, {source: pk, target: user.pk}):
+            adjust(1)
+        elif not objects.exists():
+            raise Http404
+        return True
+
+
+def linked_ids(model, m2m_name, user, ids):
+    """Subset of ``ids`` linked to ``user`` through ``model.<m2m_name>``."""
+    if not ids:
+        return set()
+    field = model._meta.get_field(m2m_name)
+    source = field.m2m_column_name()
+    return set(
+        field.remote_field.through.objects.filter(
+            **{f"{source}__in": ids, field.m2m_reverse_name(): user.pk}
+        ).values_list(source, flat=True)
+    )
+
+
+def relation_changed(kind, user, linked, unlinked):
+    """Run the side effects of ``user`` linking/unlinking objects of ``kind``."""
+    spec = RELATION_KINDS[kind]
+    if linked or unlinked:
+        import_string(spec.invalidate)([*linked, *unlinked])
+    if spec.on_change:
+        import_string(spec.on_change)(user, linked, unlinked)
+
+
+def insert_ignore(model, values):
+    """INSERT a row unless it violates a unique constraint; True if inserted."""
+    ops = connection.ops
+    columns = ", ".join(ops.quote_name(column) for column in values)
+    placeholders = ", ".join(["%s"] * len(values))
+    sql = "%s %s (%s) VALUES (%s) %s" % (
+        ops.insert_statement(on_conflict=OnConflict.IGNORE),
+        ops.quote_name(model._meta.db_table),
+        columns,
+        placeholders,
+        ops.on_conflict_suffix_sql([], OnConflict.IGNORE, None, None),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, list(values.values()))
+        return cursor.rowcount == 1
+
+
+class RelationToggleView(APIView):
+    """
+    POST toggles the relation, PUT sets it and DELETE clears it. PUT and
+    DELETE are idempotent, so clients can safely retry them.
+    """
+
+    permission_classes = [IsAuthenticated]
+    kind = None
+    state_key = None
+    lookup_url_kwarg = "pk"
+
+    def apply(self, state, **kwargs):
+        spec = RELATION_KINDS[self.kind]
+        pk = kwargs[self.lookup_url_kwarg]
+        user = self.request.user
+        state = set_relation(apps.get_model(spec.model), spec.m2m_name, pk, user, state)
+        relation_changed(self.kind, user, [pk] if state else [], [] if state else [pk])
+        return Response({self.state_key: state})
+
+    def post(self, request, **kwargs):
+        return self.apply(None, **kwargs)
+
+    def put(self, request, **kwargs):
+        return self.apply(True, **kwargs)
+
+    def delete(self, request, **kwargs):
+        return self.apply(False, **kwargs)
+
+
+def sync_relations(user, operations):
+    """
+    Apply a batch of ``{kind, id, state}`` operations for ``user``.
+
+    Operations are applied in order, so the last one for an object wins.
+    Each through table gets one SELECT of the current links, one DELETE
+    and one conflict-ignoring bulk INSERT for the links to change, then
+    one UPDATE recounting the counters of the objects touched, all inside
+    a single transaction: the writes don't grow with the batch, and a
+    concurrent replay or toggle since the SELECT can't make the counters
+    drift. Returns one result per object with its final state and counter,
+    or ``state=None`` if the object doesn't exist.
+    """
+    wanted = {}
+    for operation in operations:
+        wanted.setdefault(operation["kind"], {})[operation["id"]] = operation["state"]
+
+    results = []
+    changed = {}
+    with transaction.atomic():
+        for kind, states in wanted.items():
+            spec = RELATION_KINDS[kind]
+            model = apps.get_model(spec.model)
+            m2m_name = spec.m2m_name
+            field = model._meta.get_field(m2m_name)
+            through = field.remote_field.through
+            source = field.m2m_column_name()
+            target = field.m2m_reverse_name()
+            counter_name = counter_for(model, m2m_name)
+
+            existing = set(
+                model.objects.filter(pk__in=states).values_list("pk", flat=True)
+            )
+            linked = linked_ids(model, m2m_name, user, existing)
+            adding = [pk for pk in existing if states[pk] and pk not in linked]
+            removing = [pk for pk in existing if not states[pk] and pk in linked]
+
+            if removing:
+                through.objects.filter(
+                    **{f"{source}__in": removing, target: user.pk}
+                ).delete()
+            if adding:
+                through.objects.bulk_create(
+                    [through(**{source: pk, target: user.pk}) for pk in adding],
+                    ignore_conflicts=True,
+                )
+            if adding or removing:
+                model.objects.filter(pk__in=[*adding, *removing]).update(
+                    **counter_changes(
+                        model, counter_name, actual_count(model, m2m_name)
+                    )
+                )
+
+            changed[kind] = (adding, removing)
+
+            counts = dict(
+                model.objects.filter(pk__in=existing).values_list("pk", counter_name)
+            )
+            for pk, state in states.items():
+                results.append(
+                    {
+                        "kind": kind,
+                        "id": pk,
+                        "state": state if pk in counts else None,
+                        "count": counts.get(pk),
+                    }
+                )
+
+    for kind, (adding, removing) in changed.items():
+        relation_changed(kind, user, adding, removing)
+    return results
+
+
+class SyncOperationSerializer(serializers.Serializer):
+    kind = serializers.ChoiceField(choices=list(RELATION_KINDS))
+    id = serializers.IntegerField(min_value=1)
+    state = serializers.BooleanField()
+
+
+class SyncRelationsView(APIView):
+    """
+    Replay the likes/follows queued by an offline client in one request.
+
+    Body: ``{"operations": [{"kind": "post_like", "id": 3, "state": true}]}``.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        if not isinstance(request.data, dict):
+            raise serializers.ValidationError(
+                {"operations": ['Expected {"operations": [...]}.']}
+            )
+        serializer = SyncOperationSerializer(
+            data=request.data.get("operations"),
+            many=True,
+            max_length=MAX_SYNC_OPERATIONS,
+        )
+        serializer.is_valid(raise_exception=True)
+        results = sync_relations(request.user, serializer.validated_data)
+        return Response({"results": results})
@@ -0,0 +1,94 @@
+"""
+Renderer micro-benchmark: encode time and body size of real payloads.
+
+The payloads are built once by calling the views (club detail, admin user
+list) in-process, then rendered ``repeat`` times by each renderer of
+``backend.renderers`` and DRF's own ``JSONRenderer``. Sizes are given raw
+and compressed the way ``backend.compression`` would send them.
+"""
+
+import statistics
+import time
+
+from django.urls import resolve
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from . import renderers
+from .compression import brotli, compress_body
+
+
+def available_renderers():
+    """``{name: renderer}`` for the renderers usable here."""
+    found = {"drf-json": JSONRenderer()}
+    if renderers.orjson is not None:
+        found["orjson"] = renderers.FastJSONRenderer()
+    if renderers.msgpack is not None:
+        found["msgpack"] = renderers.MessagePackRenderer()
+    return found
+
+
+def view_payload(path, user):
+    """``response.data`` of a GET on ``path`` as ``user``."""
+    match = resolve(path.partition("?")[0])
+    request = APIRequestFactory().get(path)
+    force_authenticate(request, user=user)
+    response = match.func(request, *match.args, **match.kwargs)
+    if response.status_code != 200:
+        raise RuntimeError(f"GET {path} answered {response.status_code}")
+    return response.data
+
+
+def timed(function, repeat):
+    """``(result, median microseconds)`` of ``repeat`` calls."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started)
+    return result, round(statistics.median(timings) * 1e6, 1)
+
+
+def measure(payloads, repeat=200):
+    """One row per payload and renderer."""
+    rows = []
+    for payload, data in payloads.items():
+        for name, renderer in available_renderers().items():
+            body, encode_us = timed(
+                lambda: renderer.render(data, renderer.media_type, {}), repeat
+            )
+            gzip_body, gzip_us = timed(lambda: compress_body(body, "gzip"), repeat)
+            row = {
+                "payload": payload,
+                "renderer": name,
+                "encode_us": encode_us,
+                "bytes": len(body),
+                "gzip_bytes": len(gzip_body),
+                "gzip_us": gzip_us,
+            }
+            if brotli is not None:
+                br_body, br_us = timed(lambda: compress_body(body, "br"), repeat)
+                row.update(br_bytes=len(br_body), br_us=br_us)
+            rows.append(row)
+    return rows
+
+
+def format_report(rows):
+    """Table of ``rows``, with the encode time against ``drf-json``."""
+    header = list(rows[0]) if rows else []
+    baseline = {
+        row["payload"]: row["encode_us"] for row in rows if row["renderer"] == "drf-json"
+    }
+    lines = [header]
+    for row in rows:
+        cells = [str(row.get(column, "-")) for column in header]
+        base = baseline.get(row["payload"])
+        if base and row["encode_us"] and row["renderer"] != "drf-json":
+            index = header.index("encode_us")
+            cells[index] += f" (x{base / row['encode_us']:.1f})"
+        lines.append(cells)
+    widths = [max(len(line[i]) for line in lines) for i in range(len(header))]
+    text = ["  ".join(v.ljust(w) for v, w in zip(line, widths)) for line in lines]
+    text.insert(1, "  ".join("-" * width for width in widths))
+    return "\n".join(text)
+
@@ -0,0 +1,280 @@
+"""
+Full-text search over clubs, posts and events with SQLite FTS5.
+
+Every searchable row has one row in the ``search_index`` virtual table,
+whose rowid encodes the kind and primary key (``pk * 4 + code``), so an
+edit rewrites its entry with one statement on the rowid. ``track_search``
+keeps the entries of a model current from ``post_save``/``post_delete``
+(removals are applied when the deleting transaction commits);
+bulk writes bypass the signals and are followed by ``rebuild_index``
+(``manage.py rebuild_search_index``). Results are ordered by bm25 with
+the title weighted above the body, and ``SearchView`` pages them with a
+``(rank, rowid)`` keyset. Ranks move a little when the index changes
+between two pages, so deep pages are approximate under heavy writes.
+"""
+
+import base64
+import binascii
+import json
+import re
+from collections import namedtuple
+
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import _positive_int
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.views import APIView
+
+TABLE = "search_index"
+# Column weights of bm25(): title, body.
+RANK = "bm25(10.0, 1.0)"
+MAX_QUERY_TERMS = 8
+
+# ``title`` and ``body`` are model field names; ``body`` fields are joined.
+# ``parent`` names the field holding the club id shown with the result.
+SearchSource = namedtuple("SearchSource", ["model", "code", "title", "body", "parent"])
+
+SEARCH_SOURCES = {}
+
+
+def enabled():
+    return connection.vendor == "sqlite"
+
+
+def create_index(**kwargs):
+    """Create the FTS5 table if missing; connected to ``post_migrate``."""
+    if not enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = '{TABLE}'"
+        )
+        if cursor.fetchone():
+            return
+        # Prefix indexes keep the search-as-you-type last term cheap.
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE {TABLE} USING fts5("
+            "title, body, parent UNINDEXED, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}, rank) VALUES ('rank', %s)", [RANK])
+
+
+def entry(source, instance):
+    title = getattr(instance, source.title) or ""
+    body = "\n".join(getattr(instance, name) or "" for name in source.body)
+    parent = getattr(instance, source.parent) if source.parent else None
+    return instance.pk * 4 + source.code, title, body, parent
+
+
+def index_instance(source, instance, created=False):
+    rowid, title, body, parent = entry(source, instance)
+    with connection.cursor() as cursor:
+        if not created:
+            cursor.execute(
+                f"UPDATE {TABLE} SET title = %s, body = %s, parent = %s WHERE rowid = %s",
+                [title, body, parent, rowid],
+            )
+            if cursor.rowcount:
+                return
+        cursor.execute(
+            f"INSERT INTO {TABLE} (rowid, title, body, parent) VALUES (%s, %s, %s, %s)",
+            [rowid, title, body, parent],
+        )
+
+
+def unindex_rowids(rowids):
+    rowids = list(rowids)
+    with connection.cursor() as cursor:
+        for start in range(0, len(rowids), 500):
+            chunk = rowids[start : start + 500]
+            cursor.execute(
+                f"DELETE FROM {TABLE} WHERE rowid IN ({', '.join(['%s'] * len(chunk))})",
+                chunk,
+            )
+
+
+class PendingRemovals:
+    """Entries of rows deleted in the current transaction, removed on commit."""
+
+    def __init__(self):
+        self.rowids = set()
+        transaction.on_commit(self.flush)
+
+    def flush(self):
+        unindex_rowids(self.rowids)
+
+    def registered(self):
+        return any(func == self.flush for _, func, _ in connection.run_on_commit)
+
+
+def unindex_instance(source, pk):
+    # Cascades delete posts one signal at a time: batch their removal into
+    # one statement when the deleting transaction commits.
+    rowid = pk * 4 + source.code
+    if not connection.in_atomic_block:
+        unindex_rowids([rowid])
+        return
+    pending = getattr(connection, "search_removals", None)
+    if pending is None or not pending.registered():
+        pending = connection.search_removals = PendingRemovals()
+    pending.rowids.add(rowid)
+
+
+def track_search(model, kind, code, title, body, parent=None):
+    """Index ``model`` rows as ``kind`` results and keep them current."""
+    source = SearchSource(model, code, title, tuple(body), parent)
+    SEARCH_SOURCES[kind] = source
+
+    indexed = {title, *body, parent}
+
+    def on_save(sender, instance, created, update_fields=None, **kwargs):
+        if update_fields is not None and not indexed & set(update_fields):
+            return
+        if enabled():
+            index_instance(source, instance, created)
+
+    def on_delete(sender, instance, **kwargs):
+        if enabled():
+            unindex_instance(source, instance.pk)
+
+    post_save.connect(on_save, sender=model, weak=False)
+    post_delete.connect(on_delete, sender=model, weak=False)
+
+
+def rebuild_index():
+    """Recreate the index from the tables; returns ``{kind: rows}``."""
+    if not enabled():
+        return {}
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    create_index()
+
+    counts = {}
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for kind, source in SEARCH_SOURCES.items():
+            opts = source.model._meta
+            columns = {
+                name: qn(opts.get_field(name).column)
+                for name in (source.title, *source.body, source.parent)
+                if name
+            }
+            body = " || char(10) || ".join(
+                f"coalesce({columns[name]}, '')" for name in source.body
+            )
+            parent = columns[source.parent] if source.parent else "NULL"
+            cursor.execute(
+                f"INSERT INTO {TABLE} (rowid, title, body, parent) "
+                f"SELECT {qn(opts.pk.column)} * 4 + %s, "
+                f"coalesce({columns[source.title]}, ''), {body}, {parent} "
+                f"FROM {qn(opts.db_table)}",
+                [source.code],
+            )
+            counts[kind] = cursor.rowcount
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+    return counts
+
+
+def match_expression(query):
+    """
+    FTS5 query matching every word of ``query``, the last one as a prefix;
+    ``None`` without words. User input never reaches the FTS5 syntax.
+    """
+    terms = re.findall(r"\w+", query)[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def search(expression, codes=None, after=None, limit=20):
+    """``limit`` rows of ``(rank, rowid, title, snippet, parent)`` by rank."""
+    sql = [
+        f"SELECT rank, rowid, title, snippet({TABLE}, -1, '', '', '…', 12), parent "
+        f"FROM {TABLE} WHERE {TABLE} MATCH %s"
+    ]
+    params = [expression]
+    if codes:
+        sql.append(f"AND rowid %% 4 IN ({', '.join(['%s'] * len(codes))})")
+        params.extend(codes)
+    if after is not None:
+        sql.append("AND (rank > %s OR (rank = %s AND rowid > %s))")
+        params.extend([after[0], after[0], after[1]])
+    sql.append("ORDER BY rank, rowid LIMIT %s")
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(" ".join(sql), params)
+        return cursor.fetchall()
+
+
+class SearchView(APIView):
+    """
+    ``GET /api/search/?q=robotics&type=club,post`` ranked across clubs,
+    posts and events.
+
+    Each result is ``{"type", "id", "title", "snippet", "club"}`` and is
+    read from the index alone; ``club`` is the club of a post, the club
+    itself for a club and ``null`` for an event.
+    """
+
+    permission_classes = [AllowAny]
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 100
+    invalid_cursor_message = "Invalid cursor"
+
+    def get(self, request):
+        expression = match_expression(request.query_params.get("q", ""))
+        if expression is None:
+            raise ValidationError({"q": ["Enter at least one word."]})
+
+        codes = None
+        if "type" in request.query_params:
+            kinds = [kind for kind in request.query_params["type"].split(",") if kind]
+            unknown = [kind for kind in kinds if kind not in SEARCH_SOURCES]
+            if unknown:
+                raise ValidationError({"type": [f"Unknown type: {', '.join(unknown)}."]})
+            codes = [SEARCH_SOURCES[kind].code for kind in kinds]
+
+        try:
+            page_size = _positive_int(
+                request.query_params["page_size"], strict=True, cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            page_size = self.page_size
+
+        rows = search(expression, codes, self.decode_cursor(request), page_size + 1)
+        kinds = {source.code: kind for kind, source in SEARCH_SOURCES.items()}
+        results = [
+            {
+                "type": kinds[rowid % 4],
+                "id": rowid // 4,
+                "title": title,
+                "snippet": snippet,
+                "club": rowid // 4 if kinds[rowid % 4] == "club" else parent,
+            }
+            for _, rowid, title, snippet, parent in rows[:page_size]
+        ]
+        next_link = None
+        if len(rows) > page_size:
+            rank, rowid = rows[page_size - 1][:2]
+            cursor = base64.urlsafe_b64encode(json.dumps([rank, rowid]).encode("ascii"))
+            next_link = replace_query_param(
+                request.build_absolute_uri(), "cursor", cursor.decode("ascii")
+            )
+        return Response({"next": next_link, "results": results})
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get("cursor")
+        if encoded is None:
+            return None
+        try:
+            rank, rowid = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+            return float(rank), int(rowid)
+        except (TypeError, ValueError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
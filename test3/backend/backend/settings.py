@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+from importlib.util import find_spec
 from pathlib import Path
 from corsheaders.defaults import default_headers
 
@@ -39,6 +41,15 @@ ALLOWED_HOSTS = ["192.168.100.126", "localhost", "127.0.0.1", "192.168.1.125."]
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+# How media is sent, see backend.media. Names under these prefixes are
+# content-addressed and cached by clients as immutable; the rest for
+# MEDIA_MAX_AGE seconds.
+MEDIA_IMMUTABLE_PREFIXES = ("blobs/",)
+MEDIA_MAX_AGE = 60 * 60
+# Hand transfers to the front proxy: an internal nginx location such as
+# "/protected-media/" for X-Accel-Redirect, or "X-Sendfile" for Apache.
+MEDIA_ACCEL_REDIRECT = None
+MEDIA_SENDFILE_HEADER = None
 
 
 # Application definition
@@ -61,6 +72,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "backend.compression.CompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -82,10 +94,95 @@ ROOT_URLCONF = "backend.urls"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "backend.authentication.CachedJWTAuthentication",
     ),
+    # Keyset pagination on ``id``; posts and events override the ordering.
+    "DEFAULT_PAGINATION_CLASS": "backend.pagination.KeysetCursorPagination",
+    "PAGE_SIZE": 20,
+    # orjson-backed JSON (backend.renderers); MessagePack for clients
+    # sending Accept: application/msgpack, when msgpack is installed.
+    "DEFAULT_RENDERER_CLASSES": [
+        "backend.renderers.FastJSONRenderer",
+        *(["backend.renderers.MessagePackRenderer"] if find_spec("msgpack") else []),
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
 }
 
+# Serialized read payloads (backend.cache) are stored here under versioned
+# keys. LocMemCache evicts least-recently-used entries past MAX_ENTRIES and
+# everything after TIMEOUT; FileBasedCache works the same way when payloads
+# have to be shared between worker processes.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "TIMEOUT": 300,
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    },
+}
+PAYLOAD_CACHE_ALIAS = "default"
+
+# Users resolved from access tokens are cached (backend.authentication):
+# AUTH_USER_LOCAL_TTL seconds in each process, AUTH_USER_CACHE_TTL in CACHES
+# when it is shared between processes (Redis, Memcached). Other workers see
+# a deactivation or a revoked is_staff within AUTH_USER_LOCAL_TTL seconds.
+AUTH_USER_CACHE_TTL = 60
+AUTH_USER_LOCAL_TTL = 5
+AUTH_USER_LOCAL_SIZE = 1024
+
+# Users following at least this many clubs read their home feed from the
+# precomputed FeedEntry timeline instead of an IN query over their clubs.
+FEED_TIMELINE_THRESHOLD = 100
+# Posts copied into a timeline when the user starts following a club.
+FEED_BACKFILL_POSTS = 100
+
+# Resized WebP copies made of every club and profile image, as
+# name: (max width, max height); see backend.images.
+IMAGE_VARIANTS = {"thumb": (128, 128), "medium": (640, 640)}
+IMAGE_VARIANT_QUALITY = 80
+# Threads generating the variants after an upload; 0 generates them inline.
+IMAGE_VARIANT_WORKERS = 2
+
+# Chunked club file uploads, see clubs.uploads. Chunks are kept outside
+# MEDIA_ROOT until the upload is committed.
+CHUNKED_UPLOAD_DIR = BASE_DIR / "uploads"
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+UPLOAD_MAX_SIZE = 100 * 1024 * 1024
+# Seconds before an uncommitted upload is abandoned; ``manage.py
+# expire_uploads`` then deletes its session and chunks, and the stored
+# files no club references any more.
+UPLOAD_SESSION_TTL = 24 * 3600
+
+# Live club updates over WebSocket (backend.pubsub, clubs.live). LocalBroker
+# only reaches clients connected to the same process: with several processes
+# use "backend.pubsub.RedisBroker", which needs the redis package.
+PUSH_BROKER = "backend.pubsub.LocalBroker"
+PUSH_REDIS_URL = "redis://localhost:6379/0"
+PUSH_REDIS_PREFIX = "push:"
+# Messages kept per channel for clients reconnecting with ?last_seq=.
+PUSH_HISTORY = 100
+# Messages a slow client may fall behind before it is disconnected.
+PUSH_QUEUE_SIZE = 256
+# Like counts are pushed at most this often; 0 pushes on every toggle.
+PUSH_LIKES_INTERVAL = 1.0
+
+# iCalendar feeds (events.ical): events have no end time, so each one gets
+# this RFC 5545 duration; feeds without ?from= start this many days back.
+EVENTS_CALENDAR_DURATION = "PT1H"
+EVENTS_CALENDAR_PAST_DAYS = 30
+
+# POST /api/batch/ (backend.batch): sub-requests per batch, and how many
+# run at once on worker threads (1 runs them one after the other).
+BATCH_MAX_REQUESTS = 10
+BATCH_CONCURRENCY = 4
+
+# Characters kept in the stored excerpts of long texts (backend.excerpts).
+EXCERPT_LENGTH = 160
+
+# Responses of at least COMPRESS_MIN_SIZE bytes are compressed
+# (backend.compression), with brotli at this quality when installed.
+COMPRESS_MIN_SIZE = 1024
+COMPRESS_BROTLI_QUALITY = 5
+
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
@@ -102,6 +199,12 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "backend.wsgi.application"
+# WebSockets need an ASGI server: ``uvicorn backend.asgi:application`` in
+# production. Plain runserver is WSGI only; with daphne installed its
+# runserver serves backend.asgi instead.
+ASGI_APPLICATION = "backend.asgi.application"
+if find_spec("daphne"):
+    INSTALLED_APPS.insert(0, "daphne")
 
 
 # Database
@@ -115,6 +218,12 @@ DATABASES = {
 }
 
 
+# Login, register and password change hash in a bounded pool (backend.hashing)
+# so bursts don't take every CPU; jobs past the queue get a 503. On login,
+# passwords are rehashed when PASSWORD_HASHERS[0] or its work factor change.
+PASSWORD_HASHING_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+PASSWORD_HASHING_QUEUE = 64
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -163,4 +272,13 @@ SIMPLE_JWT = {
     "ROTATE_REFRESH_TOKENS": True,
     "BLACKLIST_AFTER_ROTATION": True,
     "AUTH_HEADER_TYPES": ("Bearer",),
-}
\ No newline at end of file
+    "TOKEN_REFRESH_SERIALIZER": "backend.tokens.FastTokenRefreshSerializer",
+}
+
+# Per-process Bloom filter in front of the refresh-token blacklist, see
+# backend.tokens; synced through CACHES when it is shared between processes,
+# through the newest blacklist row otherwise. Clean the tables with
+# ``manage.py prune_tokens``.
+TOKEN_BLACKLIST_FILTER_CAPACITY = 1_000_000
+TOKEN_BLACKLIST_ERROR_RATE = 0.01
+TOKEN_BLACKLIST_SYNC_OVERLAP = 60
\ No newline at end of file
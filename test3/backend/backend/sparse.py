@@ -0,0 +1,99 @@
+"""
+Sparse fieldsets: ``?fields=`` and ``?omit=`` on read requests.
+
+``?fields=id,title`` keeps only the listed fields, ``?omit=content`` drops
+some. Fields of nested serializers are named with a dot: on a club detail
+``?omit=posts.content`` drops the content of the embedded posts. ``id``
+is always kept (cached payloads fill in per-user flags by id), unknown
+names are ignored, and writes always use every field.
+
+Serializers opt in with ``SparseFieldsMixin``. Their ``Meta.deferrable``
+lists the model columns worth not loading (long texts); views pass their
+querysets through ``defer_omitted`` so those columns are only read when
+the serializer outputs them and the request didn't leave them out.
+"""
+
+from rest_framework.permissions import SAFE_METHODS
+
+
+def requested(request, param):
+    value = request.query_params.get(param) if request is not None else None
+    if not value:
+        return None
+    return {name.strip() for name in value.split(",") if name.strip()}
+
+
+def level(names, path):
+    """The names in ``names`` addressed to the serializer at ``path``."""
+    if names is None:
+        return None
+    prefix = f"{path}." if path else ""
+    selected = set()
+    for name in names:
+        if name.startswith(prefix):
+            # "posts.title" also keeps "posts" at the upper level.
+            selected.add(name[len(prefix):].split(".", 1)[0])
+    return selected
+
+
+def sparse_names(request, path=""):
+    """``(kept or None, omitted)`` field names for the serializer at ``path``."""
+    if request is None or request.method not in SAFE_METHODS:
+        return None, set()
+    kept = level(requested(request, "fields"), path)
+    omit = requested(request, "omit") or set()
+    prefix = f"{path}." if path else ""
+    omitted = {
+        name[len(prefix):]
+        for name in omit
+        if name.startswith(prefix) and "." not in name[len(prefix):]
+    }
+    return kept or None, omitted
+
+
+class SparseFieldsMixin:
+    def serializer_path(self):
+        parts = []
+        node = self
+        while node.parent is not None:
+            if node.field_name:
+                parts.append(node.field_name)
+            node = node.parent
+        return ".".join(reversed(parts))
+
+    def get_fields(self):
+        fields = super().get_fields()
+        kept, omitted = sparse_names(self.context.get("request"), self.serializer_path())
+        for name in list(fields):
+            if name == "id":
+                continue
+            if (kept is not None and name not in kept) or name in omitted:
+                del fields[name]
+        return fields
+
+
+def read_columns(serializer_class):
+    """Attributes the fields of ``serializer_class`` read, or None for all."""
+    fields = serializer_class.Meta.fields
+    if fields == "__all__":
+        return None
+    sources = {name: name for name in fields}
+    for name, field in serializer_class._declared_fields.items():
+        if name in sources and field.source not in (None, "*"):
+            sources[name] = field.source.split(".", 1)[0]
+    return sources
+
+
+def defer_omitted(queryset, serializer_class, request, path=""):
+    """``queryset`` without the deferrable columns that won't be output."""
+    deferrable = getattr(serializer_class.Meta, "deferrable", ())
+    kept, omitted = sparse_names(request, path)
+    sources = read_columns(serializer_class) or {name: name for name in deferrable}
+    read = {
+        source
+        for name, source in sources.items()
+        if not ((kept is not None and name not in kept) or name in omitted)
+    }
+    deferred = [name for name in deferrable if name not in read]
+    return queryset.defer(*deferred) if deferred else queryset
+
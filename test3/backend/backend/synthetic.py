@@ -0,0 +1,243 @@
+"""
+Deterministic synthetic data for query-budget tests and load testing.
+
+Popularity follows a power law: a few clubs, posts and events collect most
+of the follows and likes, and a few users do most of the following and
+liking, like on the real campus install. Rows are written with chunked
+``bulk_create`` (through tables included), then the stored counters are
+recomputed with ``reconcile_counters``, the home-feed timelines of the
+users above ``FEED_TIMELINE_THRESHOLD`` are filled and the search index is
+rebuilt.
+"""
+
+import bisect
+import io
+import random
+from dataclasses import dataclass, field
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.utils import timezone
+
+from backend.excerpts import make_excerpt
+from backend.search import rebuild_index
+from clubs.feed import rebuild_timelines, timeline_users
+from clubs.models import Club, ClubPost
+from events.models import Event
+
+WORDS = (
+    "club meeting campus robotics chess music theatre debate hackathon "
+    "volunteer sport football workshop conference exam library concert "
+    "photography startup coding design trip welcome season registration "
+    "team members schedule room deadline project talk game night"
+).split()
+
+
+@dataclass
+class Dataset:
+    admin: int
+    users: list = field(default_factory=list)
+    clubs: list = field(default_factory=list)
+    posts: list = field(default_factory=list)
+    events: list = field(default_factory=list)
+
+
+class PowerLaw:
+    """Draws indexes in ``range(n)``; index 0 is the most popular."""
+
+    def __init__(self, rng, n, alpha=1.1):
+        self.rng = rng
+        self.cumulative = list(accumulate(1 / (i + 1) ** alpha for i in range(n)))
+
+    def draw(self):
+        point = self.rng.random() * self.cumulative[-1]
+        return bisect.bisect_left(self.cumulative, point)
+
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def sentence(rng, low, high):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+def with_excerpt(obj, source):
+    # bulk_create doesn't send pre_save, which fills excerpts otherwise.
+    obj.excerpt = make_excerpt(getattr(obj, source))
+    return obj
+
+
+def build_dataset(
+    users=1000,
+    clubs=50,
+    posts=1000,
+    likes=5000,
+    follows=2000,
+    events=100,
+    event_follows=1000,
+    seed=0,
+    chunk_size=5000,
+    password="!",
+    prefix="synthetic",
+    epoch=None,
+    log=None,
+):
+    """
+    Create the dataset and return the ids of what was created.
+
+    ``password`` is stored as is: pass one precomputed hash (the default
+    ``"!"`` is an unusable password) so no per-user hashing happens. Event
+    dates are spread around ``epoch``, the current time by default. Same
+    arguments, ``epoch`` included, on an empty database give the same rows,
+    apart from their ``created_at``.
+    """
+    User = get_user_model()
+    rng = random.Random(seed)
+    now = epoch or timezone.now()
+
+    def report(message):
+        if log:
+            log(message)
+
+    def insert(model, objects, ignore_conflicts=False):
+        for chunk in chunked(objects, chunk_size):
+            model.objects.bulk_create(chunk, ignore_conflicts=ignore_conflicts)
+
+    admin = User.objects.create(
+        username=f"{prefix}-admin",
+        password=password,
+        is_superuser=True,
+        is_staff=True,
+        is_admin=True,
+    )
+    dataset = Dataset(admin=admin.pk)
+
+    insert(
+        User,
+        (
+            User(
+                username=f"{prefix}-user{i}",
+                email=f"{prefix}-user{i}@example.com",
+                password=password,
+            )
+            for i in range(users)
+        ),
+    )
+    dataset.users = list(
+        User.objects.filter(username__startswith=f"{prefix}-user")
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+    report(f"users: {len(dataset.users)}")
+
+    insert(
+        Club,
+        (
+            with_excerpt(
+                Club(
+                    name=f"{prefix} club {i}",
+                    description=sentence(rng, 10, 40),
+                    content=sentence(rng, 20, 120),
+                    created_by_id=admin.pk,
+                ),
+                "description",
+            )
+            for i in range(clubs)
+        ),
+    )
+    dataset.clubs = list(
+        Club.objects.filter(name__startswith=f"{prefix} club")
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+    report(f"clubs: {len(dataset.clubs)}")
+
+    club_law = PowerLaw(rng, len(dataset.clubs))
+    first_post = ClubPost.objects.order_by("-pk").values_list("pk", flat=True).first()
+    insert(
+        ClubPost,
+        (
+            with_excerpt(
+                ClubPost(
+                    club_id=dataset.clubs[club_law.draw()],
+                    title=sentence(rng, 2, 8),
+                    content=sentence(rng, 20, 200),
+                    created_by_id=admin.pk,
+                ),
+                "content",
+            )
+            for _ in range(posts)
+        ),
+    )
+    dataset.posts = list(
+        ClubPost.objects.filter(pk__gt=first_post or 0)
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+    report(f"posts: {len(dataset.posts)}")
+
+    first_event = Event.objects.order_by("-pk").values_list("pk", flat=True).first()
+    insert(
+        Event,
+        (
+            with_excerpt(
+                Event(
+                    title=sentence(rng, 2, 6),
+                    description=sentence(rng, 10, 60),
+                    date=now + timedelta(hours=rng.randint(-24 * 365, 24 * 180)),
+                    created_by_id=admin.pk,
+                ),
+                "description",
+            )
+            for _ in range(events)
+        ),
+    )
+    dataset.events = list(
+        Event.objects.filter(pk__gt=first_event or 0)
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+    report(f"events: {len(dataset.events)}")
+
+    user_law = PowerLaw(rng, len(dataset.users), alpha=0.8)
+    relations = [
+        (Club, "followers", dataset.clubs, club_law, follows),
+        (ClubPost, "liked_by", dataset.posts, None, likes),
+        (Event, "followers", dataset.events, None, event_follows),
+    ]
+    for model, m2m_name, targets, law, total in relations:
+        if not targets or not dataset.users:
+            continue
+        law = law or PowerLaw(rng, len(targets))
+        relation = model._meta.get_field(m2m_name)
+        through = relation.remote_field.through
+        source = relation.m2m_column_name()
+        target = relation.m2m_reverse_name()
+        pairs = (
+            (targets[law.draw()], dataset.users[user_law.draw()]) for _ in range(total)
+        )
+        # Duplicate pairs are dropped by the unique constraint.
+        insert(
+            through,
+            (through(**{source: a, target: b}) for a, b in pairs),
+            ignore_conflicts=True,
+        )
+        report(f"{model._meta.label}.{m2m_name}: {through.objects.count()}")
+
+    call_command("reconcile_counters", chunk_size=chunk_size, stdout=io.StringIO())
+
+    heavy = timeline_users()
+    rebuild_timelines(heavy)
+    report(f"timelines: {len(heavy)} users")
+    rebuild_index()
+    return dataset
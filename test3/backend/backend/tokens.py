@@ -0,0 +1,188 @@
+"""
+Refresh tokens whose blacklist check rarely touches the database.
+
+With ``BLACKLIST_AFTER_ROTATION`` every refresh checks the blacklist. Each
+process keeps a Bloom filter of the blacklisted JTIs that haven't expired:
+a JTI the filter has never seen is not blacklisted, and only the rare hits
+(real or false positive, ``TOKEN_BLACKLIST_ERROR_RATE``) are confirmed
+with a query. Tokens blacklisted in this process are added at once by
+``users.signals``. A generation tells when another process blacklisted a
+token; the filter then loads the rows blacklisted since its previous sync
+(less ``TOKEN_BLACKLIST_SYNC_OVERLAP`` seconds, for transactions that
+committed late) with one query.
+
+With a cache shared by all the processes the generation is a counter
+there, bumped once the blacklisting commits. Otherwise (LocMemCache) it is
+read from the database: the id and JTI of the newest blacklisted row, one
+lookup on the primary key index instead of the JTI lookup, and no extra
+write.
+"""
+
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .cache import cache_is_shared
+
+# Counts blacklistings, so processes sharing the cache see each other's.
+VERSION_KEY = "token-blacklist:version"
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        a = int.from_bytes(digest[:8], "little")
+        b = int.from_bytes(digest[8:], "little") | 1
+        return [(a + i * b) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self.positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self.positions(key)
+        )
+
+
+class BlacklistFilter:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.bloom = None
+        self.synced_at = 0.0
+        # Value of the shared blacklisting counter this filter is up to date with.
+        self.version = None
+
+    def add(self, jti):
+        with self.lock:
+            if self.bloom is not None:
+                self.bloom.add(jti)
+
+    def committed(self, version):
+        """This process's blacklisting bumped the shared counter to ``version``."""
+        with self.lock:
+            if isinstance(self.version, int) and version == self.version + 1:
+                # Nobody else blacklisted anything since the last sync.
+                self.version = version
+
+    def row_added(self, pk, jti):
+        """This process blacklisted row ``pk`` (database generation)."""
+        with self.lock:
+            if isinstance(self.version, tuple) and self.version[0] == pk - 1:
+                # No row between it and the newest one of the last sync.
+                self.version = (pk, jti)
+
+    def sync(self):
+        now = time.time()
+        # Read before the rows: a blacklisting committed after the query
+        # bumps the counter after this read, and the next call syncs again.
+        version = current_version()
+        if self.bloom is not None and version == self.version:
+            return
+        with self.lock:
+            rows = BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now())
+            if self.bloom is None or self.bloom.count > self.bloom.capacity:
+                self.bloom = BloomFilter(
+                    settings.TOKEN_BLACKLIST_FILTER_CAPACITY,
+                    settings.TOKEN_BLACKLIST_ERROR_RATE,
+                )
+            else:
+                # Overlap the previous sync: rows are committed out of order.
+                since = self.synced_at - settings.TOKEN_BLACKLIST_SYNC_OVERLAP
+                rows = rows.filter(
+                    blacklisted_at__gte=datetime.fromtimestamp(since, dt_timezone.utc)
+                )
+            for jti in rows.values_list("token__jti", flat=True).iterator():
+                self.bloom.add(jti)
+            self.synced_at = now
+            self.version = version
+
+    def might_contain(self, jti):
+        self.sync()
+        return jti in self.bloom
+
+
+blacklist_filter = BlacklistFilter()
+
+
+def newest_row():
+    """``(id, jti)`` of the newest blacklisted row; ids are only reused after
+    a rollback, with another JTI."""
+    row = (
+        BlacklistedToken.objects.order_by("-id")
+        .values_list("id", "token__jti")
+        .first()
+    )
+    return row or (0, "")
+
+
+def current_version():
+    if not cache_is_shared():
+        return newest_row()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # A fresh timestamp never matches the version of a filter synced
+        # before the counter was evicted.
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_version():
+    try:
+        version = cache.incr(VERSION_KEY)
+    except ValueError:
+        current_version()
+        return
+    blacklist_filter.committed(version)
+
+
+def token_blacklisted(pk, jti):
+    """Record a new blacklisting for this and the other processes."""
+    blacklist_filter.add(jti)
+    if cache_is_shared():
+        # Other processes must not sync before the row is visible to them.
+        transaction.on_commit(bump_version)
+    else:
+        # Safe before the commit: after a rollback the newest row differs
+        # again and the next check syncs.
+        blacklist_filter.row_added(pk, jti)
+
+
+class FastRefreshToken(RefreshToken):
+    def check_blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        if (
+            blacklist_filter.might_contain(jti)
+            and BlacklistedToken.objects.filter(token__jti=jti).exists()
+        ):
+            raise TokenError(_("Token is blacklisted"))
+
+
+class FastTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = FastRefreshToken
@@ -16,16 +16,24 @@ Including another URLconf
 """
 
 from django.contrib import admin
-from django.urls import path, include
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from django.conf.urls.static import static
+import re
+
+from django.urls import path, include, re_path
+from rest_framework_simplejwt.views import TokenRefreshView
 from django.conf import settings
 
+from users.views import LoginView
+
+from .batch import batch
+from .media import serve_media
+from .relations import SyncRelationsView
+from .search import SearchView
+
 urlpatterns = [
     path("admin/", admin.site.urls),
 
     # Authentication
-    path("api/auth/login/", TokenObtainPairView.as_view()),
+    path("api/auth/login/", LoginView.as_view()),
     path("api/auth/refresh/", TokenRefreshView.as_view()),
 
     # Users app
@@ -34,6 +42,15 @@ urlpatterns = [
     path("api/events/", include("events.urls")),
     # Clubs app
     path("api/clubs/", include("clubs.urls")),
+    # Offline likes/follows replay
+    path("api/sync/relations/", SyncRelationsView.as_view()),
+    # Several GET requests in one round trip
+    path("api/batch/", batch),
+    # Full-text search across clubs, posts and events
+    path("api/search/", SearchView.as_view()),
 
-
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    # Uploaded media, also when DEBUG is off
+    re_path(
+        r"^%s(?P<path>.*)$" % re.escape(settings.MEDIA_URL.lstrip("/")), serve_media
+    ),
+]
@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ClubsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "clubs"
+
+    def ready(self):
+        from backend.search import create_index
+
+        from . import signals  # noqa: F401
+
+        post_migrate.connect(create_index, sender=self)
@@ -0,0 +1,22 @@
+from backend.cache import bump_versions
+
+from .models import ClubPost
+
+
+def invalidate_clubs(club_ids):
+    """The club list and the detail of each club in ``club_ids``."""
+    bump_versions("clubs", *(f"club:{pk}" for pk in club_ids))
+
+
+def invalidate_posts(club_ids):
+    """The post lists of ``club_ids``, embedded in each club detail too."""
+    bump_versions(*(f"posts:{pk}" for pk in club_ids))
+
+
+def invalidate_post_likes(post_ids):
+    club_ids = (
+        ClubPost.objects.filter(pk__in=post_ids)
+        .values_list("club_id", flat=True)
+        .distinct()
+    )
+    invalidate_posts(list(club_ids))
@@ -0,0 +1,127 @@
+"""
+Precomputed home-feed timelines (``FeedEntry``).
+
+Only users following at least ``FEED_TIMELINE_THRESHOLD`` clubs read their
+feed from a timeline, so only their timelines are written: a new post is
+copied to those of its club's followers, a user crossing the threshold
+gets a full timeline and one falling below loses it. After changing the
+threshold, run ``manage.py rebuild_timelines``.
+"""
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count
+from django.db.models.constants import OnConflict
+
+from .models import Club, ClubPost, FeedEntry
+
+
+def fan_out(post):
+    """Copy ``post`` into the timelines of its club's followers that have one."""
+    ops = connection.ops
+    through = Club.followers.through._meta
+    columns = ", ".join(
+        ops.quote_name(FeedEntry._meta.get_field(name).column)
+        for name in ("user", "post", "club", "created_at")
+    )
+    user = ops.quote_name(through.get_field("user").column)
+    sql = (
+        "%s %s (%s) SELECT f.%s, %%s, %%s, %%s FROM %s f WHERE f.%s = %%s "
+        "AND (SELECT COUNT(*) FROM %s g WHERE g.%s = f.%s) >= %%s %s"
+    ) % (
+        ops.insert_statement(on_conflict=OnConflict.IGNORE),
+        ops.quote_name(FeedEntry._meta.db_table),
+        columns,
+        user,
+        ops.quote_name(through.db_table),
+        ops.quote_name(through.get_field("club").column),
+        ops.quote_name(through.db_table),
+        user,
+        user,
+        ops.on_conflict_suffix_sql([], OnConflict.IGNORE, None, None),
+    )
+    created_at = ops.adapt_datetimefield_value(post.created_at)
+    params = [post.pk, post.club_id, created_at, post.club_id]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*params, settings.FEED_TIMELINE_THRESHOLD])
+
+
+def timeline_users():
+    """Ids of the users following at least ``FEED_TIMELINE_THRESHOLD`` clubs."""
+    return (
+        Club.followers.through.objects.values("user_id")
+        .annotate(total=Count("club_id"))
+        .filter(total__gte=settings.FEED_TIMELINE_THRESHOLD)
+        .values_list("user_id", flat=True)
+    )
+
+
+def rebuild_timelines(user_ids, chunk_size=500):
+    """Fill the timelines of ``user_ids`` with every post of their clubs."""
+    ops = connection.ops
+    through = Club.followers.through._meta
+    post = ClubPost._meta
+    columns = ", ".join(
+        ops.quote_name(FeedEntry._meta.get_field(name).column)
+        for name in ("user", "post", "club", "created_at")
+    )
+    follower = "f.%s" % ops.quote_name(through.get_field("user").column)
+    followed_club = "f.%s" % ops.quote_name(through.get_field("club").column)
+    post_club = "p.%s" % ops.quote_name(post.get_field("club").column)
+    user_ids = list(user_ids)
+    for start in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[start : start + chunk_size]
+        sql = (
+            "%s %s (%s) SELECT %s, p.%s, %s, p.%s FROM %s f "
+            "INNER JOIN %s p ON %s = %s WHERE %s IN (%s) %s"
+        ) % (
+            ops.insert_statement(on_conflict=OnConflict.IGNORE),
+            ops.quote_name(FeedEntry._meta.db_table),
+            columns,
+            follower,
+            ops.quote_name(post.pk.column),
+            post_club,
+            ops.quote_name(post.get_field("created_at").column),
+            ops.quote_name(through.db_table),
+            ops.quote_name(post.db_table),
+            post_club,
+            followed_club,
+            follower,
+            ", ".join(["%s"] * len(chunk)),
+            ops.on_conflict_suffix_sql([], OnConflict.IGNORE, None, None),
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, chunk)
+
+
+def update_timeline(user, followed, unfollowed):
+    """Backfill newly followed clubs and drop unfollowed ones."""
+    threshold = settings.FEED_TIMELINE_THRESHOLD
+    follows = Club.followers.through.objects.filter(user=user).count()
+    # At most: the toggles don't say whether the row was there already.
+    before = follows - len(followed) + len(unfollowed)
+    if follows < threshold:
+        if before >= threshold:
+            FeedEntry.objects.filter(user=user).delete()
+        return
+    if before < threshold:
+        rebuild_timelines([user.pk])
+        return
+    if unfollowed:
+        FeedEntry.objects.filter(user=user, club_id__in=unfollowed).delete()
+    for club_id in followed:
+        posts = ClubPost.objects.filter(club_id=club_id).order_by(
+            "-created_at", "-id"
+        )[: settings.FEED_BACKFILL_POSTS]
+        FeedEntry.objects.bulk_create(
+            [
+                FeedEntry(
+                    user=user,
+                    post_id=post_id,
+                    club_id=club_id,
+                    created_at=created_at,
+                )
+                for post_id, created_at in posts.values_list("id", "created_at")
+            ],
+            ignore_conflicts=True,
+        )
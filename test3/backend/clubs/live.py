@@ -0,0 +1,115 @@
+"""
+Live updates of a club's posts, pushed over ``/ws/clubs/<id>/``.
+
+Messages on the ``club:<id>`` channel:
+
+* ``{"type": "post.created" | "post.updated", "post": {...}}``, the post as
+  ``ClubPostSerializer`` shows it without a user (``is_liked`` is false);
+* ``{"type": "post.deleted", "id": 3}``;
+* ``{"type": "post.likes", "likes": {"3": 41}}``, the current like counts.
+
+While anyone is subscribed, like toggles record the post id; at most every
+``PUSH_LIKES_INTERVAL`` seconds one query reads the counts of all the posts
+liked or unliked meanwhile and one message per club carries them, however
+many likes came in.
+"""
+
+import logging
+import threading
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, transaction
+
+from backend.pubsub import get_broker, publish, serve_channel
+
+from .models import Club, ClubPost
+
+logger = logging.getLogger(__name__)
+
+
+def club_channel(club_id):
+    return f"club:{club_id}"
+
+
+def push_post(action, post):
+    """Publish ``post.<action>`` once the current transaction commits."""
+    from .serializers import ClubPostSerializer
+
+    data = dict(ClubPostSerializer(post).data, is_liked=False)
+    push(post.club_id, {"type": f"post.{action}", "post": data})
+
+
+def push_post_deleted(club_id, post_id):
+    """Publish ``post.deleted``; call it once the row is deleted."""
+    push(club_id, {"type": "post.deleted", "id": post_id})
+
+
+def push(club_id, message):
+    channel = club_channel(club_id)
+    transaction.on_commit(lambda: publish(channel, message))
+
+
+class LikeCounts:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.post_ids = set()
+        self.timer = None
+
+    def changed(self, post_ids):
+        if not get_broker().active():
+            return
+        if not settings.PUSH_LIKES_INTERVAL:
+            self.publish(post_ids)
+            return
+        with self.lock:
+            self.post_ids.update(post_ids)
+            if self.timer is None:
+                self.timer = threading.Timer(settings.PUSH_LIKES_INTERVAL, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self):
+        with self.lock:
+            post_ids, self.post_ids = self.post_ids, set()
+            self.timer = None
+        try:
+            self.publish(post_ids)
+        except Exception:
+            logger.exception("Publishing like counts failed")
+        finally:
+            # Each timer runs on a new thread with its own connection.
+            connection.close()
+
+    def publish(self, post_ids):
+        likes = {}
+        rows = ClubPost.objects.filter(pk__in=post_ids).values_list(
+            "club_id", "pk", "likes_count"
+        )
+        for club_id, pk, count in rows:
+            likes.setdefault(club_id, {})[pk] = count
+        for club_id, counts in likes.items():
+            publish(club_channel(club_id), {"type": "post.likes", "likes": counts})
+
+
+like_counts = LikeCounts()
+
+
+def likes_changed(user, liked, unliked):
+    """``RELATION_KINDS["post_like"].on_change``."""
+    like_counts.changed([*liked, *unliked])
+
+
+async def club_socket(scope, receive, send, club_id):
+    """``/ws/clubs/<club_id>/?last_seq=``; no auth, like the club detail."""
+    exists = Club.objects.filter(pk=int(club_id)).exists
+    if not await sync_to_async(exists)():
+        await send({"type": "websocket.close", "code": 4404})
+        return
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    try:
+        last_seq = int(query["last_seq"][0])
+    except (KeyError, ValueError):
+        last_seq = None
+    await serve_channel(receive, send, club_channel(club_id), last_seq)
@@ -0,0 +1,98 @@
+import asyncio
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.loadbench import (
+    DEFAULT_MIX,
+    AsgiTransport,
+    HttpTransport,
+    LoadBenchmark,
+    format_report,
+    parse_mix,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a weighted mix of API traffic against the seed_load users and "
+        "report throughput and p50/p95/p99 latency per route."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url",
+            help="Base URL of a running server. By default the ASGI app "
+            "(backend.asgi) is called in-process, where sync views serve one "
+            "request at a time.",
+        )
+        parser.add_argument("--concurrency", type=int, default=10)
+        parser.add_argument("--requests", type=int, default=1000)
+        parser.add_argument(
+            "--duration", type=float, help="Stop after this many seconds."
+        )
+        parser.add_argument("--warmup", type=int, default=100)
+        parser.add_argument(
+            "--mix",
+            type=parse_mix,
+            default=DEFAULT_MIX,
+            help="Route weights, e.g. club_list=3,like_toggle=1.",
+        )
+        parser.add_argument(
+            "--accounts", type=int, default=10, help="Users to log in as."
+        )
+        parser.add_argument("--prefix", default="load")
+        parser.add_argument("--password", default="load-password")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="Write the results to this JSON file.")
+        parser.add_argument(
+            "--compare", help="Show the change against a previous JSON result."
+        )
+
+    def handle(self, *args, **options):
+        if options["url"]:
+            transport = HttpTransport(options["url"])
+        else:
+            from backend.asgi import application
+
+            transport = AsgiTransport(application)
+            self.stderr.write(
+                self.style.WARNING(
+                    "In-process: sync views run one at a time, so throughput "
+                    "doesn't grow with --concurrency. Pass --url for a server."
+                )
+            )
+            if settings.DEBUG:
+                self.stderr.write(
+                    self.style.WARNING(
+                        "DEBUG is on: query logging and debug pages skew the numbers."
+                    )
+                )
+
+        baseline = None
+        if options["compare"]:
+            with open(options["compare"]) as file:
+                baseline = json.load(file)
+
+        benchmark = LoadBenchmark(
+            transport,
+            [f"{options['prefix']}-user{i}" for i in range(options["accounts"])],
+            options["password"],
+            mix=options["mix"],
+            concurrency=options["concurrency"],
+            requests=options["requests"],
+            duration=options["duration"],
+            warmup=options["warmup"],
+            seed=options["seed"],
+        )
+        try:
+            result = asyncio.run(benchmark.run())
+        except RuntimeError as exc:
+            raise CommandError(exc)
+
+        self.stdout.write(format_report(result, baseline))
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                json.dump(result, file, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
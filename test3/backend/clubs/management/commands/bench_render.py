@@ -0,0 +1,59 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from backend.renderbench import format_report, measure, view_payload
+from clubs.models import Club
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare encode time and body size of the JSON and MessagePack "
+        "renderers on the club detail and admin user list payloads."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--club", type=int, help="Club to render (default: the one with most posts)."
+        )
+        parser.add_argument(
+            "--page-size",
+            type=int,
+            default=100,
+            help="Posts embedded in the club detail and users in the list.",
+        )
+        parser.add_argument("--repeat", type=int, default=200)
+        parser.add_argument("--output", help="Write the results to this JSON file.")
+
+    def handle(self, *args, **options):
+        admin = get_user_model().objects.filter(is_superuser=True).first()
+        club_id = options["club"] or (
+            Club.objects.annotate(total=Count("posts"))
+            .order_by("-total")
+            .values_list("pk", flat=True)
+            .first()
+        )
+        if admin is None or club_id is None:
+            raise CommandError("Needs a superuser and a club; run seed_load first.")
+
+        page_size = options["page_size"]
+        try:
+            payloads = {
+                "club_detail": view_payload(
+                    f"/api/clubs/{club_id}/?page_size={page_size}", admin
+                ),
+                "user_list": view_payload(
+                    f"/api/admin/users/?page_size={page_size}", admin
+                ),
+            }
+        except RuntimeError as exc:
+            raise CommandError(exc)
+
+        rows = measure(payloads, repeat=options["repeat"])
+        self.stdout.write(format_report(rows))
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                json.dump(rows, file, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
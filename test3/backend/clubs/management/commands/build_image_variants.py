@@ -0,0 +1,45 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from backend.images import IMAGE_FIELDS, generate_variants, run_in_worker
+
+
+class Command(BaseCommand):
+    help = "Generate the resized image variants of existing clubs and users."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Regenerate the variants of rows that already have them.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=0,
+            help="Render in this many threads (default: inline).",
+        )
+
+    def handle(self, *args, **options):
+        for label, spec in IMAGE_FIELDS.items():
+            model = apps.get_model(label)
+            rows = model.objects.exclude(**{f"{spec.image}__isnull": True}).exclude(
+                **{spec.image: ""}
+            )
+            if not options["force"]:
+                rows = rows.filter(**{spec.variants: {}})
+            pks = list(rows.order_by("pk").values_list("pk", flat=True))
+
+            if options["workers"]:
+                with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+                    list(executor.map(lambda pk: run_in_worker(label, pk), pks))
+            else:
+                for pk in pks:
+                    generate_variants(label, pk)
+
+            done = model.objects.filter(pk__in=pks).exclude(**{spec.variants: {}})
+            self.stdout.write(
+                f"{label}.{spec.image}: {done.count()} of {len(pks)} images processed"
+            )
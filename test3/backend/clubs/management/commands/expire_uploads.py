@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from clubs.uploads import expire_uploads
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the upload sessions older than UPLOAD_SESSION_TTL, the "
+        "chunks they left on disk and the stored files no club uses."
+    )
+
+    def handle(self, *args, **options):
+        sessions, directories, blobs = expire_uploads()
+        self.stdout.write(
+            f"Expired {sessions} upload sessions, "
+            f"removed {directories} orphaned chunk directories "
+            f"and {blobs} unused blobs."
+        )
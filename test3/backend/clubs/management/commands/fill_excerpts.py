@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from backend.excerpts import TRACKED_EXCERPTS, make_excerpt
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored excerpts of posts, clubs and events."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        for model, source, target in TRACKED_EXCERPTS:
+            updated = 0
+            last_pk = 0
+            while True:
+                rows = list(
+                    model.objects.filter(pk__gt=last_pk)
+                    .order_by("pk")
+                    .only("pk", source, target)[: options["chunk_size"]]
+                )
+                if not rows:
+                    break
+                last_pk = rows[-1].pk
+                changed = []
+                for row in rows:
+                    excerpt = make_excerpt(getattr(row, source))
+                    if getattr(row, target) != excerpt:
+                        setattr(row, target, excerpt)
+                        changed.append(row)
+                if changed:
+                    with transaction.atomic():
+                        model.objects.bulk_update(changed, [target])
+                updated += len(changed)
+            self.stdout.write(f"{model._meta.label}.{target}: {updated} updated")
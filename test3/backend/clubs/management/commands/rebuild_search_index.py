@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from backend.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the full-text search index of clubs, posts and events, e.g. "
+        "after bulk imports that bypass the model signals."
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            counts = rebuild_index()
+        for kind, rows in counts.items():
+            self.stdout.write(f"{kind}: {rows} indexed")
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from clubs.feed import rebuild_timelines, timeline_users
+from clubs.models import FeedEntry
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the feed timelines of the users following at least "
+        "FEED_TIMELINE_THRESHOLD clubs and drop the others; run it after "
+        "changing the threshold."
+    )
+
+    def handle(self, *args, **options):
+        dropped, _ = FeedEntry.objects.exclude(user_id__in=timeline_users()).delete()
+        users = list(timeline_users())
+        rebuild_timelines(users)
+        self.stdout.write(
+            f"Rebuilt {len(users)} timelines, dropped {dropped} entries."
+        )
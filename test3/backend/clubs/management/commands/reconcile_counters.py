@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from backend.counters import TRACKED_COUNTERS, actual_count, counter_changes
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized follower/like counters and report drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report drift without writing the corrected values.",
+        )
+
+    def handle(self, *args, **options):
+        for model, m2m_name, counter_name in TRACKED_COUNTERS:
+            checked, fixed, drift = self.reconcile(
+                model, m2m_name, counter_name, options["chunk_size"], options["dry_run"]
+            )
+            self.stdout.write(
+                f"{model._meta.label}.{counter_name}: checked {checked}, "
+                f"drifted {fixed}, total drift {drift}"
+            )
+
+    def reconcile(self, model, m2m_name, counter_name, chunk_size, dry_run):
+        actual = actual_count(model, m2m_name)
+
+        checked = fixed = drift = 0
+        last_pk = 0
+        while True:
+            rows = list(
+                model.objects.filter(pk__gt=last_pk)
+                .order_by("pk")
+                .annotate(actual=Count(m2m_name))
+                .values_list("pk", counter_name, "actual")[:chunk_size]
+            )
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+            checked += len(rows)
+
+            drifted = [pk for pk, stored, real in rows if stored != real]
+            drift += sum(abs(stored - real) for _, stored, real in rows)
+            fixed += len(drifted)
+            if drifted and not dry_run:
+                # Recount inside the UPDATE so concurrent toggles aren't lost.
+                with transaction.atomic():
+                    model.objects.filter(pk__in=drifted).update(
+                        **counter_changes(model, counter_name, actual)
+                    )
+        return checked, fixed, drift
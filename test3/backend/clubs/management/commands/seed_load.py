@@ -0,0 +1,100 @@
+import argparse
+import random
+import time
+from datetime import timezone
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.crypto import RANDOM_STRING_CHARS
+from django.utils.dateparse import parse_datetime
+
+from backend.synthetic import build_dataset
+
+
+def parse_epoch(value):
+    """ISO 8601 date and time, UTC unless it has an offset."""
+    epoch = parse_datetime(value)
+    if epoch is None:
+        raise argparse.ArgumentTypeError(f"not an ISO 8601 date and time: {value!r}")
+    return epoch if epoch.tzinfo else epoch.replace(tzinfo=timezone.utc)
+
+
+def seeded_salt(seed):
+    # As long as Django's own salts: a shorter one is rehashed on login.
+    rng = random.Random(f"salt-{seed}")
+    return "".join(rng.choice(RANDOM_STRING_CHARS) for _ in range(22))
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with a deterministic power-law dataset for load "
+        "testing, e.g. seed_load --users 100000 --clubs 2000 --posts 500000 "
+        "--likes 5000000."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--clubs", type=int, default=50)
+        parser.add_argument("--posts", type=int, default=1000)
+        parser.add_argument("--likes", type=int, default=10000)
+        parser.add_argument(
+            "--follows", type=int, help="Club follows (default: 5 per user)."
+        )
+        parser.add_argument("--events", type=int, default=200)
+        parser.add_argument(
+            "--event-follows", type=int, help="Event follows (default: 2 per user)."
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--chunk-size", type=int, default=10000)
+        parser.add_argument(
+            "--prefix", default="load", help="Prefix of generated names."
+        )
+        parser.add_argument(
+            "--password",
+            default="load-password",
+            help="Password of every generated user, hashed once with a salt "
+            "derived from --seed, so the hash is the same on every run.",
+        )
+        parser.add_argument(
+            "--epoch",
+            type=parse_epoch,
+            help="Date the event dates are spread around (default: now); give "
+            "one to reproduce them, e.g. 2026-01-01T00:00Z.",
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+
+        def log(message):
+            elapsed = time.monotonic() - started
+            self.stdout.write(f"[{elapsed:7.1f}s] {message}")
+
+        users = options["users"]
+        with transaction.atomic():
+            dataset = build_dataset(
+                users=users,
+                clubs=options["clubs"],
+                posts=options["posts"],
+                likes=options["likes"],
+                follows=options["follows"] if options["follows"] is not None else users * 5,
+                events=options["events"],
+                event_follows=(
+                    options["event_follows"]
+                    if options["event_follows"] is not None
+                    else users * 2
+                ),
+                seed=options["seed"],
+                chunk_size=options["chunk_size"],
+                password=make_password(
+                    options["password"], salt=seeded_salt(options["seed"])
+                ),
+                prefix=options["prefix"],
+                epoch=options["epoch"],
+                log=log,
+            )
+        log(
+            self.style.SUCCESS(
+                f"Seeded {len(dataset.users)} users (admin: {options['prefix']}-admin)."
+            )
+        )
@@ -1,14 +1,52 @@
+import uuid
+
 from django.conf import settings
 from django.db import models
+from django.db.models import Exists, OuterRef, Value
 
 User = settings.AUTH_USER_MODEL
 
+
+class ClubQuerySet(models.QuerySet):
+    def with_follow_state(self, user):
+        """Annotate ``is_followed`` for ``user`` in the same query."""
+        if user is None or not user.is_authenticated:
+            return self.annotate(is_followed=Value(False))
+        return self.annotate(
+            is_followed=Exists(
+                Club.followers.through.objects.filter(
+                    club_id=OuterRef("pk"), user_id=user.pk
+                )
+            )
+        )
+
+
+class ClubPostQuerySet(models.QuerySet):
+    def with_like_state(self, user):
+        """Annotate ``is_liked`` for ``user`` and join the author."""
+        qs = self.select_related("created_by")
+        if user is None or not user.is_authenticated:
+            return qs.annotate(is_liked=Value(False))
+        return qs.annotate(
+            is_liked=Exists(
+                ClubPost.liked_by.through.objects.filter(
+                    clubpost_id=OuterRef("pk"), user_id=user.pk
+                )
+            )
+        )
+
+
 # Model for Clubs
 class Club(models.Model):
     name = models.CharField(max_length=255, unique=True)
     description = models.TextField()
+    # Start of ``description``, kept by backend.excerpts.
+    excerpt = models.CharField(max_length=255, blank=True, editable=False)
     image = models.ImageField(upload_to="clubs/", blank=True, null=True)
+    # Storage names of the resized copies, filled by backend.images.
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     content = models.TextField(blank=True)
+    # References to Blob rows, see clubs.uploads.file_ref().
     files = models.JSONField(default=list, blank=True)
 
     created_by = models.ForeignKey(
@@ -23,11 +61,13 @@ class Club(models.Model):
         blank=True
     )
 
+    # Kept in sync with ``followers`` by backend.counters.
+    followers_count = models.IntegerField(default=0, editable=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
-    def followers_count(self):
-        return self.followers.count()
+    objects = ClubQuerySet.as_manager()
 
     def __str__(self):
         return self.name
@@ -42,6 +82,8 @@ class ClubPost(models.Model):
 
     title = models.CharField(max_length=255)
     content = models.TextField()
+    # Start of ``content``, kept by backend.excerpts.
+    excerpt = models.CharField(max_length=255, blank=True, editable=False)
 
     created_by = models.ForeignKey(
         User,
@@ -55,11 +97,102 @@ class ClubPost(models.Model):
         blank=True
     )
 
+    # Kept in sync with ``liked_by`` by backend.counters.
+    likes_count = models.IntegerField(default=0, editable=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
-    def likes_count(self):
-        return self.liked_by.count()
+    objects = ClubPostQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Backs the (created_at, id) keyset pagination of a club's posts.
+            models.Index(fields=["club", "-created_at", "-id"]),
+            # Backs the max(updated_at) validator of the club detail.
+            models.Index(fields=["club", "updated_at"]),
+        ]
 
     def __str__(self):
         return self.title
 
+
+
+# Precomputed home-feed timeline: one row per post of a club the user follows.
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="feed_entries"
+    )
+    post = models.ForeignKey(
+        ClubPost,
+        on_delete=models.CASCADE,
+        related_name="feed_entries"
+    )
+    club = models.ForeignKey(
+        Club,
+        on_delete=models.CASCADE,
+        related_name="+"
+    )
+    # Copy of post.created_at so the feed is paginated from this table alone.
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "post"], name="unique_feed_entry")
+        ]
+        indexes = [
+            models.Index(fields=["user", "-created_at", "-post"]),
+            models.Index(fields=["user", "club"]),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} -> {self.post_id}"
+
+
+# Content-addressed file: identical uploads are stored once.
+class Blob(models.Model):
+    sha256 = models.CharField(max_length=64, unique=True)
+    size = models.BigIntegerField()
+    content_type = models.CharField(max_length=255)
+    # Storage name, under blobs/.
+    path = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.sha256
+
+
+# Chunked upload in progress; the chunks themselves live on disk.
+class UploadSession(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    club = models.ForeignKey(
+        Club,
+        on_delete=models.CASCADE,
+        related_name="upload_sessions"
+    )
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="+"
+    )
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    chunk_size = models.IntegerField()
+    # Optional digest announced by the client, checked on commit.
+    sha256 = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def chunk_count(self):
+        return max(1, -(-self.size // self.chunk_size))
+
+    def chunk_length(self, index):
+        if index == self.chunk_count - 1:
+            return self.size - index * self.chunk_size
+        return self.chunk_size
+
+    def __str__(self):
+        return f"{self.filename} ({self.pk})"
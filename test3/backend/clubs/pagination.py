@@ -0,0 +1,10 @@
+from backend.pagination import KeysetCursorPagination
+
+
+class PostCursorPagination(KeysetCursorPagination):
+    ordering = ("-created_at", "-id")
+
+
+class TimelineCursorPagination(KeysetCursorPagination):
+    # Same cursor values as PostCursorPagination: (created_at, post id).
+    ordering = ("-created_at", "-post")
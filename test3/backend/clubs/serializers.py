@@ -1,11 +1,19 @@
+import mimetypes
+
+from django.conf import settings
+from django.core.files.storage import default_storage
 from rest_framework import serializers
-from .models import Club, ClubPost
+
+from backend.images import ImageVariantsField
+from backend.sparse import SparseFieldsMixin
+
+from .models import Club, ClubPost, UploadSession
+from .uploads import received_chunks
 from users.models import User
 
 
-class ClubPostSerializer(serializers.ModelSerializer):
+class ClubPostSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author_username = serializers.CharField(source="created_by.username", read_only=True)
-    likes_count = serializers.SerializerMethodField()
     is_liked = serializers.SerializerMethodField()
 
     class Meta:
@@ -14,24 +22,52 @@ class ClubPostSerializer(serializers.ModelSerializer):
             "id",
             "title",
             "content",
+            "excerpt",
             "author_username",
             "likes_count",
             "is_liked",
             "created_at",
         ]
-
-    def get_likes_count(self, obj):
-        return obj.liked_by.count()
+        deferrable = ["content"]
 
     def get_is_liked(self, obj):
+        if hasattr(obj, "is_liked"):
+            return obj.is_liked
         request = self.context.get("request")
         if not request or request.user.is_anonymous:
             return False
         return obj.liked_by.filter(id=request.user.id).exists()
 
 
-class ClubSerializer(serializers.ModelSerializer):
-    followers_count = serializers.SerializerMethodField()
+class FeedPostSerializer(ClubPostSerializer):
+    club_name = serializers.CharField(source="club.name", read_only=True)
+
+    class Meta(ClubPostSerializer.Meta):
+        fields = ClubPostSerializer.Meta.fields + ["club", "club_name"]
+
+
+class ClubFilesField(serializers.ReadOnlyField):
+    """``Club.files`` references, each with the URL of its blob."""
+
+    def to_representation(self, value):
+        request = self.context.get("request")
+        files = []
+        for entry in value or []:
+            if isinstance(entry, str):
+                # Free-form entries saved before uploads kept references.
+                entry = {"name": entry}
+            elif not isinstance(entry, dict):
+                continue
+            entry = dict(entry)
+            if "path" in entry:
+                url = default_storage.url(entry["path"])
+                entry["url"] = request.build_absolute_uri(url) if request else url
+            files.append(entry)
+        return files
+
+
+class ClubSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
     is_followed = serializers.SerializerMethodField()
 
     class Meta:
@@ -40,15 +76,17 @@ class ClubSerializer(serializers.ModelSerializer):
             "id",
             "name",
             "description",
+            "excerpt",
             "image",
+            "image_variants",
             "followers_count",
             "is_followed",
         ]
-
-    def get_followers_count(self, obj):
-        return obj.followers.count()
+        deferrable = ["description", "content"]
 
     def get_is_followed(self, obj):
+        if hasattr(obj, "is_followed"):
+            return obj.is_followed
         request = self.context.get("request")
         if not request or request.user.is_anonymous:
             return False
@@ -56,16 +94,21 @@ class ClubSerializer(serializers.ModelSerializer):
 
 
 class ClubDetailSerializer(ClubSerializer):
-    posts = ClubPostSerializer(many=True, read_only=True)
+    # Filled by ClubDetailView with the newest page of posts only.
+    posts = ClubPostSerializer(many=True, read_only=True, source="latest_posts")
+    posts_next = serializers.CharField(read_only=True, allow_null=True)
+    files = ClubFilesField()
 
     class Meta(ClubSerializer.Meta):
-        fields = ClubSerializer.Meta.fields + ["posts"]
+        fields = ClubSerializer.Meta.fields + ["files", "posts", "posts_next"]
 
 
-class AdminClubSerializer(serializers.ModelSerializer):
+class AdminClubSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     created_by_username = serializers.CharField(
         source="created_by.username", read_only=True
     )
+    image_variants = ImageVariantsField()
+    files = ClubFilesField()
 
     class Meta:
         model = Club
@@ -73,10 +116,52 @@ class AdminClubSerializer(serializers.ModelSerializer):
             "id",
             "name",
             "description",
+            "excerpt",
             "image",
+            "image_variants",
+            "files",
             "created_by",
             "created_by_username",
             "created_at",
             "updated_at",
         ]
         read_only_fields = ["created_by", "created_at", "updated_at"]
+        deferrable = ["description", "content"]
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    content_type = serializers.CharField(max_length=255, required=False)
+    sha256 = serializers.RegexField(r"^[0-9a-f]{64}$", required=False)
+    chunk_count = serializers.IntegerField(read_only=True)
+    received_chunks = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UploadSession
+        fields = [
+            "id",
+            "filename",
+            "content_type",
+            "size",
+            "sha256",
+            "chunk_size",
+            "chunk_count",
+            "received_chunks",
+            "created_at",
+        ]
+        read_only_fields = ["chunk_size", "created_at"]
+
+    def validate_size(self, value):
+        if not 0 <= value <= settings.UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                f"Files must be at most {settings.UPLOAD_MAX_SIZE} bytes."
+            )
+        return value
+
+    def validate(self, attrs):
+        if not attrs.get("content_type"):
+            guessed, _ = mimetypes.guess_type(attrs["filename"])
+            attrs["content_type"] = guessed or "application/octet-stream"
+        return attrs
+
+    def get_received_chunks(self, obj):
+        return received_chunks(obj)
@@ -0,0 +1,14 @@
+from backend.counters import track_m2m_counter
+from backend.excerpts import track_excerpt
+from backend.search import track_search
+
+from .models import Club, ClubPost
+
+track_m2m_counter(Club, "followers", "followers_count")
+track_m2m_counter(ClubPost, "liked_by", "likes_count")
+
+track_search(Club, "club", 1, "name", ["description", "content"])
+track_search(ClubPost, "post", 2, "title", ["content"], parent="club_id")
+
+track_excerpt(Club, "description")
+track_excerpt(ClubPost, "content")
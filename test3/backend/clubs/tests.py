@@ -1,3 +1,1653 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Count
 from django.test import TestCase
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from testsupport import querybudget
+from testsupport.querybudget import Budget
+
+from .models import Club, ClubPost
+
+User = get_user_model()
+
+
+class ClubListQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner", password="pass")
+        cls.user = User.objects.create_user(username="member", password="pass")
+        others = [
+            User.objects.create_user(username=f"user{i}", password="pass")
+            for i in range(5)
+        ]
+        for i in range(10):
+            club = Club.objects.create(
+                name=f"Club {i}", description="desc", created_by=cls.owner
+            )
+            club.followers.add(*others[: i % 5])
+            if i % 2 == 0:
+                club.followers.add(cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_list_anonymous_uses_fixed_queries(self):
+        # Conditional-GET validator, then the annotated page.
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/clubs/")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(all(not c["is_followed"] for c in response.data["results"]))
+
+    def test_list_authenticated_uses_fixed_queries(self):
+        self.client.force_authenticate(self.user)
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/clubs/")
+        self.assertEqual(response.status_code, 200)
+        by_name = {c["name"]: c for c in response.data["results"]}
+        self.assertEqual(by_name["Club 0"]["followers_count"], 1)
+        self.assertTrue(by_name["Club 0"]["is_followed"])
+        self.assertEqual(by_name["Club 3"]["followers_count"], 3)
+        self.assertFalse(by_name["Club 3"]["is_followed"])
+        self.assertEqual(by_name["Club 4"]["followers_count"], 5)
+
+    def test_serializer_falls_back_without_annotations(self):
+        from .serializers import ClubSerializer
+
+        club = Club.objects.get(name="Club 4")
+        self.assertEqual(ClubSerializer(club).data["followers_count"], 5)
+
+
+class ClubDetailPostsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner", password="pass")
+        cls.user = User.objects.create_user(username="member", password="pass")
+        cls.club = Club.objects.create(
+            name="Busy", description="desc", created_by=cls.owner
+        )
+        cls.posts = [
+            ClubPost.objects.create(
+                club=cls.club, title=f"Post {i}", content="...", created_by=cls.owner
+            )
+            for i in range(45)
+        ]
+        cls.posts[-1].liked_by.add(cls.user, cls.owner)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_detail_embeds_newest_page_in_fixed_queries(self):
+        # Conditional-GET validator, club, posts page.
+        with self.assertNumQueries(3):
+            response = self.client.get(f"/api/clubs/{self.club.pk}/")
+        self.assertEqual(response.status_code, 200)
+        posts = response.data["posts"]
+        self.assertEqual(len(posts), 20)
+        self.assertEqual(posts[0]["title"], "Post 44")
+        self.assertEqual(posts[0]["likes_count"], 2)
+        self.assertTrue(posts[0]["is_liked"])
+        self.assertEqual(posts[0]["author_username"], "owner")
+        self.assertIn(f"/api/clubs/{self.club.pk}/posts/", response.data["posts_next"])
+
+    def test_next_cursor_walks_post_list(self):
+        response = self.client.get(f"/api/clubs/{self.club.pk}/")
+        seen = [p["id"] for p in response.data["posts"]]
+        url = response.data["posts_next"]
+        while url:
+            with self.assertNumQueries(1):
+                page = self.client.get(url)
+            seen += [p["id"] for p in page.data["results"]]
+            url = page.data["next"]
+        self.assertEqual(seen, [p.pk for p in reversed(self.posts)])
+
+    def test_liked_posts_join_the_likes_table(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self.posts[3].liked_by.add(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/clubs/me/liked-posts/")
+        self.assertEqual(
+            [p["id"] for p in response.data["results"]],
+            [self.posts[-1].pk, self.posts[3].pk],
+        )
+        self.assertTrue(all(p["is_liked"] for p in response.data["results"]))
+        (sql,) = [q["sql"] for q in queries.captured_queries]
+        self.assertIn("INNER JOIN", sql)
+        self.assertNotIn("EXISTS", sql)
+
+
+class CounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner", password="pass")
+        cls.users = [
+            User.objects.create_user(username=f"user{i}", password="pass")
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        self.club = Club.objects.create(
+            name="Chess", description="desc", created_by=self.owner
+        )
+        self.post = ClubPost.objects.create(
+            club=self.club, title="Hello", content="...", created_by=self.owner
+        )
+
+    def counts(self):
+        self.club.refresh_from_db()
+        self.post.refresh_from_db()
+        return self.club.followers_count, self.post.likes_count
+
+    def test_toggle_views_move_counters(self):
+        client = APIClient()
+        client.force_authenticate(self.users[0])
+        client.post(f"/api/clubs/{self.club.pk}/follow/")
+        client.post(f"/api/clubs/posts/{self.post.pk}/like/")
+        self.assertEqual(self.counts(), (1, 1))
+        client.post(f"/api/clubs/{self.club.pk}/follow/")
+        client.post(f"/api/clubs/posts/{self.post.pk}/like/")
+        self.assertEqual(self.counts(), (0, 0))
+
+    def test_both_sides_of_the_relation_are_tracked(self):
+        self.club.followers.add(*self.users)
+        self.club.followers.add(self.users[0])
+        self.users[1].followed_clubs.add(self.club)
+        self.assertEqual(self.counts()[0], 3)
+        self.club.followers.remove(self.users[0], self.owner)
+        self.assertEqual(self.counts()[0], 2)
+        self.users[1].followed_clubs.clear()
+        self.assertEqual(self.counts()[0], 1)
+        self.club.followers.clear()
+        self.assertEqual(self.counts()[0], 0)
+
+    def test_deleting_a_user_decrements(self):
+        self.post.liked_by.add(*self.users)
+        self.users[2].delete()
+        self.assertEqual(self.counts()[1], 2)
+
+    def test_reconcile_counters_fixes_drift(self):
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        self.club.followers.add(*self.users)
+        Club.objects.filter(pk=self.club.pk).update(followers_count=7)
+        out = StringIO()
+        call_command("reconcile_counters", "--dry-run", stdout=out)
+        self.assertIn("clubs.Club.followers_count: checked 1, drifted 1, total drift 4", out.getvalue())
+        self.assertEqual(self.counts()[0], 7)
+        call_command("reconcile_counters", "--chunk-size", "1", stdout=StringIO())
+        self.assertEqual(self.counts()[0], 3)
+
+
+class RelationToggleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner", password="pass")
+        cls.user = User.objects.create_user(username="member", password="pass")
+        cls.club = Club.objects.create(
+            name="Chess", description="desc", created_by=cls.owner
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f"/api/clubs/{self.club.pk}/follow/"
+
+    def followers(self):
+        self.club.refresh_from_db()
+        return self.club.followers_count, self.club.followers.count()
+
+    def test_put_and_delete_are_idempotent(self):
+        for _ in range(2):
+            response = self.client.put(self.url)
+            self.assertEqual(response.data, {"followed": True})
+        self.assertEqual(self.followers(), (1, 1))
+        for _ in range(2):
+            response = self.client.delete(self.url)
+            self.assertEqual(response.data, {"followed": False})
+        self.assertEqual(self.followers(), (0, 0))
+
+    def test_toggle_does_not_load_followers(self):
+        others = User.objects.bulk_create(
+            User(username=f"user{i}") for i in range(20)
+        )
+        self.club.followers.add(*others)
+        # DELETE + INSERT + counter UPDATE and the savepoint pair, then the
+        # home-feed timeline backfill or cleanup.
+        with self.assertNumQueries(6):
+            response = self.client.post(self.url)
+        self.assertEqual(response.data, {"followed": True})
+        with self.assertNumQueries(5):
+            response = self.client.post(self.url)
+        self.assertEqual(response.data, {"followed": False})
+        self.assertEqual(self.followers(), (20, 20))
+
+    def test_missing_object_is_404(self):
+        for method in (self.client.post, self.client.put, self.client.delete):
+            response = method("/api/clubs/999/follow/")
+            self.assertEqual(response.status_code, 404)
+        response = self.client.put("/api/events/999/toggle-follow/")
+        self.assertEqual(response.status_code, 404)
+
+
+class SyncRelationsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        from events.models import Event
+
+        cls.owner = User.objects.create_user(username="owner", password="pass")
+        cls.user = User.objects.create_user(username="member", password="pass")
+        cls.clubs = [
+            Club.objects.create(name=f"Club {i}", description="d", created_by=cls.owner)
+            for i in range(3)
+        ]
+        cls.posts = [
+            ClubPost.objects.create(
+                club=cls.clubs[0], title=f"Post {i}", content="...", created_by=cls.owner
+            )
+            for i in range(10)
+        ]
+        cls.event = Event.objects.create(
+            title="Fair", description="...", date="2026-01-01T10:00Z", created_by=cls.owner
+        )
+        cls.posts[0].liked_by.add(cls.user, cls.owner)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def sync(self, operations):
+        return self.client.post(
+            "/api/sync/relations/", {"operations": operations}, format="json"
+        )
+
+    def test_applies_batch_and_reports_counts(self):
+        response = self.sync(
+            [{"kind": "post_like", "id": p.pk, "state": True} for p in self.posts]
+            + [
+                {"kind": "post_like", "id": self.posts[0].pk, "state": False},
+                {"kind": "club_follow", "id": self.clubs[1].pk, "state": True},
+                {"kind": "event_follow", "id": self.event.pk, "state": True},
+                {"kind": "club_follow", "id": 999, "state": True},
+            ]
+        )
+        self.assertEqual(response.status_code, 200)
+        results = {(r["kind"], r["id"]): r for r in response.data["results"]}
+        self.assertEqual(
+            results[("post_like", self.posts[0].pk)]["state"], False
+        )
+        self.assertEqual(results[("post_like", self.posts[0].pk)]["count"], 1)
+        self.assertEqual(results[("post_like", self.posts[5].pk)]["count"], 1)
+        self.assertEqual(results[("club_follow", self.clubs[1].pk)]["count"], 1)
+        self.assertEqual(results[("event_follow", self.event.pk)]["state"], True)
+        self.assertIsNone(results[("club_follow", 999)]["state"])
+        self.assertEqual(self.user.liked_posts.count(), 9)
+
+    def test_replaying_a_batch_is_a_no_op(self):
+        operations = [
+            {"kind": "post_like", "id": p.pk, "state": True} for p in self.posts
+        ]
+        self.sync(operations)
+        response = self.sync(operations)
+        self.assertTrue(all(r["count"] in (1, 2) for r in response.data["results"]))
+        self.posts[0].refresh_from_db()
+        self.assertEqual(self.posts[0].likes_count, 2)
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        counts = []
+        for posts in (self.posts[1:3], self.posts[3:]):
+            operations = [
+                {"kind": "post_like", "id": p.pk, "state": True} for p in posts
+            ] + [{"kind": "post_like", "id": self.posts[0].pk, "state": False}]
+            with CaptureQueriesContext(connection) as queries:
+                self.sync(operations)
+            counts.append(len(queries))
+            self.posts[0].liked_by.add(self.user)
+        # Savepoint pair, existing ids, current links, one DELETE, one
+        # INSERT, one recounting UPDATE, counts and the club ids whose
+        # cached post lists are invalidated.
+        self.assertEqual(counts, [9, 9])
+
+    def test_counters_follow_the_rows_written(self):
+        from unittest import mock
+
+        from backend import relations
+
+        post = self.posts[3]
+        real = relations.linked_ids
+
+        def stale_links(*args):
+            # Another replay of the same queue commits right after our
+            # SELECT of the current links.
+            links = real(*args)
+            post.liked_by.add(self.user)
+            return links
+
+        with mock.patch.object(relations, "linked_ids", stale_links):
+            self.sync([{"kind": "post_like", "id": post.pk, "state": True}])
+
+        post.refresh_from_db()
+        self.assertEqual(post.likes_count, 1)
+        self.assertEqual(post.liked_by.count(), 1)
+
+    def test_rejects_a_body_that_is_not_an_object(self):
+        response = self.client.post(
+            "/api/sync/relations/",
+            [{"kind": "post_like", "id": 1, "state": True}],
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_rejects_unknown_kind(self):
+        response = self.sync([{"kind": "nope", "id": 1, "state": True}])
+        self.assertEqual(response.status_code, 400)
+
+
+class PayloadCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner", password="pass")
+        cls.user = User.objects.create_user(username="member", password="pass")
+        cls.club = Club.objects.create(
+            name="Chess", description="desc", created_by=cls.owner
+        )
+        cls.post = ClubPost.objects.create(
+            club=cls.club, title="Hello", content="...", created_by=cls.owner
+        )
+        cls.club.followers.add(cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.other = APIClient()
+        self.other.force_authenticate(self.owner)
+
+    def test_hits_only_look_up_per_user_flags(self):
+        url = f"/api/clubs/{self.club.pk}/"
+        self.other.get(url)
+        # Validator, then the follow and like flags of this user.
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertTrue(response.data["is_followed"])
+        self.assertFalse(response.data["posts"][0]["is_liked"])
+        self.client.get("/api/clubs/")
+        with self.assertNumQueries(1):
+            response = APIClient().get("/api/clubs/")
+        self.assertFalse(response.data["results"][0]["is_followed"])
+
+    def test_toggles_invalidate_cached_payloads(self):
+        self.client.get(f"/api/clubs/{self.club.pk}/posts/")
+        self.client.post(f"/api/clubs/posts/{self.post.pk}/like/")
+        response = self.other.get(f"/api/clubs/{self.club.pk}/posts/")
+        self.assertEqual(response.data["results"][0]["likes_count"], 1)
+        self.assertFalse(response.data["results"][0]["is_liked"])
+
+        self.other.get("/api/clubs/")
+        self.other.post(f"/api/clubs/{self.club.pk}/follow/")
+        response = self.client.get("/api/clubs/")
+        self.assertEqual(response.data["results"][0]["followers_count"], 2)
+        self.assertTrue(response.data["results"][0]["is_followed"])
+
+    def test_admin_writes_invalidate_cached_payloads(self):
+        admin = User.objects.create_superuser(username="admin", password="pass")
+        self.client.get(f"/api/clubs/{self.club.pk}/")
+        client = APIClient()
+        client.force_authenticate(admin)
+        client.post(
+            f"/api/clubs/{self.club.pk}/posts/create/",
+            {"title": "New", "content": "..."},
+        )
+        client.patch(f"/api/clubs/admin/clubs/{self.club.pk}/", {"name": "Go"})
+        response = self.client.get(f"/api/clubs/{self.club.pk}/")
+        self.assertEqual(response.data["name"], "Go")
+        self.assertEqual(response.data["posts"][0]["title"], "New")
+
+    def test_works_with_file_based_cache(self):
+        import tempfile
+
+        from django.test import override_settings
+
+        with tempfile.TemporaryDirectory() as location:
+            backend = {
+                "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                "LOCATION": location,
+            }
+            with override_settings(CACHES={"default": backend}):
+                first = self.client.get("/api/clubs/").data
+                with self.assertNumQueries(2):
+                    second = self.client.get("/api/clubs/").data
+                self.assertEqual(first, second)
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner", password="pass")
+        cls.user = User.objects.create_user(username="member", password="pass")
+        cls.club = Club.objects.create(
+            name="Chess", description="desc", created_by=cls.owner
+        )
+        cls.post = ClubPost.objects.create(
+            club=cls.club, title="Hello", content="...", created_by=cls.owner
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def revalidate(self, url, etag):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_resources_answer_304_with_one_query(self):
+        for url in ("/api/clubs/", f"/api/clubs/{self.club.pk}/", "/api/events/"):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            with self.assertNumQueries(1):
+                again = self.revalidate(url, response["ETag"])
+            self.assertEqual(again.status_code, 304)
+            self.assertEqual(again.content, b"")
+
+        response = self.client.get("/api/me/")
+        with self.assertNumQueries(0):
+            again = self.client.get(
+                "/api/me/", HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+            )
+        self.assertEqual(again.status_code, 304)
+
+    def test_changes_produce_a_new_etag(self):
+        url = f"/api/clubs/{self.club.pk}/"
+        etag = self.client.get(url)["ETag"]
+        self.client.post(f"/api/clubs/posts/{self.post.pk}/like/")
+        response = self.revalidate(url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data["posts"][0]["is_liked"])
+
+        etag = response["ETag"]
+        self.post.delete()
+        self.assertEqual(self.revalidate(url, etag).status_code, 200)
+
+    def test_etag_is_per_user(self):
+        etag = self.client.get("/api/clubs/")["ETag"]
+        other = APIClient()
+        other.force_authenticate(self.owner)
+        self.assertEqual(
+            other.get("/api/clubs/", HTTP_IF_NONE_MATCH=etag).status_code, 200
+        )
+
+
+class FeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username="admin", password="pass")
+        cls.user = User.objects.create_user(username="member", password="pass")
+        cls.clubs = [
+            Club.objects.create(name=f"Club {i}", description="d", created_by=cls.admin)
+            for i in range(4)
+        ]
+
+    def setUp(self):
+        self.admin_client = APIClient()
+        self.admin_client.force_authenticate(self.admin)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def publish(self, club, title):
+        response = self.admin_client.post(
+            f"/api/clubs/{club.pk}/posts/create/", {"title": title, "content": "..."}
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.data["id"]
+
+    def follow(self, club, method="put"):
+        getattr(self.client, method)(f"/api/clubs/{club.pk}/follow/")
+
+    def feed(self, page_size=2):
+        ids, url = [], f"/api/clubs/me/feed/?page_size={page_size}"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [p["id"] for p in response.data["results"]]
+            url = response.data["next"]
+        return ids
+
+    def expected(self, clubs):
+        return list(
+            ClubPost.objects.filter(club__in=clubs)
+            .order_by("-created_at", "-id")
+            .values_list("id", flat=True)
+        )
+
+    def check_feed(self):
+        self.publish(self.clubs[0], "before follow")
+        self.follow(self.clubs[0])
+        self.follow(self.clubs[1])
+        for i in range(6):
+            self.publish(self.clubs[i % 3], f"Post {i}")
+        self.follow(self.clubs[2])
+        self.assertEqual(self.feed(), self.expected(self.clubs[:3]))
+
+        self.follow(self.clubs[0], "delete")
+        self.assertEqual(self.feed(page_size=3), self.expected(self.clubs[1:3]))
+
+    def test_feed_from_followed_clubs(self):
+        self.check_feed()
+
+    def test_feed_from_timeline(self):
+        from django.test import override_settings
+
+        with override_settings(FEED_TIMELINE_THRESHOLD=1):
+            self.check_feed()
+
+    def test_feed_query_count_is_constant(self):
+        from django.test import override_settings
+
+        with override_settings(FEED_TIMELINE_THRESHOLD=1):
+            for club in self.clubs:
+                self.follow(club)
+                for i in range(5):
+                    self.publish(club, f"{club.name} {i}")
+        for threshold, queries in ((100, 2), (1, 3)):
+            with override_settings(FEED_TIMELINE_THRESHOLD=threshold):
+                with self.assertNumQueries(queries):
+                    response = self.client.get("/api/clubs/me/feed/")
+            self.assertEqual(len(response.data["results"]), 20)
+            self.assertEqual(response.data["results"][0]["club_name"], "Club 3")
+
+
+    def test_only_timeline_users_get_entries(self):
+        from io import StringIO
+
+        from django.core.management import call_command
+        from django.test import override_settings
+
+        from .models import FeedEntry
+
+        light = User.objects.create_user(username="light", password="pass")
+        self.clubs[0].followers.add(light)
+        with override_settings(FEED_TIMELINE_THRESHOLD=2):
+            self.follow(self.clubs[0])
+            self.assertFalse(FeedEntry.objects.exists())
+            self.publish(self.clubs[0], "early")
+            self.assertFalse(FeedEntry.objects.exists())
+
+            # Crossing the threshold fills the whole timeline.
+            self.follow(self.clubs[1])
+            self.publish(self.clubs[1], "late")
+            entries = FeedEntry.objects.values_list("user_id", flat=True)
+            self.assertEqual(list(entries), [self.user.pk] * 2)
+            self.assertEqual(self.feed(), self.expected(self.clubs[:2]))
+
+            self.follow(self.clubs[1], "delete")
+            self.assertFalse(FeedEntry.objects.exists())
+
+        with override_settings(FEED_TIMELINE_THRESHOLD=1):
+            call_command("rebuild_timelines", stdout=StringIO())
+        self.assertEqual(
+            set(FeedEntry.objects.values_list("user_id", flat=True)),
+            {self.user.pk, light.pk},
+        )
+
+
+class SeedLoadTests(TestCase):
+    def seed(self, prefix):
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        call_command(
+            "seed_load",
+            "--epoch=2026-01-01T00:00",
+            users=60,
+            clubs=5,
+            posts=40,
+            likes=300,
+            follows=150,
+            events=5,
+            event_follows=50,
+            prefix=prefix,
+            password="secret",
+            stdout=StringIO(),
+        )
+        users = User.objects.filter(username__startswith=f"{prefix}-user")
+        clubs = Club.objects.filter(name__startswith=f"{prefix} club")
+        return users, clubs
+
+    def follows(self, prefix):
+        return sorted(
+            Club.followers.through.objects.filter(
+                club__name__startswith=f"{prefix} club"
+            ).values_list("club__name", "user__username")
+        )
+
+    def test_seed_is_deterministic_and_consistent(self):
+        from django.test import override_settings
+
+        from events.models import Event
+
+        from .models import FeedEntry
+
+        with override_settings(FEED_TIMELINE_THRESHOLD=3):
+            users, clubs = self.seed("a")
+            self.seed("b")
+        self.assertEqual(users.count(), 60)
+        self.assertTrue(users.first().check_password("secret"))
+        # One hash for everyone, the same on every run.
+        passwords = User.objects.filter(username__endswith="-user0")
+        self.assertEqual(passwords.values("password").distinct().count(), 1)
+        self.assertEqual(users.values("password").distinct().count(), 1)
+        # Both runs dated their events around the same --epoch.
+        dates = list(Event.objects.order_by("pk").values_list("date", flat=True))
+        self.assertEqual(dates[:5], dates[5:])
+
+        renamed = [
+            (club.replace("a club", "b club"), user.replace("a-", "b-"))
+            for club, user in self.follows("a")
+        ]
+        self.assertEqual(renamed, self.follows("b"))
+
+        for club in clubs:
+            self.assertEqual(club.followers_count, club.followers.count())
+        heavy = users.annotate(total=Count("followed_clubs")).filter(total__gte=3)
+        self.assertTrue(heavy.exists())
+        for user in heavy:
+            self.assertEqual(
+                set(FeedEntry.objects.filter(user=user).values_list("post", flat=True)),
+                set(
+                    ClubPost.objects.filter(club__followers=user).values_list(
+                        "pk", flat=True
+                    )
+                ),
+            )
+
+
+class LoadBenchReportTests(TestCase):
+    def test_percentiles_and_mix(self):
+        from backend import loadbench
+
+        samples = [("club_list", 200, float(ms)) for ms in range(1, 101)]
+        samples.append(("like_toggle", 404, 5.0))
+        routes = loadbench.summarize(samples, elapsed=2)
+        self.assertEqual(
+            [routes["club_list"][f"p{p}_ms"] for p in (50, 95, 99)], [50, 95, 99]
+        )
+        self.assertEqual(routes["all"]["requests"], 101)
+        self.assertEqual(routes["all"]["errors"], 1)
+        self.assertEqual(routes["club_list"]["rps"], 50)
+        self.assertEqual(
+            loadbench.parse_mix("club_list=3,feed"), {"club_list": 3, "feed": 1}
+        )
+        with self.assertRaises(ValueError):
+            loadbench.parse_mix("nope=1")
+
+
+class LoadBenchRunTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="load-user0", password="pass")
+        fans = [User.objects.create(username=f"fan{i}") for i in range(3)]
+        cls.clubs = [
+            Club.objects.create(name=f"Club {i}", description="d", created_by=cls.user)
+            for i in range(3)
+        ]
+        # The newest club and its newest post are the most popular.
+        cls.clubs[2].followers.add(*fans)
+        cls.clubs[1].followers.add(fans[0])
+        cls.posts = [
+            ClubPost.objects.create(
+                club=cls.clubs[2], title=f"Post {i}", content="...", created_by=cls.user
+            )
+            for i in range(3)
+        ]
+        cls.posts[2].liked_by.add(*fans[:2])
+        cls.posts[0].liked_by.add(fans[0])
+
+    def setUp(self):
+        cache.clear()
+
+    async def test_run_through_the_asgi_app(self):
+        from backend import loadbench
+        from backend.asgi import application
+
+        benchmark = loadbench.LoadBenchmark(
+            loadbench.AsgiTransport(application),
+            ["load-user0"],
+            "pass",
+            concurrency=3,
+            requests=30,
+        )
+        result = await benchmark.run()
+
+        self.assertEqual(benchmark.ids["clubs"], [c.pk for c in reversed(self.clubs)])
+        self.assertEqual(
+            benchmark.ids["posts"], [self.posts[2].pk, self.posts[0].pk, self.posts[1].pk]
+        )
+        self.assertEqual(result["config"]["requests"], 30)
+        self.assertTrue(result["config"]["serialized"])
+        self.assertEqual(result["routes"]["all"]["requests"], 30)
+        self.assertEqual(result["routes"]["all"]["errors"], 0)
+        self.assertIn("served one at a time", loadbench.format_report(result))
+
+
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        import shutil
+        import tempfile
+
+        from django.test import override_settings
+
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        settings = override_settings(MEDIA_ROOT=media, IMAGE_VARIANT_WORKERS=0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        cache.clear()
+        self.admin = User.objects.create_superuser(username="admin", password="pass")
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def image(self, size=(1600, 1200)):
+        from io import BytesIO
+
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from PIL import Image
+
+        buffer = BytesIO()
+        Image.new("RGB", size, "red").save(buffer, "JPEG")
+        return SimpleUploadedFile("photo.jpg", buffer.getvalue(), "image/jpeg")
+
+    def test_upload_generates_variants(self):
+        from PIL import Image
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/api/clubs/admin/clubs/",
+                {"name": "Photo club", "description": "d", "image": self.image()},
+                format="multipart",
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["image_variants"], {})
+
+        club = Club.objects.get(pk=response.data["id"])
+        self.assertEqual(set(club.image_variants), {"thumb", "medium"})
+        with club.image.storage.open(club.image_variants["thumb"]) as file:
+            self.assertEqual(Image.open(file).size, (128, 96))
+
+        data = self.client.get("/api/clubs/").data["results"][0]
+        self.assertTrue(data["image_variants"]["thumb"].endswith(".thumb.webp"))
+
+        # Replacing the image drops the old variants until the new ones exist.
+        old = list(club.image_variants.values())
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f"/api/clubs/admin/clubs/{club.pk}/",
+                {"image": self.image((300, 300))},
+                format="multipart",
+            )
+        self.assertEqual(response.data["image_variants"], {})
+        self.assertFalse(any(club.image.storage.exists(name) for name in old))
+        club.refresh_from_db()
+        self.assertEqual(set(club.image_variants), {"thumb", "medium"})
+        self.assertTrue(
+            all(club.image.storage.exists(n) for n in club.image_variants.values())
+        )
+
+    def test_stale_worker_deletes_its_files(self):
+        from unittest import mock
+
+        from backend import images
+
+        club = Club(name="Photo club", description="d", created_by=self.admin)
+        club.image.save("old.jpg", self.image(), save=True)
+        written = {}
+
+        def render_then_replace(field_file):
+            written.update(render(field_file))
+            # The image is replaced while the worker renders the old one.
+            Club.objects.filter(pk=club.pk).update(image="other.jpg")
+            return written
+
+        render = images.render_variants
+        with mock.patch.object(images, "render_variants", render_then_replace):
+            images.generate_variants("clubs.Club", club.pk)
+
+        club.refresh_from_db()
+        self.assertEqual(club.image_variants, {})
+        self.assertEqual(set(written), {"thumb", "medium"})
+        self.assertFalse(any(club.image.storage.exists(n) for n in written.values()))
+
+    def test_backfill_command(self):
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        club = Club(name="Old club", description="d", created_by=self.admin)
+        club.image.save("old.jpg", self.image(), save=True)
+        out = StringIO()
+        call_command("build_image_variants", stdout=out)
+        self.assertIn("clubs.Club.image: 1 of 1 images processed", out.getvalue())
+        club.refresh_from_db()
+        self.assertEqual(set(club.image_variants), {"thumb", "medium"})
+
+
+class MediaServingTests(TestCase):
+    def setUp(self):
+        import shutil
+        import tempfile
+
+        from django.test import override_settings
+
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        settings = override_settings(MEDIA_ROOT=media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.content = bytes(range(256)) * 40
+        with open(f"{media}/file.pdf", "wb") as file:
+            file.write(self.content)
+
+    def body(self, response):
+        return b"".join(response.streaming_content)
+
+    def test_full_file_and_revalidation(self):
+        response = self.client.get("/media/file.pdf")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.content)
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(response["Cache-Control"], "public, max-age=3600")
+
+        response = self.client.get(
+            "/media/file.pdf", HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(response.status_code, 304)
+
+        self.assertEqual(self.client.get("/media/missing.pdf").status_code, 404)
+        self.assertEqual(self.client.get("/media/../manage.py").status_code, 404)
+
+    def test_text_files_are_not_compressed(self):
+        from django.conf import settings
+
+        with open(f"{settings.MEDIA_ROOT}/notes.txt", "w") as file:
+            file.write("notes " * 1000)
+        response = self.client.get("/media/notes.txt", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertFalse(response["ETag"].startswith("W/"))
+        self.assertEqual(self.body(response), b"notes " * 1000)
+
+    def test_ranges(self):
+        response = self.client.get("/media/file.pdf", HTTP_RANGE="bytes=100-199")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes 100-199/{len(self.content)}")
+        self.assertEqual(self.body(response), self.content[100:200])
+
+        response = self.client.get("/media/file.pdf", HTTP_RANGE="bytes=-10")
+        self.assertEqual(self.body(response), self.content[-10:])
+
+        response = self.client.get("/media/file.pdf", HTTP_RANGE="bytes=99999-")
+        self.assertEqual(response.status_code, 416)
+
+        # A stale If-Range gets the whole file.
+        response = self.client.get(
+            "/media/file.pdf", HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE='"old"'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_proxy_offload_and_immutable_names(self):
+        from django.test import override_settings
+
+        with override_settings(
+            MEDIA_ACCEL_REDIRECT="/protected-media/",
+            MEDIA_IMMUTABLE_PREFIXES=("file",),
+        ):
+            response = self.client.get("/media/file.pdf")
+        self.assertEqual(response["X-Accel-Redirect"], "/protected-media/file.pdf")
+        self.assertEqual(response.content, b"")
+        self.assertIn("immutable", response["Cache-Control"])
+
+
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        import shutil
+        import tempfile
+
+        from django.test import override_settings
+
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        settings = override_settings(
+            MEDIA_ROOT=f"{root}/media",
+            CHUNKED_UPLOAD_DIR=f"{root}/uploads",
+            UPLOAD_CHUNK_SIZE=10,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        cache.clear()
+        self.admin = User.objects.create_superuser(username="admin", password="pass")
+        self.clubs = [
+            Club.objects.create(name=f"Club {i}", description="d", created_by=self.admin)
+            for i in range(2)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.content = b"0123456789abcdefghijKLMNO"
+
+    def start(self, club, **extra):
+        return self.client.post(
+            f"/api/clubs/admin/clubs/{club.pk}/uploads/",
+            {"filename": "Rules.PDF", "size": len(self.content), **extra},
+            format="json",
+        )
+
+    def put_chunk(self, upload, index, data=None, **headers):
+        data = self.content[index * 10 : index * 10 + 10] if data is None else data
+        return self.client.put(
+            f"/api/clubs/admin/uploads/{upload}/chunks/{index}/",
+            data,
+            content_type="application/octet-stream",
+            **headers,
+        )
+
+    def test_resumable_upload_and_dedup(self):
+        import hashlib
+
+        from .models import Blob
+
+        response = self.start(self.clubs[0])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["chunk_count"], 3)
+        self.assertEqual(response.data["content_type"], "application/pdf")
+        upload = response.data["id"]
+
+        self.assertEqual(self.put_chunk(upload, 2).status_code, 200)
+        self.assertEqual(self.put_chunk(upload, 0).status_code, 200)
+        self.assertEqual(self.put_chunk(upload, 1, b"short").status_code, 400)
+        self.assertEqual(
+            self.put_chunk(upload, 1, HTTP_X_CHUNK_SHA256="0" * 64).status_code, 400
+        )
+        response = self.client.get(f"/api/clubs/admin/uploads/{upload}/")
+        self.assertEqual(response.data["received_chunks"], [0, 2])
+        response = self.client.post(f"/api/clubs/admin/uploads/{upload}/commit/")
+        self.assertEqual(response.data["missing_chunks"], ["1"])
+
+        self.put_chunk(upload, 1)
+        response = self.client.post(f"/api/clubs/admin/uploads/{upload}/commit/")
+        self.assertEqual(response.status_code, 201)
+        sha256 = hashlib.sha256(self.content).hexdigest()
+        self.assertEqual(response.data["file"]["sha256"], sha256)
+
+        detail = self.client.get(f"/api/clubs/{self.clubs[0].pk}/").data
+        self.assertEqual(detail["files"][0]["name"], "Rules.PDF")
+        download = self.client.get(detail["files"][0]["url"])
+        self.assertEqual(b"".join(download.streaming_content), self.content)
+        self.assertIn("immutable", download["Cache-Control"])
+
+        # The same content for another club is attached without an upload.
+        response = self.start(self.clubs[1], sha256=sha256)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["file"]["path"], detail["files"][0]["path"])
+        self.assertEqual(Blob.objects.count(), 1)
+
+        response = self.client.delete(
+            f"/api/clubs/admin/clubs/{self.clubs[1].pk}/files/{sha256}/"
+        )
+        self.assertEqual(response.status_code, 204)
+        self.clubs[1].refresh_from_db()
+        self.assertEqual(self.clubs[1].files, [])
+
+    def test_checksum_mismatch_discards_upload(self):
+        response = self.start(self.clubs[0], sha256="f" * 64)
+        upload = response.data["id"]
+        for index in range(3):
+            self.put_chunk(upload, index)
+        response = self.client.post(f"/api/clubs/admin/uploads/{upload}/commit/")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(f"/api/clubs/admin/uploads/{upload}/")
+        self.assertEqual(response.status_code, 404)
+
+    def test_legacy_file_entries(self):
+        club = self.clubs[0]
+        club.files = ["legacy.pdf", 3]
+        club.save()
+        upload = self.start(club).data["id"]
+        for index in range(3):
+            self.put_chunk(upload, index)
+        sha256 = self.client.post(
+            f"/api/clubs/admin/uploads/{upload}/commit/"
+        ).data["file"]["sha256"]
+
+        for path in (f"/api/clubs/{club.pk}/", f"/api/clubs/admin/clubs/{club.pk}/"):
+            response = self.client.get(path)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                [entry["name"] for entry in response.data["files"]],
+                ["legacy.pdf", "Rules.PDF"],
+            )
+        response = self.client.delete(
+            f"/api/clubs/admin/clubs/{club.pk}/files/{sha256}/"
+        )
+        self.assertEqual(response.status_code, 204)
+        club.refresh_from_db()
+        self.assertEqual(club.files, ["legacy.pdf", 3])
+
+    def test_expire_uploads(self):
+        import io
+        import os
+        import time
+        from datetime import timedelta
+        from pathlib import Path
+
+        from django.conf import settings
+        from django.core.management import call_command
+        from django.utils import timezone
+
+        from .models import UploadSession
+
+        upload = self.start(self.clubs[0]).data["id"]
+        self.put_chunk(upload, 0)
+        live = self.start(self.clubs[1]).data["id"]
+        self.put_chunk(live, 0)
+        UploadSession.objects.filter(pk=upload).update(
+            created_at=timezone.now() - timedelta(seconds=settings.UPLOAD_SESSION_TTL + 1)
+        )
+        orphan = Path(settings.CHUNKED_UPLOAD_DIR) / "orphan"
+        orphan.mkdir()
+        old = time.time() - settings.UPLOAD_SESSION_TTL - 1
+        os.utime(orphan, (old, old))
+
+        # Expired sessions can't be resumed any more.
+        self.assertEqual(self.put_chunk(upload, 1).status_code, 404)
+        out = io.StringIO()
+        call_command("expire_uploads", stdout=out)
+
+        self.assertIn("Expired 1 upload sessions, removed 1 orphaned", out.getvalue())
+        self.assertEqual(UploadSession.objects.count(), 1)
+        self.assertFalse((Path(settings.CHUNKED_UPLOAD_DIR) / upload).exists())
+        self.assertFalse(orphan.exists())
+        response = self.client.get(f"/api/clubs/admin/uploads/{live}/")
+        self.assertEqual(response.data["received_chunks"], [0])
+
+    def test_expire_uploads_deletes_unused_blobs(self):
+        from datetime import timedelta
+
+        from django.conf import settings
+        from django.core.files.storage import default_storage
+        from django.utils import timezone
+
+        from .models import Blob
+        from .uploads import expire_uploads
+
+        def upload(club):
+            upload = self.start(club).data["id"]
+            for index in range(3):
+                self.put_chunk(upload, index)
+            return self.client.post(
+                f"/api/clubs/admin/uploads/{upload}/commit/"
+            ).data["file"]
+
+        shared = upload(self.clubs[0])
+        self.start(self.clubs[1], sha256=shared["sha256"])
+        self.content = b"another file"
+        unused = upload(self.clubs[1])
+        self.client.delete(
+            f"/api/clubs/admin/clubs/{self.clubs[0].pk}/files/{shared['sha256']}/"
+        )
+        self.client.delete(
+            f"/api/clubs/admin/clubs/{self.clubs[1].pk}/files/{unused['sha256']}/"
+        )
+
+        # Too recent: a commit may be about to attach it.
+        self.assertEqual(expire_uploads(), (0, 0, 0))
+        Blob.objects.update(
+            created_at=timezone.now() - timedelta(seconds=settings.UPLOAD_SESSION_TTL + 1)
+        )
+        self.assertEqual(expire_uploads(), (0, 0, 1))
+        self.assertEqual(
+            list(Blob.objects.values_list("sha256", flat=True)), [shared["sha256"]]
+        )
+        self.assertTrue(default_storage.exists(shared["path"]))
+        self.assertFalse(default_storage.exists(unused["path"]))
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(username="admin", password="pass")
+        self.robotics = Club.objects.create(
+            name="Robotics", description="We build robots", created_by=self.admin
+        )
+        self.chess = Club.objects.create(
+            name="Chess", description="Weekly robotics-free games", created_by=self.admin
+        )
+        self.post = ClubPost.objects.create(
+            club=self.chess,
+            title="Tournoi d'échecs",
+            content="Inscriptions ouvertes",
+            created_by=self.admin,
+        )
+        self.client = APIClient()
+
+    def search(self, **params):
+        response = self.client.get("/api/search/", params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_ranks_title_matches_first(self):
+        results = self.search(q="robotics")["results"]
+
+        self.assertEqual(
+            [(r["type"], r["id"]) for r in results],
+            [("club", self.robotics.pk), ("club", self.chess.pk)],
+        )
+
+    def test_prefix_diacritics_and_single_query(self):
+        with self.assertNumQueries(1):
+            results = self.search(q="echec")["results"]
+
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]["type"], "post")
+        self.assertEqual(results[0]["id"], self.post.pk)
+        self.assertEqual(results[0]["club"], self.chess.pk)
+
+    def test_index_follows_saves_and_deletes(self):
+        from events.models import Event
+        from django.utils import timezone
+
+        event = Event.objects.create(
+            title="Robotics fair", description="", date=timezone.now(), created_by=self.admin
+        )
+        self.robotics.name = "Makers"
+        self.robotics.description = "Soldering"
+        self.robotics.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.chess.delete()
+
+        results = self.search(q="robotics")["results"]
+
+        self.assertEqual([(r["type"], r["id"]) for r in results], [("event", event.pk)])
+
+    def test_type_filter_and_pages(self):
+        for i in range(3):
+            ClubPost.objects.create(
+                club=self.robotics, title=f"Robot {i}", content="", created_by=self.admin
+            )
+
+        first = self.search(q="robot", type="post", page_size=2)
+        second = self.client.get(first["next"]).json()
+
+        ids = [r["id"] for r in first["results"] + second["results"]]
+        self.assertEqual(len(ids), 3)
+        self.assertEqual(len(set(ids)), 3)
+        self.assertIsNone(second["next"])
+        self.assertEqual(
+            self.client.get("/api/search/", {"q": "x", "type": "user"}).status_code, 400
+        )
+        self.assertEqual(self.client.get("/api/search/", {"q": "'\"*"}).status_code, 400)
+
+    def test_rebuild_command(self):
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        ClubPost.objects.bulk_create(
+            [ClubPost(club=self.chess, title="Blitz", content="", created_by=self.admin)]
+        )
+        self.assertEqual(self.search(q="blitz")["results"], [])
+
+        out = StringIO()
+        call_command("rebuild_search_index", stdout=out)
+
+        self.assertIn("post: 2 indexed", out.getvalue())
+        self.assertEqual(len(self.search(q="blitz")["results"]), 1)
+
+
+class LiveUpdateTests(TestCase):
+    def setUp(self):
+        from django.test import override_settings
+
+        settings = override_settings(PUSH_LIKES_INTERVAL=0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        cache.clear()
+        self.admin = User.objects.create_superuser(username="admin", password="pass")
+        self.club = Club.objects.create(name="Club", description="d", created_by=self.admin)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def socket(self, path, actions, expected, query=b""):
+        """
+        Run ``actions``, each committing on its own, while connected to
+        ``path``; returns what the app sent.
+        """
+        import asyncio
+
+        from asgiref.sync import async_to_sync, sync_to_async
+
+        from backend.asgi import application
+
+        def act():
+            for action in actions:
+                with self.captureOnCommitCallbacks(execute=True):
+                    action()
+
+        async def session():
+            inbox, outbox = asyncio.Queue(), asyncio.Queue()
+            scope = {"type": "websocket", "path": path, "query_string": query}
+            await inbox.put({"type": "websocket.connect"})
+            task = asyncio.ensure_future(application(scope, inbox.get, outbox.put))
+            sent = [await outbox.get()]
+            if sent[0]["type"] == "websocket.accept":
+                await sync_to_async(act)()
+                for _ in range(expected):
+                    sent.append(await asyncio.wait_for(outbox.get(), 5))
+                await inbox.put({"type": "websocket.disconnect", "code": 1000})
+            await asyncio.wait_for(task, 5)
+            return sent
+
+        return async_to_sync(session)()
+
+    def test_pushes_post_changes_and_like_counts(self):
+        import json
+
+        def create():
+            self.client.post(
+                f"/api/clubs/{self.club.pk}/posts/create/",
+                {"title": "Hello", "content": "..."},
+            )
+
+        def post_url():
+            return f"/api/clubs/admin/posts/{ClubPost.objects.get().pk}/"
+
+        def like():
+            self.client.post(f"/api/clubs/posts/{ClubPost.objects.get().pk}/like/")
+
+        def edit():
+            self.client.patch(post_url(), {"title": "Edited"})
+
+        def delete():
+            self.client.delete(post_url())
+
+        sent = self.socket(
+            f"/ws/clubs/{self.club.pk}/", [create, like, edit, delete], 4
+        )
+
+        self.assertEqual(sent[0]["type"], "websocket.accept")
+        messages = [json.loads(event["text"]) for event in sent[1:]]
+        post = messages[0]["post"]["id"]
+        self.assertEqual(
+            [m["type"] for m in messages],
+            ["post.created", "post.likes", "post.updated", "post.deleted"],
+        )
+        self.assertEqual(messages[1]["likes"], {str(post): 1})
+        self.assertEqual(messages[2]["post"]["title"], "Edited")
+        self.assertFalse(messages[2]["post"]["is_liked"])
+        self.assertEqual(messages[3]["id"], post)
+
+        # A reconnecting client gets what it missed.
+        replay = self.socket(
+            f"/ws/clubs/{self.club.pk}/",
+            [],
+            2,
+            query=f"last_seq={messages[1]['seq']}".encode(),
+        )
+        self.assertEqual(
+            [json.loads(event["text"])["type"] for event in replay[1:]],
+            ["post.updated", "post.deleted"],
+        )
+
+    def test_refuses_unknown_club(self):
+        sent = self.socket("/ws/clubs/999/", [], 0)
+
+        self.assertEqual(sent, [{"type": "websocket.close", "code": 4404}])
+
+
+class SparseFieldsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(username="admin", password="pass")
+        self.user = User.objects.create_user(username="member", password="pass")
+        self.club = Club.objects.create(
+            name="Robotics", description="We build robots", created_by=self.admin
+        )
+        self.post = ClubPost.objects.create(
+            club=self.club,
+            title="Kickoff",
+            content="word " * 100,
+            created_by=self.admin,
+        )
+        self.post.liked_by.add(self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_excerpt_is_kept_at_write_time(self):
+        from backend.excerpts import make_excerpt
+
+        self.assertEqual(self.club.excerpt, "We build robots")
+        self.assertEqual(self.post.excerpt, make_excerpt(self.post.content))
+        self.assertTrue(self.post.excerpt.endswith("word…"))
+        self.assertLessEqual(len(self.post.excerpt), 160)
+
+        self.post.content = "Rescheduled\n\n to   Monday"
+        self.post.save(update_fields=["content", "excerpt"])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.excerpt, "Rescheduled to Monday")
+
+    def test_fields_and_omit(self):
+        data = self.client.get(
+            "/api/clubs/", {"fields": "name,is_followed"}
+        ).json()["results"]
+        self.assertEqual(data, [{"id": self.club.pk, "name": "Robotics", "is_followed": False}])
+
+        post = self.client.get(
+            f"/api/clubs/{self.club.pk}/posts/", {"omit": "content"}
+        ).json()["results"][0]
+        self.assertNotIn("content", post)
+        self.assertEqual(post["excerpt"], self.post.excerpt)
+        self.assertTrue(post["is_liked"])
+
+    def test_nested_fields_on_club_detail(self):
+        data = self.client.get(
+            f"/api/clubs/{self.club.pk}/",
+            {"fields": "name,posts.title,posts.is_liked"},
+        ).json()
+
+        self.assertEqual(set(data), {"id", "name", "posts"})
+        self.assertEqual(
+            data["posts"], [{"id": self.post.pk, "title": "Kickoff", "is_liked": True}]
+        )
+
+    def test_omitted_columns_are_not_read(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get("/api/clubs/me/liked-posts/", {"omit": "content"})
+        sql = " ".join(query["sql"] for query in queries)
+        self.assertIn('"excerpt"', sql)
+        self.assertNotIn('"content"', sql)
+
+    def test_columns_no_field_outputs_are_not_read(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        # Club.content is in no club serializer; description is.
+        for path in ("/api/clubs/", f"/api/clubs/{self.club.pk}/"):
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(path, {"omit": "posts.content"})
+            club_sql = [q["sql"] for q in queries if 'FROM "clubs_club"' in q["sql"]]
+            self.assertTrue(club_sql)
+            self.assertFalse(any('"clubs_club"."content"' in sql for sql in club_sql))
+            self.assertTrue(any('"clubs_club"."description"' in sql for sql in club_sql))
+
+    def test_writes_ignore_sparse_parameters(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.post(
+            f"/api/clubs/{self.club.pk}/posts/create/?fields=id",
+            {"title": "New", "content": "Body"},
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["content"], "Body")
+        self.assertEqual(response.json()["excerpt"], "Body")
+
+    def test_fill_excerpts_command(self):
+        import io
+
+        from django.core.management import call_command
+
+        ClubPost.objects.filter(pk=self.post.pk).update(excerpt="")
+        out = io.StringIO()
+        call_command("fill_excerpts", stdout=out)
+
+        self.post.refresh_from_db()
+        self.assertTrue(self.post.excerpt)
+        self.assertIn("clubs.ClubPost.excerpt: 1 updated", out.getvalue())
+
+
+class RenderingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(username="admin", password="pass")
+        self.club = Club.objects.create(
+            name="Robotics", description="We build robots " * 20, created_by=self.admin
+        )
+        for i in range(30):
+            ClubPost.objects.create(
+                club=self.club,
+                title=f"Post {i}",
+                content="Meeting in room B12 " * 10,
+                created_by=self.admin,
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_fast_json_writes_what_drf_writes(self):
+        from datetime import datetime, timezone
+        from decimal import Decimal
+
+        from django.utils.functional import lazy
+        from rest_framework.renderers import JSONRenderer
+
+        from backend.renderers import FastJSONRenderer
+
+        data = self.client.get(f"/api/clubs/{self.club.pk}/").data
+        data["extra"] = {
+            1: Decimal("1.50"),
+            "at": datetime(2026, 3, 1, 9, 30, 0, 123456, tzinfo=timezone.utc),
+            "label": lazy(lambda: "Événement", str)(),
+        }
+        fast = FastJSONRenderer().render(data, "application/json", {})
+
+        self.assertEqual(fast, JSONRenderer().render(data, "application/json", {}))
+        self.assertEqual(
+            FastJSONRenderer().render(data, "application/json; indent=2", {}),
+            JSONRenderer().render(data, "application/json; indent=2", {}),
+        )
+
+    def test_large_bodies_are_compressed(self):
+        import gzip
+        import json
+
+        response = self.client.get(
+            f"/api/clubs/{self.club.pk}/posts/",
+            HTTP_ACCEPT_ENCODING="gzip, deflate, br;q=0",
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        body = json.loads(gzip.decompress(response.content))
+        self.assertEqual(len(body["results"]), 20)
+        self.assertEqual(int(response["Content-Length"]), len(response.content))
+
+        small = self.client.get(
+            "/api/clubs/", {"fields": "name"}, HTTP_ACCEPT_ENCODING="gzip"
+        )
+        self.assertFalse(small.has_header("Content-Encoding"))
+        plain = self.client.get(f"/api/clubs/{self.club.pk}/posts/")
+        self.assertFalse(plain.has_header("Content-Encoding"))
+
+    def test_compressed_etag_still_revalidates(self):
+        response = self.client.get(
+            f"/api/clubs/{self.club.pk}/", HTTP_ACCEPT_ENCODING="gzip"
+        )
+        etag = response["ETag"]
+        self.assertTrue(etag.startswith("W/"))
+
+        again = self.client.get(
+            f"/api/clubs/{self.club.pk}/",
+            HTTP_ACCEPT_ENCODING="gzip",
+            HTTP_IF_NONE_MATCH=etag,
+        )
+        self.assertEqual(again.status_code, 304)
+
+    def test_msgpack_is_negotiated(self):
+        from backend import renderers
+
+        response = self.client.get(
+            f"/api/clubs/{self.club.pk}/",
+            HTTP_ACCEPT="application/msgpack, application/json;q=0.9",
+        )
+        if renderers.msgpack is None:
+            # Not offered: the client gets the JSON it also accepts.
+            self.assertEqual(response["Content-Type"], "application/json")
+            return
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        data = renderers.msgpack.unpackb(response.content)
+        self.assertEqual(data["name"], "Robotics")
+
+    def test_bench_render_command(self):
+        import io
+
+        from django.core.management import call_command
+
+        out = io.StringIO()
+        call_command("bench_render", repeat=2, page_size=10, stdout=out)
+
+        report = out.getvalue()
+        for name in ("club_detail", "user_list", "drf-json", "gzip_bytes"):
+            self.assertIn(name, report)
+
+
+class ClubsQueryBudgetTests(querybudget.QueryBudgetTestCase):
+    budgets = [
+        Budget("GET", "/api/clubs/", "anon", 2, 200),
+        Budget("GET", "/api/clubs/", "user", 2, 200),
+        Budget("GET", "/api/clubs/", "admin", 2, 200),
+        Budget("GET", "/api/clubs/{club}/", "anon", 3, 200),
+        Budget("GET", "/api/clubs/{club}/", "user", 3, 200),
+        Budget("GET", "/api/clubs/{club}/", "admin", 3, 200),
+        Budget("GET", "/api/clubs/{club}/posts/", "anon", 1, 200),
+        Budget("GET", "/api/clubs/{club}/posts/", "user", 1, 200),
+        Budget("GET", "/api/clubs/{club}/posts/", "admin", 1, 200),
+        Budget("POST", "/api/clubs/{club}/follow/", "anon", 0, 401),
+        Budget("POST", "/api/clubs/{club}/follow/", "user", 5, 200),
+        Budget("PUT", "/api/clubs/{club}/follow/", "admin", 6, 200),
+        Budget("DELETE", "/api/clubs/{club}/follow/", "admin", 5, 200),
+        Budget("POST", "/api/clubs/posts/{post}/like/", "anon", 0, 401),
+        Budget("POST", "/api/clubs/posts/{post}/like/", "user", 5, 200),
+        Budget("PUT", "/api/clubs/posts/{post}/like/", "admin", 5, 200),
+        Budget("GET", "/api/clubs/me/liked-posts/", "anon", 0, 401),
+        Budget("GET", "/api/clubs/me/liked-posts/", "user", 1, 200),
+        Budget("GET", "/api/clubs/me/liked-posts/", "admin", 1, 200),
+        Budget("GET", "/api/clubs/me/feed/", "anon", 0, 401),
+        Budget("GET", "/api/clubs/me/feed/", "user", 2, 200),
+        Budget("GET", "/api/clubs/me/feed/", "admin", 2, 200),
+        Budget("POST", "/api/clubs/{club}/posts/create/", "anon", 0, 401),
+        Budget("POST", "/api/clubs/{club}/posts/create/", "user", 0, 403),
+        Budget(
+            "POST", "/api/clubs/{club}/posts/create/", "admin", 5, 201,
+            {"title": "Budget", "content": "..."},
+        ),
+        Budget("GET", "/api/clubs/admin/clubs/", "anon", 0, 401),
+        Budget("GET", "/api/clubs/admin/clubs/", "user", 0, 403),
+        Budget("GET", "/api/clubs/admin/clubs/", "admin", 1, 200),
+        Budget(
+            "POST", "/api/clubs/admin/clubs/", "admin", 3, 201,
+            {"name": "Budget club", "description": "..."},
+        ),
+        Budget("GET", "/api/clubs/admin/clubs/{club}/", "user", 0, 403),
+        Budget("GET", "/api/clubs/admin/clubs/{club}/", "admin", 1, 200),
+        Budget(
+            "PATCH", "/api/clubs/admin/clubs/{club}/", "admin", 3, 200,
+            {"description": "Updated"},
+        ),
+        Budget("DELETE", "/api/clubs/admin/clubs/{spare_club}/", "admin", 9, 204),
+        Budget("GET", "/api/clubs/admin/posts/{post}/", "user", 0, 403),
+        Budget("GET", "/api/clubs/admin/posts/{post}/", "admin", 1, 200),
+        Budget(
+            "PATCH", "/api/clubs/admin/posts/{post}/", "admin", 3, 200,
+            {"title": "Updated"},
+        ),
+        Budget("DELETE", "/api/clubs/admin/posts/{spare_post}/", "admin", 4, 204),
+        Budget("POST", "/api/sync/relations/", "anon", 0, 401),
+        Budget(
+            "POST", "/api/sync/relations/", "user", 10, 200,
+            {
+                "operations": [
+                    {"kind": "club_follow", "id": "{spare_club}", "state": True},
+                    {"kind": "post_like", "id": "{post}", "state": False},
+                    {"kind": "event_follow", "id": "{event}", "state": True},
+                ]
+            },
+        ),
+        Budget("POST", "/api/clubs/admin/clubs/{club}/uploads/", "anon", 0, 401),
+        Budget("POST", "/api/clubs/admin/clubs/{club}/uploads/", "user", 0, 403),
+        Budget(
+            "POST", "/api/clubs/admin/clubs/{club}/uploads/", "admin", 3, 201,
+            {"filename": "budget.pdf", "size": 100},
+        ),
+        # Already stored: attached without a session.
+        Budget(
+            "POST", "/api/clubs/admin/clubs/{club}/uploads/", "admin", 6, 201,
+            {"filename": "budget.pdf", "size": 6, "sha256": "{blob}"},
+        ),
+        Budget("GET", "/api/clubs/admin/uploads/{upload}/", "user", 0, 403),
+        Budget("GET", "/api/clubs/admin/uploads/{upload}/", "admin", 1, 200),
+        # The JSON-encoded string is the 14 raw bytes of the only chunk.
+        Budget(
+            "PUT", "/api/clubs/admin/uploads/{upload}/chunks/0/", "admin", 1, 200,
+            "budget chunk",
+        ),
+        Budget("POST", "/api/clubs/admin/uploads/{ready_upload}/commit/", "admin", 10, 201),
+        Budget("DELETE", "/api/clubs/admin/uploads/{spare_upload}/", "admin", 2, 204),
+        Budget("DELETE", "/api/clubs/admin/clubs/{club}/files/{blob}/", "user", 0, 403),
+        Budget("DELETE", "/api/clubs/admin/clubs/{club}/files/{blob}/", "admin", 5, 204),
+    ]
+
+    def setUp(self):
+        import shutil
+        import tempfile
+
+        from django.test import override_settings
+
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        settings = override_settings(
+            MEDIA_ROOT=f"{self.root}/media", CHUNKED_UPLOAD_DIR=f"{self.root}/uploads"
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def url_ids(self):
+        import hashlib
+        import io
+
+        from .models import UploadSession
+        from .uploads import attach_blob, store_blob, write_chunk
+
+        ids = super().url_ids()
+        admin = User.objects.get(pk=self.dataset.admin)
+        content = b"budget"
+        path = f"{self.root}/budget.pdf"
+        with open(path, "wb") as file:
+            file.write(content)
+        blob = store_blob(
+            hashlib.sha256(content).hexdigest(), path, "budget.pdf", "application/pdf"
+        )
+        attach_blob(ids["club"], blob, "budget.pdf")
+        ids["blob"] = blob.sha256
+
+        sessions = {
+            name: UploadSession.objects.create(
+                club_id=ids["club"],
+                created_by=admin,
+                filename="budget.pdf",
+                content_type="application/pdf",
+                size=14,
+                chunk_size=1024,
+            )
+            for name in ("upload", "ready_upload", "spare_upload")
+        }
+        write_chunk(sessions["ready_upload"], 0, io.BytesIO(b"ready chunk 14"))
+        ids.update((name, session.pk) for name, session in sessions.items())
+        return ids
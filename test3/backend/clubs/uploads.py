@@ -0,0 +1,236 @@
+"""
+Chunked, resumable and deduplicated uploads of club files.
+
+The client opens an ``UploadSession``, PUTs the numbered chunks in any
+order, then commits. Each chunk is streamed to its own file under
+``CHUNKED_UPLOAD_DIR`` and hashed as it is written, so no request holds
+more than a small buffer in memory and an interrupted upload only resends
+the chunks missing from ``received_chunks()``. Hash state can't be carried
+from one request (or worker) to the next, so the commit makes one
+streaming SHA-256 pass while joining the chunks. The result is stored once
+as a content-addressed ``Blob`` and ``Club.files`` keeps references, so an
+identical file attached to ten clubs is on disk once.
+"""
+
+import hashlib
+import os
+import shutil
+import time
+import uuid
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .cache import invalidate_clubs
+from .models import Blob, Club, UploadSession
+
+READ_SIZE = 64 * 1024
+
+
+def session_dir(session):
+    return Path(settings.CHUNKED_UPLOAD_DIR) / str(session.pk)
+
+
+def chunk_path(session, index):
+    return session_dir(session) / f"{index:06d}"
+
+
+def received_chunks(session):
+    """Indexes of the chunks stored completely so far."""
+    try:
+        names = os.listdir(session_dir(session))
+    except FileNotFoundError:
+        return []
+    return sorted(int(name) for name in names if name.isdigit())
+
+
+def write_chunk(session, index, stream, sha256=None):
+    """
+    Stream chunk ``index`` from ``stream`` to disk. The chunk only becomes
+    visible once its length (and ``sha256``, if given) checked out, so a
+    dropped connection leaves no partial chunk behind.
+    """
+    if not 0 <= index < session.chunk_count:
+        raise ValidationError({"chunk": f"Expected 0 to {session.chunk_count - 1}."})
+    length = session.chunk_length(index)
+    directory = session_dir(session)
+    directory.mkdir(parents=True, exist_ok=True)
+    partial = directory / f".{index:06d}.{uuid.uuid4().hex}"
+
+    digest = hashlib.sha256()
+    written = 0
+    try:
+        with open(partial, "wb") as file:
+            while block := stream.read(READ_SIZE):
+                written += len(block)
+                if written > length:
+                    break
+                digest.update(block)
+                file.write(block)
+        if written != length:
+            raise ValidationError(
+                {"chunk": f"Chunk {index} must be {length} bytes, got {written}."}
+            )
+        if sha256 and sha256.lower() != digest.hexdigest():
+            raise ValidationError({"chunk": f"Chunk {index} checksum mismatch."})
+        os.replace(partial, chunk_path(session, index))
+    finally:
+        partial.unlink(missing_ok=True)
+    return digest.hexdigest()
+
+
+def discard_upload(session):
+    shutil.rmtree(session_dir(session), ignore_errors=True)
+    session.delete()
+
+
+def expiry_cutoff():
+    """Sessions opened before this are abandoned (``UPLOAD_SESSION_TTL``)."""
+    return timezone.now() - timedelta(seconds=settings.UPLOAD_SESSION_TTL)
+
+
+def expire_uploads():
+    """
+    Discard the abandoned sessions with their chunks, chunk directories left
+    without a session and blobs no club references any more; return
+    ``(sessions, directories, blobs)`` removed.
+    """
+    sessions = 0
+    for session in UploadSession.objects.filter(created_at__lt=expiry_cutoff()):
+        discard_upload(session)
+        sessions += 1
+
+    directories = 0
+    root = Path(settings.CHUNKED_UPLOAD_DIR)
+    if root.is_dir():
+        live = {
+            str(pk) for pk in UploadSession.objects.values_list("pk", flat=True)
+        }
+        oldest = time.time() - settings.UPLOAD_SESSION_TTL
+        for directory in root.iterdir():
+            if (
+                directory.is_dir()
+                and directory.name not in live
+                and directory.stat().st_mtime < oldest
+            ):
+                shutil.rmtree(directory, ignore_errors=True)
+                directories += 1
+    return sessions, directories, delete_orphan_blobs()
+
+
+def delete_orphan_blobs():
+    """
+    Delete the blobs no ``Club.files`` entry references, with their files.
+    Blobs younger than ``UPLOAD_SESSION_TTL`` are kept: a commit stores the
+    blob before attaching it.
+    """
+    referenced = set()
+    for files in Club.objects.values_list("files", flat=True).iterator():
+        referenced.update(entry_sha256(entry) for entry in files or ())
+    deleted = 0
+    orphans = Blob.objects.filter(created_at__lt=expiry_cutoff()).exclude(
+        sha256__in=referenced - {None}
+    )
+    for blob in orphans.iterator():
+        blob.delete()
+        default_storage.delete(blob.path)
+        deleted += 1
+    return deleted
+
+
+def commit_upload(session):
+    """Join and hash the chunks, store the blob and attach it to the club."""
+    missing = sorted(set(range(session.chunk_count)) - set(received_chunks(session)))
+    if missing:
+        raise ValidationError({"missing_chunks": missing})
+
+    digest = hashlib.sha256()
+    joined = session_dir(session) / "joined"
+    with open(joined, "wb") as output:
+        for index in range(session.chunk_count):
+            with open(chunk_path(session, index), "rb") as chunk:
+                while block := chunk.read(READ_SIZE):
+                    digest.update(block)
+                    output.write(block)
+    sha256 = digest.hexdigest()
+
+    if session.sha256 and session.sha256 != sha256:
+        discard_upload(session)
+        raise ValidationError({"sha256": "The uploaded file doesn't match its checksum."})
+
+    blob = store_blob(sha256, joined, session.filename, session.content_type)
+    ref = attach_blob(session.club_id, blob, session.filename)
+    discard_upload(session)
+    return ref
+
+
+def store_blob(sha256, path, filename, content_type):
+    """The ``Blob`` of ``sha256``, storing ``path`` only if it is new."""
+    blob = Blob.objects.filter(sha256=sha256).first()
+    if blob:
+        return blob
+    extension = os.path.splitext(filename)[1].lower()[:16]
+    with open(path, "rb") as file:
+        name = default_storage.save(f"blobs/{sha256[:2]}/{sha256}{extension}", File(file))
+    try:
+        with transaction.atomic():
+            return Blob.objects.create(
+                sha256=sha256,
+                size=os.path.getsize(path),
+                content_type=content_type,
+                path=name,
+            )
+    except IntegrityError:
+        # Committed concurrently by another upload of the same content.
+        default_storage.delete(name)
+        return Blob.objects.get(sha256=sha256)
+
+
+def entry_sha256(entry):
+    # Club.files may still hold free-form entries from before references.
+    return entry.get("sha256") if isinstance(entry, dict) else None
+
+
+def file_ref(blob, filename):
+    return {
+        "sha256": blob.sha256,
+        "name": filename,
+        "size": blob.size,
+        "content_type": blob.content_type,
+        "path": blob.path,
+    }
+
+
+def attach_blob(club_id, blob, filename):
+    """Add ``blob`` to ``Club.files`` (once) and return its reference."""
+    ref = file_ref(blob, filename)
+    with transaction.atomic():
+        club = Club.objects.select_for_update().get(pk=club_id)
+        club.files = [
+            entry for entry in club.files if entry_sha256(entry) != blob.sha256
+        ] + [ref]
+        club.save(update_fields=["files", "updated_at"])
+    invalidate_clubs([club_id])
+    return ref
+
+
+def detach_blob(club_id, sha256):
+    """
+    Remove the reference; the blob stays for the other clubs using it, and
+    ``expire_uploads`` deletes it once none does.
+    """
+    with transaction.atomic():
+        club = Club.objects.select_for_update().get(pk=club_id)
+        files = [entry for entry in club.files if entry_sha256(entry) != sha256]
+        if len(files) == len(club.files):
+            return False
+        club.files = files
+        club.save(update_fields=["files", "updated_at"])
+    invalidate_clubs([club_id])
+    return True
@@ -7,9 +7,15 @@ from .views import (
     ClubPostCreateView,
     ToggleLikePostView,
     MyLikedPostsView,
+    MyFeedView,
     AdminClubListCreateView,
     AdminClubDetailView,
     AdminClubPostDetailView,
+    UploadStartView,
+    UploadSessionView,
+    UploadChunkView,
+    UploadCommitView,
+    ClubFileDeleteView,
 )
 
 urlpatterns = [
@@ -18,15 +24,24 @@ urlpatterns = [
     path("<int:pk>/", ClubDetailView.as_view()),
     path("<int:pk>/follow/", ToggleFollowClubView.as_view()),
     # Posts
-    path("<int:club_id>/posts/", ClubPostListView.as_view()),
+    path("<int:club_id>/posts/", ClubPostListView.as_view(), name="club-post-list"),
     path("<int:club_id>/posts/create/", ClubPostCreateView.as_view()),
     # Likes
     path("posts/<int:pk>/like/", ToggleLikePostView.as_view()),
     path("me/liked-posts/", MyLikedPostsView.as_view()),
+    # Home feed
+    path("me/feed/", MyFeedView.as_view()),
 
     # Admin
     path("admin/clubs/", AdminClubListCreateView.as_view()),
     path("admin/clubs/<int:pk>/", AdminClubDetailView.as_view()),
     path("admin/posts/<int:pk>/", AdminClubPostDetailView.as_view()),
 
+    # Chunked club file uploads
+    path("admin/clubs/<int:pk>/uploads/", UploadStartView.as_view()),
+    path("admin/clubs/<int:pk>/files/<str:sha256>/", ClubFileDeleteView.as_view()),
+    path("admin/uploads/<uuid:pk>/", UploadSessionView.as_view()),
+    path("admin/uploads/<uuid:pk>/chunks/<int:index>/", UploadChunkView.as_view()),
+    path("admin/uploads/<uuid:pk>/commit/", UploadCommitView.as_view()),
+
 ]
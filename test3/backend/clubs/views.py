@@ -1,65 +1,152 @@
+import io
+
+from django.conf import settings
+from django.db.models import Count, Max, Value
+from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from rest_framework import generics, permissions
-from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 
-from .models import Club, ClubPost
+from backend.cache import CachedPayloadMixin
+from backend.conditional import ConditionalGetMixin
+from backend.images import save_with_variants
+from backend.relations import RelationToggleView
+from backend.sparse import defer_omitted
+
+from .cache import invalidate_clubs, invalidate_posts
+from .feed import fan_out
+from .live import push_post, push_post_deleted
+from .models import Blob, Club, ClubPost, FeedEntry, UploadSession
+from .pagination import PostCursorPagination, TimelineCursorPagination
 from .serializers import (
     ClubSerializer,
     ClubDetailSerializer,
     ClubPostSerializer,
+    FeedPostSerializer,
     AdminClubSerializer,
+    UploadSessionSerializer,
+)
+from .uploads import (
+    attach_blob,
+    commit_upload,
+    detach_blob,
+    discard_upload,
+    expiry_cutoff,
+    write_chunk,
 )
 
 # ===================== CLUBS =====================
 
-class ClubListView(generics.ListAPIView):
-    queryset = Club.objects.all()
+class ClubListView(ConditionalGetMixin, CachedPayloadMixin, generics.ListAPIView):
     serializer_class = ClubSerializer
     permission_classes = [permissions.AllowAny]
+    cache_scopes = ["clubs"]
+    personal_fields = [("results", "is_followed", "clubs.Club", "followers")]
+
+    def get_queryset(self):
+        clubs = Club.objects.with_follow_state(self.request.user).order_by("id")
+        return defer_omitted(clubs, ClubSerializer, self.request)
 
     def get_serializer_context(self):
         return {"request": self.request}
 
+    def get_validators(self):
+        stats = Club.objects.aggregate(last=Max("updated_at"), total=Count("id"))
+        return stats["last"], stats["total"]
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(lambda: super(ClubListView, self).list(request))
 
-class ClubDetailView(generics.RetrieveAPIView):
-    queryset = Club.objects.all()
+
+class ClubDetailView(
+    ConditionalGetMixin, CachedPayloadMixin, generics.RetrieveAPIView
+):
     serializer_class = ClubDetailSerializer
     permission_classes = [permissions.AllowAny]
+    personal_fields = [
+        (None, "is_followed", "clubs.Club", "followers"),
+        ("posts", "is_liked", "clubs.ClubPost", "liked_by"),
+    ]
+
+    def get_cache_scopes(self):
+        pk = self.kwargs["pk"]
+        return [f"club:{pk}", f"posts:{pk}"]
+
+    def get_queryset(self):
+        clubs = Club.objects.with_follow_state(self.request.user)
+        return defer_omitted(clubs, ClubDetailSerializer, self.request)
 
     def get_serializer_context(self):
         return {"request": self.request}
 
+    def get_validators(self):
+        row = (
+            Club.objects.filter(pk=self.kwargs["pk"])
+            # values() first: GROUP BY that column, not every club column.
+            .values("updated_at")
+            .annotate(posts_last=Max("posts__updated_at"), posts_total=Count("posts"))
+            .order_by("updated_at")
+            .values_list("updated_at", "posts_last", "posts_total")
+            .first()
+        )
+        if row is None:
+            return None
+        updated_at, posts_last, posts_total = row
+        return max(filter(None, [updated_at, posts_last])), posts_total
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(lambda: self.build_response(request))
+
+    def build_response(self, request):
+        club = self.get_object()
+
+        # Only embed the newest page; older posts are fetched from
+        # ClubPostListView through the ``posts_next`` cursor link.
+        paginator = PostCursorPagination()
+        posts = ClubPost.objects.filter(club=club).with_like_state(request.user)
+        posts = defer_omitted(posts, ClubPostSerializer, request, path="posts")
+        club.latest_posts = paginator.paginate_queryset(posts, request, view=self)
+        paginator.base_url = request.build_absolute_uri(
+            reverse("club-post-list", args=[club.pk])
+        )
+        club.posts_next = paginator.get_next_link()
 
-class ToggleFollowClubView(APIView):
-    permission_classes = [IsAuthenticated]
-
-    def post(self, request, pk):
-        club = get_object_or_404(Club, pk=pk)
+        serializer = self.get_serializer(club)
+        return Response(serializer.data)
 
-        if club.followers.filter(id=request.user.id).exists():
-            club.followers.remove(request.user)
-            return Response({"followed": False})
 
-        club.followers.add(request.user)
-        return Response({"followed": True})
+class ToggleFollowClubView(RelationToggleView):
+    kind = "club_follow"
+    state_key = "followed"
 
 
 # ===================== POSTS =====================
 
-class ClubPostListView(generics.ListAPIView):
+class ClubPostListView(CachedPayloadMixin, generics.ListAPIView):
     serializer_class = ClubPostSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = PostCursorPagination
+    personal_fields = [("results", "is_liked", "clubs.ClubPost", "liked_by")]
+
+    def get_cache_scopes(self):
+        return [f"posts:{self.kwargs['club_id']}"]
 
     def get_queryset(self):
-        return ClubPost.objects.filter(
+        posts = ClubPost.objects.filter(
             club_id=self.kwargs["club_id"]
-        ).order_by("-created_at")
+        ).with_like_state(self.request.user)
+        return defer_omitted(posts, ClubPostSerializer, self.request)
 
     def get_serializer_context(self):
         return {"request": self.request}
 
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            lambda: super(ClubPostListView, self).list(request)
+        )
+
 
 class ClubPostCreateView(generics.CreateAPIView):
     serializer_class = ClubPostSerializer
@@ -67,55 +154,194 @@ class ClubPostCreateView(generics.CreateAPIView):
 
     def perform_create(self, serializer):
         club = get_object_or_404(Club, id=self.kwargs["club_id"])
-        serializer.save(
+        post = serializer.save(
             club=club,
             created_by=self.request.user
         )
+        fan_out(post)
+        invalidate_posts([club.pk])
+        push_post("created", post)
 
 
-class ToggleLikePostView(APIView):
-    permission_classes = [IsAuthenticated]
-
-    def post(self, request, pk):
-        post = get_object_or_404(ClubPost, pk=pk)
-
-        if post.liked_by.filter(id=request.user.id).exists():
-            post.liked_by.remove(request.user)
-            return Response({"liked": False})
-
-        post.liked_by.add(request.user)
-        return Response({"liked": True})
+class ToggleLikePostView(RelationToggleView):
+    kind = "post_like"
+    state_key = "liked"
 
 
 class MyLikedPostsView(generics.ListAPIView):
     serializer_class = ClubPostSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = PostCursorPagination
 
     def get_queryset(self):
-        return self.request.user.liked_posts.all().order_by("-created_at")
+        # Walk the user's rows of the liked_by table; every post is liked.
+        posts = self.request.user.liked_posts.select_related("created_by").annotate(
+            is_liked=Value(True)
+        )
+        return defer_omitted(posts, ClubPostSerializer, self.request)
+
+    def get_serializer_context(self):
+        return {"request": self.request}
+
+
+class MyFeedView(generics.ListAPIView):
+    serializer_class = FeedPostSerializer
+    permission_classes = [IsAuthenticated]
 
     def get_serializer_context(self):
         return {"request": self.request}
 
+    def list(self, request, *args, **kwargs):
+        user = request.user
+        follows = Club.followers.through.objects.filter(user=user)
+        posts = ClubPost.objects.with_like_state(user).select_related("club")
+        posts = defer_omitted(posts, FeedPostSerializer, request)
+
+        if follows.count() < settings.FEED_TIMELINE_THRESHOLD:
+            paginator = PostCursorPagination()
+            page = paginator.paginate_queryset(
+                posts.filter(club_id__in=follows.values("club_id")), request, self
+            )
+        else:
+            # Heavy followers page through their precomputed timeline and
+            # the posts of the page are loaded by id.
+            paginator = TimelineCursorPagination()
+            entries = paginator.paginate_queryset(
+                FeedEntry.objects.filter(user=user), request, self
+            )
+            found = posts.in_bulk([entry.post_id for entry in entries])
+            page = [found[e.post_id] for e in entries if e.post_id in found]
+
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
 
 # ===================== ADMIN =====================
 
 class AdminClubListCreateView(generics.ListCreateAPIView):
-    queryset = Club.objects.all()
     serializer_class = AdminClubSerializer
     permission_classes = [IsAuthenticated, IsAdminUser]
 
+    def get_queryset(self):
+        clubs = Club.objects.select_related("created_by")
+        return defer_omitted(clubs, AdminClubSerializer, self.request)
+
     def perform_create(self, serializer):
-        serializer.save(created_by=self.request.user)
+        club = save_with_variants(serializer, created_by=self.request.user)
+        invalidate_clubs([club.pk])
 
 
 class AdminClubDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Club.objects.all()
+    queryset = Club.objects.select_related("created_by")
     serializer_class = AdminClubSerializer
     permission_classes = [IsAuthenticated, IsAdminUser]
 
+    def perform_update(self, serializer):
+        club = save_with_variants(serializer)
+        invalidate_clubs([club.pk])
+
+    def perform_destroy(self, instance):
+        pk = instance.pk
+        instance.delete()
+        invalidate_clubs([pk])
+
 
 class AdminClubPostDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = ClubPost.objects.all()
     serializer_class = ClubPostSerializer
     permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def get_queryset(self):
+        return ClubPost.objects.with_like_state(self.request.user)
+
+    def perform_update(self, serializer):
+        post = serializer.save()
+        invalidate_posts([post.club_id])
+        push_post("updated", post)
+
+    def perform_destroy(self, instance):
+        post_id = instance.pk
+        instance.delete()
+        invalidate_posts([instance.club_id])
+        push_post_deleted(instance.club_id, post_id)
+
+
+# ===================== CLUB FILE UPLOADS =====================
+
+class UploadStartView(generics.CreateAPIView):
+    """
+    Open a chunked upload for a club file. If ``sha256`` is given and the
+    content is already stored, the file is attached at once and no
+    session is opened.
+    """
+
+    serializer_class = UploadSessionSerializer
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def create(self, request, pk):
+        club = get_object_or_404(Club, pk=pk)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        blob = Blob.objects.filter(
+            sha256=data.get("sha256", ""), size=data["size"]
+        ).first()
+        if blob:
+            ref = attach_blob(club.pk, blob, data["filename"])
+            return Response({"file": ref}, status=201)
+
+        serializer.save(
+            club=club,
+            created_by=request.user,
+            chunk_size=settings.UPLOAD_CHUNK_SIZE,
+        )
+        return Response(serializer.data, status=201)
+
+
+class OwnUploadMixin:
+    serializer_class = UploadSessionSerializer
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def get_queryset(self):
+        # Abandoned sessions are gone even before expire_uploads runs.
+        return UploadSession.objects.filter(
+            created_by=self.request.user, created_at__gte=expiry_cutoff()
+        )
+
+
+class UploadSessionView(OwnUploadMixin, generics.RetrieveDestroyAPIView):
+    """GET lists the received chunks to resume from; DELETE aborts."""
+
+    def perform_destroy(self, instance):
+        discard_upload(instance)
+
+
+class UploadChunkView(OwnUploadMixin, generics.GenericAPIView):
+    """PUT the raw bytes of one chunk, optionally with ``X-Chunk-SHA256``."""
+
+    def put(self, request, pk, index):
+        session = self.get_object()
+        # The body is read from the stream as it arrives, never parsed.
+        write_chunk(
+            session,
+            index,
+            request.stream or io.BytesIO(),
+            request.headers.get("X-Chunk-SHA256"),
+        )
+        return Response({"chunk": index}, status=200)
+
+
+class UploadCommitView(OwnUploadMixin, generics.GenericAPIView):
+    def post(self, request, pk):
+        ref = commit_upload(self.get_object())
+        return Response({"file": ref}, status=201)
+
+
+class ClubFileDeleteView(generics.GenericAPIView):
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def delete(self, request, pk, sha256):
+        club = get_object_or_404(Club, pk=pk)
+        if not detach_blob(club.pk, sha256):
+            raise Http404
+        return Response(status=204)
@@ -0,0 +1,6 @@
+from backend.cache import bump_versions
+
+
+def invalidate_events(event_ids=()):
+    """The event list, which every event change shows up in."""
+    bump_versions("events")
@@ -0,0 +1,60 @@
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+
+TRUE_VALUES = ("1", "true", "yes")
+
+
+def parse_bound(name, value, end=False):
+    """
+    ``from``/``to`` as an aware datetime. A bare date means the start of
+    that day, or its end for ``to``.
+    """
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            if day is None:
+                raise ValueError
+            parsed = datetime.combine(day, time.max if end else time.min)
+    except ValueError:
+        raise ValidationError({name: ["Expected an ISO 8601 date or datetime."]})
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def upcoming_start():
+    # Minute granularity, so cached pages and ETags of ?upcoming= are
+    # reused for a minute instead of differing on every request.
+    return timezone.now().replace(second=0, microsecond=0)
+
+
+def event_window(params):
+    """
+    ``(start, end)`` requested by the ``from``, ``to`` and ``upcoming``
+    query parameters, either of them ``None`` when unbounded.
+    """
+    start = end = None
+    if "from" in params:
+        start = parse_bound("from", params["from"])
+    if params.get("upcoming", "").lower() in TRUE_VALUES:
+        now = upcoming_start()
+        start = max(start, now) if start else now
+    if "to" in params:
+        end = parse_bound("to", params["to"], end=True)
+    if start and end and end < start:
+        raise ValidationError({"to": ["Must not be before from."]})
+    return start, end
+
+
+def filter_window(queryset, window, field="date"):
+    """Restrict ``queryset`` to the window; served by the (date, id) index."""
+    start, end = window
+    if start:
+        queryset = queryset.filter(**{f"{field}__gte": start})
+    if end:
+        queryset = queryset.filter(**{f"{field}__lte": end})
+    return queryset
@@ -1,11 +1,30 @@
 from django.conf import settings
 from django.db import models
+from django.db.models import Exists, OuterRef, Value
 
 User = settings.AUTH_USER_MODEL
 
+
+class EventQuerySet(models.QuerySet):
+    def with_follow_state(self, user):
+        """Annotate ``is_followed`` for ``user`` and join the author."""
+        qs = self.select_related("created_by")
+        if user is None or not user.is_authenticated:
+            return qs.annotate(is_followed=Value(False))
+        return qs.annotate(
+            is_followed=Exists(
+                Event.followers.through.objects.filter(
+                    event_id=OuterRef("pk"), user_id=user.pk
+                )
+            )
+        )
+
+
 class Event(models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField()
+    # Start of ``description``, kept by backend.excerpts.
+    excerpt = models.CharField(max_length=255, blank=True, editable=False)
     date = models.DateTimeField()
     created_by = models.ForeignKey(
         User,
@@ -17,6 +36,17 @@ class Event(models.Model):
         related_name="followed_events",
         blank=True
     )
+    # Kept in sync with ``followers`` by backend.counters.
+    followers_count = models.IntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = EventQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["date", "id"]),
+            models.Index(fields=["updated_at"]),
+        ]
 
     def __str__(self):
         return self.title
@@ -0,0 +1,5 @@
+from backend.pagination import KeysetCursorPagination
+
+
+class EventCursorPagination(KeysetCursorPagination):
+    ordering = ("date", "id")
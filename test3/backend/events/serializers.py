@@ -1,9 +1,32 @@
 from rest_framework import serializers
+
+from backend.sparse import SparseFieldsMixin
+
 from .models import Event
 
-class EventSerializer(serializers.ModelSerializer):
+class EventSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     created_by = serializers.ReadOnlyField(source="created_by.username")
+    is_followed = serializers.SerializerMethodField()
 
     class Meta:
         model = Event
-        fields = "__all__"
+        fields = [
+            "id",
+            "title",
+            "description",
+            "excerpt",
+            "date",
+            "created_by",
+            "followers_count",
+            "is_followed",
+            "updated_at",
+        ]
+        deferrable = ["description"]
+
+    def get_is_followed(self, obj):
+        if hasattr(obj, "is_followed"):
+            return obj.is_followed
+        request = self.context.get("request")
+        if not request or request.user.is_anonymous:
+            return False
+        return obj.followers.filter(id=request.user.id).exists()
@@ -0,0 +1,11 @@
+from backend.counters import track_m2m_counter
+from backend.excerpts import track_excerpt
+from backend.search import track_search
+
+from .models import Event
+
+track_m2m_counter(Event, "followers", "followers_count")
+
+track_search(Event, "event", 3, "title", ["description"])
+
+track_excerpt(Event, "description")
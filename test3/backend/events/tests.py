@@ -1,3 +1,297 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from testsupport import querybudget
+from testsupport.querybudget import Budget
+
+from .models import Event
+
+User = get_user_model()
+
+
+class EventPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="member", password="pass")
+        start = timezone.now()
+        # Pairs of events share a date so the id tie-breaker is exercised.
+        cls.events = [
+            Event.objects.create(
+                title=f"Event {i}",
+                description="...",
+                date=start + timedelta(days=i // 2),
+                created_by=cls.user,
+            )
+            for i in range(25)
+        ]
+        for event in cls.events[::2]:
+            event.followers.add(cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def collect(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [e["id"] for e in response.data["results"]]
+            url = response.data["next"]
+        return ids
+
+    def test_list_walks_every_event_in_date_order(self):
+        ids = self.collect("/api/events/?page_size=4")
+        self.assertEqual(ids, [e.pk for e in self.events])
+
+    def test_followed_events_are_paginated(self):
+        ids = self.collect("/api/events/me/followed-events/?page_size=5")
+        self.assertEqual(ids, [e.pk for e in self.events[::2]])
+
+    def test_followed_events_join_the_followers_table(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/events/me/followed-events/")
+        self.assertTrue(all(e["is_followed"] for e in response.data["results"]))
+        (sql,) = [q["sql"] for q in queries.captured_queries]
+        self.assertIn("INNER JOIN", sql)
+        self.assertNotIn("EXISTS", sql)
+
+    def test_page_size_is_capped_and_defaults(self):
+        response = self.client.get("/api/events/")
+        self.assertEqual(len(response.data["results"]), 20)
+        response = self.client.get("/api/events/?page_size=1000")
+        self.assertEqual(len(response.data["results"]), 25)
+
+    def test_follow_state_in_constant_queries(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        counts = []
+        for size in (2, 20):
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(f"/api/events/?page_size={size}")
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+        followed = {e.pk for e in self.events[::2]}
+        for event in response.data["results"]:
+            self.assertEqual(event["is_followed"], event["id"] in followed)
+            self.assertEqual(event["followers_count"], int(event["id"] in followed))
+            self.assertNotIn("followers", event)
+
+        # A cached page is personalized for each user.
+        other = User.objects.create_user(username="other", password="pass")
+        self.client.force_authenticate(other)
+        response = self.client.get("/api/events/?page_size=20")
+        self.assertFalse(any(e["is_followed"] for e in response.data["results"]))
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get("/api/events/?cursor=not-a-cursor")
+        self.assertEqual(response.status_code, 404)
+
+
+class EventWindowTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="member", password="pass")
+        now = timezone.now()
+        cls.past, cls.soon, cls.later = [
+            Event.objects.create(
+                title=title, description="...", date=now + delta, created_by=cls.user
+            )
+            for title, delta in (
+                ("Past", timedelta(days=-3)),
+                ("Soon", timedelta(days=2)),
+                ("Later", timedelta(days=40)),
+            )
+        ]
+        cls.later.followers.add(cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def ids(self, url, params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return [e["id"] for e in response.data["results"]]
+
+    def test_upcoming_and_bounds(self):
+        soon = (timezone.localdate() + timedelta(days=14)).isoformat()
+
+        self.assertEqual(
+            self.ids("/api/events/", {"upcoming": "1"}), [self.soon.pk, self.later.pk]
+        )
+        self.assertEqual(
+            self.ids("/api/events/", {"upcoming": "true", "to": soon}), [self.soon.pk]
+        )
+        self.assertEqual(
+            self.ids("/api/events/", {"to": soon}), [self.past.pk, self.soon.pk]
+        )
+        self.assertEqual(
+            self.ids("/api/events/me/followed-events/", {"from": soon}), [self.later.pk]
+        )
+
+    def test_invalid_bounds_are_rejected(self):
+        for params in ({"from": "tomorrow"}, {"from": "2030-01-02", "to": "2030-01-01"}):
+            response = self.client.get("/api/events/", params)
+            self.assertEqual(response.status_code, 400)
+
+
+class CalendarFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="member", password="pass")
+        now = timezone.now()
+        cls.followed = Event.objects.create(
+            title="Gala; dîner, danse",
+            description="Line one\nLine two " + "long " * 30,
+            date=now + timedelta(days=5),
+            created_by=cls.user,
+        )
+        cls.other = Event.objects.create(
+            title="Hackathon", description="", date=now + timedelta(days=6), created_by=cls.user
+        )
+        cls.old = Event.objects.create(
+            title="Old", description="", date=now - timedelta(days=400), created_by=cls.user
+        )
+        cls.followed.followers.add(cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def feed(self, url, **extra):
+        response = self.client.get(url, **extra)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b"".join(response.streaming_content).decode()
+
+    def test_followed_feed_is_escaped_and_folded(self):
+        self.client.force_authenticate(self.user)
+
+        response, body = self.feed("/api/events/me/calendar.ics")
+
+        self.assertEqual(response["Content-Type"], "text/calendar; charset=utf-8")
+        self.assertTrue(body.startswith("BEGIN:VCALENDAR\r\n"))
+        self.assertTrue(body.endswith("END:VCALENDAR\r\n"))
+        self.assertEqual(body.count("BEGIN:VEVENT"), 1)
+        self.assertIn(f"UID:event-{self.followed.pk}@", body)
+        self.assertIn("SUMMARY:Gala\\; dîner\\, danse", body)
+        lines = body.split("\r\n")
+        self.assertTrue(all(len(line.encode()) <= 75 for line in lines))
+        unfolded = body.replace("\r\n ", "")
+        self.assertIn("DESCRIPTION:Line one\\nLine two long", unfolded)
+
+    def test_campus_feed_skips_old_events_and_revalidates(self):
+        self.client.force_authenticate(self.user)
+
+        response, body = self.feed("/api/events/calendar.ics")
+        self.assertEqual(body.count("BEGIN:VEVENT"), 2)
+        self.assertNotIn("SUMMARY:Old", body)
+
+        etag = response["ETag"]
+        again = self.client.get("/api/events/calendar.ics", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(again.status_code, 304)
+
+        self.other.title = "Hackathon 2"
+        self.other.save()
+        changed = self.client.get("/api/events/calendar.ics", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+
+    def test_subscription_key(self):
+        self.client.force_authenticate(self.user)
+        links = self.client.get("/api/events/me/calendar-links/").json()
+        self.client.force_authenticate(None)
+
+        response, body = self.feed(links["followed"], HTTP_ACCEPT="text/calendar")
+        self.assertEqual(body.count("BEGIN:VEVENT"), 1)
+
+        self.user.set_password("changed")
+        self.user.save()
+        response = self.client.get(links["followed"], HTTP_ACCEPT="text/calendar")
+        self.assertEqual(response.status_code, 401)
+        response = self.client.get("/api/events/me/calendar.ics?key=forged")
+        self.assertEqual(response.status_code, 401)
+
+    async def test_streamed_in_chunks_under_asgi(self):
+        import gzip
+        from unittest import mock
+
+        from django.db.models.query import QuerySet
+        from django.test import AsyncClient
+
+        from .ical import calendar_key
+
+        url = f"/api/events/calendar.ics?key={calendar_key(self.user)}"
+        aiterator = QuerySet.aiterator
+        with mock.patch.object(
+            QuerySet, "aiterator", autospec=True, side_effect=aiterator
+        ) as fetched:
+            response = await AsyncClient().get(url, headers={"accept": "text/calendar"})
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.is_async)
+            body = b"".join([chunk async for chunk in response.streaming_content])
+        fetched.assert_called_once()
+        body = body.decode()
+        self.assertTrue(body.endswith("END:VCALENDAR\r\n"))
+        self.assertEqual(body.count("BEGIN:VEVENT"), 2)
+
+        response = await AsyncClient().get(
+            url, headers={"accept": "text/calendar", "accept-encoding": "gzip"}
+        )
+        self.assertTrue(response.is_async)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        compressed = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(gzip.decompress(compressed).decode(), body)
+
 
-# Create your tests here.
+class EventsQueryBudgetTests(querybudget.QueryBudgetTestCase):
+    budgets = [
+        Budget("GET", "/api/events/", "anon", 0, 401),
+        Budget("GET", "/api/events/", "user", 2, 200),
+        Budget("GET", "/api/events/", "admin", 2, 200),
+        Budget("GET", "/api/events/?upcoming=1", "user", 2, 200),
+        Budget("GET", "/api/events/{event}/", "user", 1, 200),
+        Budget("GET", "/api/events/{event}/", "admin", 1, 200),
+        Budget("GET", "/api/events/me/followed-events/", "anon", 0, 401),
+        Budget("GET", "/api/events/me/followed-events/", "user", 1, 200),
+        Budget("GET", "/api/events/me/followed-events/", "admin", 1, 200),
+        # Only the validator query: the feed itself is read while streaming.
+        Budget("GET", "/api/events/me/calendar.ics", "anon", 0, 401),
+        Budget("GET", "/api/events/me/calendar.ics", "user", 1, 200),
+        Budget("GET", "/api/events/calendar.ics", "user", 1, 200),
+        Budget("GET", "/api/events/me/calendar-links/", "anon", 0, 401),
+        Budget("GET", "/api/events/me/calendar-links/", "user", 0, 200),
+        Budget("GET", "/api/events/me/calendar-links/", "admin", 0, 200),
+        Budget("POST", "/api/events/{event}/toggle-follow/", "anon", 0, 401),
+        Budget("POST", "/api/events/{event}/toggle-follow/", "user", 4, 200),
+        Budget("PUT", "/api/events/{event}/toggle-follow/", "admin", 4, 200),
+        Budget("DELETE", "/api/events/{event}/toggle-follow/", "admin", 4, 200),
+        Budget(
+            "POST", "/api/events/", "user", 0, 403,
+            {"title": "Budget", "description": "...", "date": "2030-01-01T10:00Z"},
+        ),
+        Budget(
+            "POST", "/api/events/", "admin", 2, 201,
+            {"title": "Budget", "description": "...", "date": "2030-01-01T10:00Z"},
+        ),
+        Budget(
+            "PATCH", "/api/events/{event}/", "user", 0, 403, {"title": "Updated"}
+        ),
+        Budget(
+            "PATCH", "/api/events/{event}/", "admin", 3, 200, {"title": "Updated"}
+        ),
+        Budget("DELETE", "/api/events/{spare_event}/", "admin", 3, 204),
+    ]
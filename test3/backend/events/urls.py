@@ -4,6 +4,9 @@ from .views import (
     EventRetrieveUpdateDeleteView,
     ToggleFollowEventView,
     MyFollowedEventsView,
+    FollowedCalendarView,
+    CampusCalendarView,
+    CalendarLinksView,
 )
 
 urlpatterns = [
@@ -11,4 +14,8 @@ urlpatterns = [
     path("<int:pk>/", EventRetrieveUpdateDeleteView.as_view(), name="event-detail"),
     path("<int:event_id>/toggle-follow/", ToggleFollowEventView.as_view(), name="toggle-follow-event"),
     path("me/followed-events/", MyFollowedEventsView.as_view(), name="my-followed-events"),
+    # iCalendar feeds
+    path("calendar.ics", CampusCalendarView.as_view(), name="campus-calendar"),
+    path("me/calendar.ics", FollowedCalendarView.as_view(), name="followed-calendar"),
+    path("me/calendar-links/", CalendarLinksView.as_view(), name="calendar-links"),
 ]
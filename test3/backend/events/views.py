@@ -1,10 +1,34 @@
+from datetime import datetime, time, timedelta
+
 from rest_framework import generics, permissions
 from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from django.conf import settings
+from django.db.models import Count, Max, Sum, Value
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from backend.cache import CachedPayloadMixin
+from backend.conditional import ConditionalGetMixin
+from backend.sparse import defer_omitted
+
+from .cache import invalidate_events
+from .filters import event_window, filter_window
+from .ical import (
+    CalendarKeyAuthentication,
+    ICalendarRenderer,
+    acalendar_lines,
+    calendar_key,
+    calendar_lines,
+)
 from .models import Event
+from .pagination import EventCursorPagination
 from .serializers import EventSerializer
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from django.shortcuts import get_object_or_404
+from backend.relations import RelationToggleView
 
 
 # 🔐 Permission custom : admin uniquement
@@ -17,47 +41,182 @@ class IsAdminCustom(permissions.BasePermission):
         )
 
 
-class EventListCreateView(generics.ListCreateAPIView):
-    queryset = Event.objects.all().order_by("date")
+class EventListCreateView(
+    ConditionalGetMixin, CachedPayloadMixin, generics.ListCreateAPIView
+):
     serializer_class = EventSerializer
+    pagination_class = EventCursorPagination
+    cache_scopes = ["events"]
+    personal_fields = [("results", "is_followed", "events.Event", "followers")]
 
     def get_permissions(self):
         if self.request.method in SAFE_METHODS:
             return [IsAuthenticated()]
         return [IsAdminCustom()]
 
+    def get_window(self):
+        # ``?from=``, ``?to=`` (ISO dates or datetimes) and ``?upcoming=1``.
+        if not hasattr(self, "window"):
+            self.window = event_window(self.request.query_params)
+        return self.window
+
+    def get_queryset(self):
+        events = filter_window(
+            Event.objects.with_follow_state(self.request.user), self.get_window()
+        )
+        return defer_omitted(events, EventSerializer, self.request)
+
+    def get_cache_variant(self):
+        return self.get_window()
+
+    def get_validators(self):
+        stats = Event.objects.aggregate(last=Max("updated_at"), total=Count("id"))
+        return stats["last"], f"{stats['total']}:{self.get_window()}"
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            lambda: super(EventListCreateView, self).list(request)
+        )
+
     def perform_create(self, serializer):
-        serializer.save(created_by=self.request.user)
+        event = serializer.save(created_by=self.request.user)
+        event.is_followed = False
+        invalidate_events()
 
 # Retrieve / Update / Delete
 class EventRetrieveUpdateDeleteView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Event.objects.all()
     serializer_class = EventSerializer
 
+    def get_queryset(self):
+        return Event.objects.with_follow_state(self.request.user)
+
     def get_permissions(self):
         if self.request.method in SAFE_METHODS:
             return [IsAuthenticated()]
         return [IsAdminCustom()]
 
+    def perform_update(self, serializer):
+        serializer.save()
+        invalidate_events()
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        invalidate_events()
+
 # Follow / Unfollow
-class ToggleFollowEventView(APIView):
+class ToggleFollowEventView(RelationToggleView):
+    kind = "event_follow"
+    state_key = "followed"
+    lookup_url_kwarg = "event_id"
+
+# My Followed Events
+class MyFollowedEventsView(APIView):
     permission_classes = [IsAuthenticated]
 
-    def post(self, request, event_id):
-        event = get_object_or_404(Event, id=event_id)
-        user = request.user
-        if user in event.followers.all():
-            event.followers.remove(user)
-            return Response({"followed": False})
+    def get(self, request):
+        # Walk the user's rows of the followers table; every event is followed.
+        events = request.user.followed_events.select_related("created_by").annotate(
+            is_followed=Value(True)
+        )
+        events = filter_window(events, event_window(request.query_params))
+        events = defer_omitted(events, EventSerializer, request)
+        paginator = EventCursorPagination()
+        page = paginator.paginate_queryset(events, request, view=self)
+        serializer = EventSerializer(page, many=True, context={"request": request})
+        return paginator.get_paginated_response(serializer.data)
+
+
+# iCalendar feeds
+class CalendarStreamView(APIView):
+    """Stream the events of ``get_queryset()`` as an iCalendar feed."""
+
+    authentication_classes = [
+        *api_settings.DEFAULT_AUTHENTICATION_CLASSES,
+        CalendarKeyAuthentication,
+    ]
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [JSONRenderer, ICalendarRenderer]
+    calendar_name = None
+    filename = None
+
+    def get(self, request):
+        events = self.get_queryset().order_by("date", "id")
+        # An async server collects a sync iterator in memory; give it one
+        # it can pull chunk by chunk.
+        if isinstance(request._request, ASGIRequest):
+            lines = acalendar_lines(events, self.calendar_name, request.get_host())
         else:
-            event.followers.add(user)
-            return Response({"followed": True})
+            lines = calendar_lines(events, self.calendar_name, request.get_host())
+        response = StreamingHttpResponse(
+            lines, content_type="text/calendar; charset=utf-8"
+        )
+        response["Content-Disposition"] = f'inline; filename="{self.filename}"'
+        return response
+
+
+class CalendarFeedView(ConditionalGetMixin, CalendarStreamView):
+    """
+    Feed of ``get_events()`` with the same ``from``/``to``/``upcoming``
+    filters as the list, starting ``EVENTS_CALENDAR_PAST_DAYS`` back by
+    default.
+    """
+
+    def get_events(self):
+        raise NotImplementedError
+
+    def get_window(self):
+        if not hasattr(self, "window"):
+            start, end = event_window(self.request.query_params)
+            if start is None and "from" not in self.request.query_params:
+                # Whole days, so the ETag holds until midnight.
+                today = timezone.localdate() - timedelta(
+                    days=settings.EVENTS_CALENDAR_PAST_DAYS
+                )
+                start = timezone.make_aware(datetime.combine(today, time.min))
+            self.window = start, end
+        return self.window
+
+    def get_queryset(self):
+        return filter_window(self.get_events(), self.get_window())
+
+    def get_validators(self):
+        # Sum("id") changes when an event enters or leaves the feed even if
+        # the count doesn't.
+        stats = self.get_queryset().aggregate(
+            last=Max("updated_at"), total=Count("id"), ids=Sum("id")
+        )
+        return stats["last"], f"{stats['total']}:{stats['ids']}:{self.get_window()}"
+
+
+class FollowedCalendarView(CalendarFeedView):
+    calendar_name = "Mes événements"
+    filename = "followed-events.ics"
+
+    def get_events(self):
+        return self.request.user.followed_events.all()
+
+
+class CampusCalendarView(CalendarFeedView):
+    calendar_name = "Événements du campus"
+    filename = "campus-events.ics"
+
+    def get_events(self):
+        return Event.objects.all()
+
+
+class CalendarLinksView(APIView):
+    """Subscription URLs of the feeds, carrying the user's calendar key."""
 
-# My Followed Events
-class MyFollowedEventsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        events = request.user.followed_events.all()
-        serializer = EventSerializer(events, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        key = calendar_key(request.user)
+        return Response(
+            {
+                name: request.build_absolute_uri(f"{url}?key={key}")
+                for name, url in (
+                    ("followed", "/api/events/me/calendar.ics"),
+                    ("campus", "/api/events/calendar.ics"),
+                )
+            }
+        )
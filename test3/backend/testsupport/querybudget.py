@@ -0,0 +1,133 @@
+"""
+Query-count and wall-clock budgets for every API endpoint.
+
+Each app's tests subclass ``QueryBudgetTestCase`` and list its endpoints as
+``Budget`` rows; ``{club}``-style placeholders in paths and request data are
+filled with ids from the dataset. Every row is requested on a cold payload
+cache against the synthetic dataset. With ``QUERY_BUDGET_REPORT=1`` in the
+environment the numbers are printed as a table when the class finishes, so
+they can be compared between releases.
+"""
+
+import os
+import sys
+import time
+from collections import namedtuple
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from backend.synthetic import build_dataset
+
+Budget = namedtuple(
+    "Budget",
+    ["method", "path", "role", "queries", "status", "data", "ms"],
+    defaults=[None, None],
+)
+
+
+class QueryBudgetTestCase(TestCase):
+    budgets = ()
+    # Generous enough for a loaded CI machine; the query counts are the
+    # precise part of the contract.
+    time_budget_ms = 1000
+    dataset_sizes = {
+        "users": 2000,
+        "clubs": 100,
+        "posts": 2000,
+        "likes": 10000,
+        "follows": 4000,
+        "events": 200,
+        "event_follows": 2000,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dataset = build_dataset(**cls.dataset_sizes)
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.report = []
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.report and os.environ.get("QUERY_BUDGET_REPORT"):
+            sys.stderr.write(cls.format_report())
+        super().tearDownClass()
+
+    @classmethod
+    def format_report(cls):
+        header = ("method", "path", "role", "status", "queries", "budget", "ms")
+        rows = [header] + [tuple(str(value) for value in row) for row in cls.report]
+        widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+        lines = [
+            "  ".join(value.ljust(width) for value, width in zip(row, widths))
+            for row in rows
+        ]
+        lines.insert(1, "  ".join("-" * width for width in widths))
+        return f"\n{cls.__module__}.{cls.__name__}\n" + "\n".join(lines) + "\n"
+
+    def url_ids(self):
+        """Placeholders for the paths: the most popular objects, plus the
+        least popular ones as ``spare_*`` for destructive requests."""
+        data = self.dataset
+        return {
+            "club": data.clubs[0],
+            "post": data.posts[0],
+            "event": data.events[0],
+            "user": data.users[0],
+            "spare_club": data.clubs[-1],
+            "spare_post": data.posts[-1],
+            "spare_event": data.events[-1],
+            "spare_user": data.users[-1],
+        }
+
+    def format_data(self, data, ids):
+        if isinstance(data, str):
+            return data.format(**ids)
+        if isinstance(data, dict):
+            return {key: self.format_data(value, ids) for key, value in data.items()}
+        if isinstance(data, list):
+            return [self.format_data(value, ids) for value in data]
+        return data
+
+    def client_for(self, role):
+        # "user" is the most active user: the most follows and likes.
+        pks = {"admin": self.dataset.admin, "user": self.dataset.users[0]}
+        client = APIClient()
+        if role in pks:
+            client.force_authenticate(get_user_model().objects.get(pk=pks[role]))
+        return client
+
+    def test_query_budgets(self):
+        ids = self.url_ids()
+        for budget in self.budgets:
+            path = budget.path.format(**ids)
+            with self.subTest(method=budget.method, path=path, role=budget.role):
+                client = self.client_for(budget.role)
+                cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    response = getattr(client, budget.method.lower())(
+                        path, self.format_data(budget.data, ids), format="json"
+                    )
+                    elapsed = (time.perf_counter() - start) * 1000
+                self.report.append(
+                    (
+                        budget.method,
+                        path,
+                        budget.role,
+                        response.status_code,
+                        len(queries),
+                        budget.queries,
+                        f"{elapsed:.1f}",
+                    )
+                )
+                self.assertEqual(response.status_code, budget.status)
+                self.assertLessEqual(len(queries), budget.queries)
+                self.assertLessEqual(elapsed, budget.ms or self.time_budget_ms)
@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired outstanding and blacklisted refresh tokens in small "
+        "batches, each in its own short transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.0,
+            help="Seconds to pause between batches so writers can get in.",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Only count the expired tokens."
+        )
+
+    def handle(self, *args, **options):
+        expired = OutstandingToken.objects.filter(expires_at__lte=timezone.now())
+        if options["dry_run"]:
+            self.stdout.write(
+                f"{expired.count()} expired tokens, "
+                f"{BlacklistedToken.objects.filter(token__in=expired).count()} blacklisted"
+            )
+            return
+
+        tokens = blacklisted = 0
+        while True:
+            # Tokens expire roughly in id order, so walking the primary key
+            # finds a batch without scanning the live rows.
+            pks = list(
+                expired.order_by("pk").values_list("pk", flat=True)[
+                    : options["batch_size"]
+                ]
+            )
+            if not pks:
+                break
+            with transaction.atomic():
+                blacklisted += BlacklistedToken.objects.filter(
+                    token_id__in=pks
+                ).delete()[0]
+                tokens += OutstandingToken.objects.filter(pk__in=pks).delete()[0]
+            if options["sleep"]:
+                time.sleep(options["sleep"])
+
+        self.stdout.write(
+            f"Deleted {tokens} expired tokens ({blacklisted} blacklisted)."
+        )
@@ -11,5 +11,9 @@ class User(AbstractUser):
         upload_to="profiles/",
         null=True,
         blank=True)
+    # Storage names of the resized copies, filled by backend.images.
+    profile_image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
     def __str__(self):
         return self.username
@@ -1,33 +1,38 @@
 from rest_framework import serializers
-from events.models import Event
 
 from django.contrib.auth import get_user_model
 
+from backend.hashing import make_password_bounded
+from backend.images import ImageVariantsField
+from backend.sparse import SparseFieldsMixin
+
 User = get_user_model()
 
-class EventSerializer(serializers.ModelSerializer):
-    created_by = serializers.ReadOnlyField(source="created_by.username")
-    followers_count = serializers.SerializerMethodField()
+class LoginSerializer(serializers.Serializer):
+    username = serializers.CharField()
+    password = serializers.CharField(trim_whitespace=False)
 
-    class Meta:
-        model = Event
-        fields = ["id", "title", "description", "date", "created_by", "followers_count"]
 
-    def get_followers_count(self, obj):
-        return obj.followers.count()
+class PasswordChangeSerializer(serializers.Serializer):
+    old_password = serializers.CharField(trim_whitespace=False)
+    new_password = serializers.CharField(trim_whitespace=False)
 
-class UserSerializer(serializers.ModelSerializer):
+
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     profile_image = serializers.ImageField(required=False, allow_null=True)
+    profile_image_variants = ImageVariantsField()
     is_admin = serializers.SerializerMethodField()
 
     class Meta:
         model = User
-        fields = ["id", "username", "email", "password", "is_admin", "profile_image"]
+        fields = ["id", "username", "email", "password", "is_admin", "profile_image", "profile_image_variants"]
         extra_kwargs = {"password": {"write_only": True}}
 
     def create(self, validated_data):
         user = User(**validated_data)
-        user.set_password(validated_data["password"])
+        # The async register view hashes in backend.hashing beforehand.
+        if not self.context.get("password_hashed"):
+            user.set_password(validated_data["password"])
         user.save()
         return user
 
@@ -36,10 +41,12 @@ class UserSerializer(serializers.ModelSerializer):
 
     
 
-class AdminUserSerializer(serializers.ModelSerializer):
+class AdminUserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    profile_image_variants = ImageVariantsField()
+
     class Meta:
         model = User
-        fields = ["id", "username", "email", "password", "is_superuser","profile_image"]
+        fields = ["id", "username", "email", "password", "is_superuser","profile_image", "profile_image_variants"]
         extra_kwargs = {
             "password": {"write_only": True, "required": False}
         }
@@ -48,7 +55,7 @@ class AdminUserSerializer(serializers.ModelSerializer):
         password = validated_data.pop("password", None)
         user = User(**validated_data)
         if password:
-            user.set_password(password)
+            user.password = make_password_bounded(password)
         user.save()
         return user
 
@@ -57,14 +64,14 @@ class AdminUserSerializer(serializers.ModelSerializer):
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         if password:
-            instance.set_password(password)
+            instance.password = make_password_bounded(password)
         instance.save()
         return instance
     
     def to_representation(self, instance):
         ret = super().to_representation(instance)
         request = self.context.get("request")
-        if instance.profile_image:
+        if instance.profile_image and "profile_image" in ret:
             try:
                 url = instance.profile_image.url
             except Exception:
@@ -0,0 +1,22 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from backend.authentication import invalidate_users
+from backend.tokens import token_blacklisted
+
+from .models import User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def drop_cached_user(sender, instance, **kwargs):
+    # Covers MeView, the admin user views, password changes and deactivation;
+    # dropped again once the transaction commits.
+    invalidate_users([instance.pk])
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def add_to_blacklist_filter(sender, instance, created, **kwargs):
+    if created:
+        token_blacklisted(instance.pk, instance.token.jti)
@@ -1,3 +1,526 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 
-# Create your tests here.
+from backend.hashing import HashingOverloaded
+from testsupport import querybudget
+from testsupport.querybudget import Budget
+
+User = get_user_model()
+
+# Password hashing dominates these requests.
+HASHING_MS = 5000
+
+
+class CachedUserAuthenticationTests(TestCase):
+    def setUp(self):
+        from backend.authentication import local_users
+
+        cache.clear()
+        local_users.clear()
+        self.user = User.objects.create_user(username="member", password="pass")
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}"
+        )
+
+    def test_user_is_loaded_once(self):
+        # MeView serializes the cached user: no deferred column is read.
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get("/api/me/").status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get("/api/me/").status_code, 200)
+
+    def test_cache_holds_no_password_hash(self):
+        import pickle
+        import tempfile
+
+        from django.test import override_settings
+
+        from backend.authentication import get_cached_user, local_users, user_key
+
+        with tempfile.TemporaryDirectory() as location:
+            shared = {
+                "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                "LOCATION": location,
+            }
+            with override_settings(CACHES={"default": shared}):
+                user = get_cached_user(self.user.pk)
+                entry = cache.get(user_key(self.user.pk))
+        self.assertNotIn(self.user.password.encode(), pickle.dumps(entry))
+        self.assertIn("password", user.get_deferred_fields())
+        self.assertEqual(user.username, "member")
+
+        # LocMemCache isn't shared: nothing goes there, only the local LRU.
+        local_users.clear()
+        get_cached_user(self.user.pk)
+        self.assertIsNone(cache.get(user_key(self.user.pk)))
+
+    def test_dropped_again_after_commit(self):
+        from backend.authentication import local_users, user_key
+
+        self.client.get("/api/me/")
+        stale = local_users.get(user_key(self.user.pk))
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.is_active = False
+            self.user.save()
+            # Another request re-caching the row it read before the commit.
+            local_users.set(user_key(self.user.pk), stale, 60, 10)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.client.get("/api/me/").status_code, 401)
+
+    def test_updates_apply_on_next_request(self):
+        self.client.get("/api/me/")
+        self.client.patch("/api/me/", {"email": "new@example.com"}, format="json")
+        self.assertEqual(self.client.get("/api/me/").data["email"], "new@example.com")
+
+        self.user.refresh_from_db()
+        # Only the loaded columns were saved.
+        self.assertTrue(self.user.check_password("pass"))
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get("/api/me/").status_code, 401)
+
+    def test_deleted_user_is_rejected(self):
+        self.client.get("/api/me/")
+        self.user.delete()
+        self.assertEqual(self.client.get("/api/me/").status_code, 401)
+
+
+class TokenBlacklistTests(TestCase):
+    def setUp(self):
+        import tempfile
+
+        from django.test import override_settings
+
+        from backend.tokens import blacklist_filter
+
+        # The filter is only trusted with a cache all processes share.
+        location = tempfile.TemporaryDirectory()
+        self.addCleanup(location.cleanup)
+        shared = override_settings(
+            CACHES={
+                "default": {
+                    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                    "LOCATION": location.name,
+                }
+            }
+        )
+        shared.enable()
+        self.addCleanup(shared.disable)
+        cache.clear()
+        blacklist_filter.reset()
+        self.user = User.objects.create_user(username="member", password="pass")
+
+    def refresh(self, token):
+        return self.client.post(
+            "/api/auth/refresh/", {"refresh": token}, content_type="application/json"
+        )
+
+    def test_filter_skips_the_blacklist_query(self):
+        from rest_framework_simplejwt.exceptions import TokenError
+        from rest_framework_simplejwt.token_blacklist.models import (
+            BlacklistedToken,
+            OutstandingToken,
+        )
+
+        from backend.tokens import FastRefreshToken
+
+        used = str(RefreshToken.for_user(self.user))
+        fresh = str(RefreshToken.for_user(self.user))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.refresh(used).status_code, 200)
+        self.assertEqual(self.refresh(used).status_code, 401)
+
+        with self.assertNumQueries(0):
+            FastRefreshToken(fresh)
+
+        # Blacklisted by another process: seen through the shared counter.
+        other = RefreshToken.for_user(self.user)
+        BlacklistedToken.objects.bulk_create(
+            [BlacklistedToken(token=OutstandingToken.objects.get(jti=other["jti"]))]
+        )
+        cache.incr("token-blacklist:version")
+        with self.assertRaises(TokenError):
+            FastRefreshToken(str(other))
+
+    def test_counter_moves_after_commit(self):
+        from backend.tokens import VERSION_KEY, FastRefreshToken, blacklist_filter
+
+        used = str(RefreshToken.for_user(self.user))
+        FastRefreshToken(str(RefreshToken.for_user(self.user)))
+        version = cache.get(VERSION_KEY)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(self.refresh(used).status_code, 200)
+            # Not committed yet: a process syncing now would record a
+            # version that doesn't cover the new row.
+            self.assertEqual(cache.get(VERSION_KEY), version)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(cache.get(VERSION_KEY), version + 1)
+        self.assertEqual(blacklist_filter.version, version + 1)
+
+    def test_per_process_cache_reads_the_newest_row(self):
+        from django.db import connection
+        from django.test import override_settings
+        from django.test.utils import CaptureQueriesContext
+        from rest_framework_simplejwt.exceptions import TokenError
+        from rest_framework_simplejwt.token_blacklist.models import (
+            BlacklistedToken,
+            OutstandingToken,
+        )
+
+        from backend.tokens import FastRefreshToken, blacklist_filter
+
+        locmem = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        with override_settings(CACHES={"default": locmem}):
+            blacklist_filter.reset()
+            used = str(RefreshToken.for_user(self.user))
+            fresh = str(RefreshToken.for_user(self.user))
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(self.refresh(used).status_code, 200)
+            self.assertEqual(self.refresh(used).status_code, 401)
+
+            # One primary-key read of the newest row, no JTI lookup.
+            with CaptureQueriesContext(connection) as queries:
+                FastRefreshToken(fresh)
+            (sql,) = [q["sql"] for q in queries.captured_queries]
+            self.assertNotIn("WHERE", sql)
+
+            # Blacklisted by another process: a new newest row.
+            other = RefreshToken.for_user(self.user)
+            BlacklistedToken.objects.bulk_create(
+                [BlacklistedToken(token=OutstandingToken.objects.get(jti=other["jti"]))]
+            )
+            with self.assertRaises(TokenError):
+                FastRefreshToken(str(other))
+
+    def test_prune_tokens(self):
+        from datetime import timedelta
+        from io import StringIO
+
+        from django.core.management import call_command
+        from django.utils import timezone
+        from rest_framework_simplejwt.token_blacklist.models import (
+            BlacklistedToken,
+            OutstandingToken,
+        )
+
+        live = RefreshToken.for_user(self.user)
+        for i in range(5):
+            token = RefreshToken.for_user(self.user)
+            if i % 2:
+                token.blacklist()
+        OutstandingToken.objects.exclude(jti=live["jti"]).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        live.blacklist()
+
+        out = StringIO()
+        call_command("prune_tokens", batch_size=2, stdout=out)
+        self.assertIn("Deleted 5 expired tokens (2 blacklisted)", out.getvalue())
+        self.assertEqual(
+            list(OutstandingToken.objects.values_list("jti", flat=True)), [live["jti"]]
+        )
+        self.assertEqual(BlacklistedToken.objects.count(), 1)
+
+
+class AsyncPasswordViewsTests(TestCase):
+    def setUp(self):
+        from backend.authentication import local_users
+
+        cache.clear()
+        local_users.clear()
+
+    def login(self, username, password):
+        return self.client.post(
+            "/api/auth/login/",
+            {"username": username, "password": password},
+            content_type="application/json",
+        )
+
+    def test_login_rehashes_to_the_preferred_hasher(self):
+        from django.contrib.auth.hashers import make_password
+        from django.test import override_settings
+
+        with override_settings(
+            PASSWORD_HASHERS=[
+                "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+                "django.contrib.auth.hashers.MD5PasswordHasher",
+            ]
+        ):
+            user = User.objects.create(
+                username="legacy", password=make_password("s3cret-pass", hasher="md5")
+            )
+            self.assertEqual(self.login("legacy", "wrong").status_code, 401)
+            response = self.login("legacy", "s3cret-pass")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("access", response.json())
+        self.assertTrue(response["Server-Timing"].startswith("hash-wait;dur="))
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith("pbkdf2_sha256$"))
+        self.assertEqual(self.login("nobody", "s3cret-pass").status_code, 401)
+
+    def test_register_and_change_password(self):
+        response = self.client.post(
+            "/api/register/",
+            {"username": "new", "email": "n@example.com", "password": "s3cret-pass"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn("password", response.json())
+        access = self.login("new", "s3cret-pass").json()["access"]
+
+        def change(old, new):
+            return self.client.post(
+                "/api/me/password/",
+                {"old_password": old, "new_password": new},
+                content_type="application/json",
+                HTTP_AUTHORIZATION=f"Bearer {access}",
+            ).status_code
+
+        self.assertEqual(change("wrong", "an0ther-pass"), 400)
+        self.assertEqual(change("s3cret-pass", "123"), 400)
+        self.assertEqual(change("s3cret-pass", "an0ther-pass"), 200)
+        self.assertEqual(self.login("new", "s3cret-pass").status_code, 401)
+        self.assertEqual(self.login("new", "an0ther-pass").status_code, 200)
+
+    def test_overload_is_rejected(self):
+        from django.test import override_settings
+
+        User.objects.create_user(username="member", password="s3cret-pass")
+        with override_settings(PASSWORD_HASHING_WORKERS=0, PASSWORD_HASHING_QUEUE=0):
+            response = self.login("member", "s3cret-pass")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertEqual(response.json()["detail"], HashingOverloaded.default_detail)
+
+    def test_admin_overload_is_rejected(self):
+        from django.test import override_settings
+
+        client = APIClient()
+        client.force_authenticate(
+            User.objects.create(username="boss", is_admin=True, is_staff=True)
+        )
+        with override_settings(PASSWORD_HASHING_WORKERS=0, PASSWORD_HASHING_QUEUE=0):
+            response = client.post(
+                "/api/admin/users/",
+                {"username": "new", "email": "n@example.com", "password": "s3cret-pass"},
+                format="json",
+            )
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertFalse(User.objects.filter(username="new").exists())
+
+    def test_errors_and_throttling_follow_drf(self):
+        from rest_framework.throttling import AnonRateThrottle
+
+        from users.views import LoginView
+
+        response = self.client.post(
+            "/api/auth/login/", {"username": "member"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"password": ["This field is required."]})
+        response = self.client.post(
+            "/api/auth/login/", "not json", content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("detail", response.json())
+
+        class OnePerMinute(AnonRateThrottle):
+            rate = "1/min"
+
+        LoginView.throttle_classes = [OnePerMinute]
+        self.addCleanup(delattr, LoginView, "throttle_classes")
+        self.assertEqual(self.login("member", "wrong").status_code, 401)
+        response = self.login("member", "wrong")
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+
+
+class BatchRequestTests(TestCase):
+    def setUp(self):
+        from django.test import override_settings
+
+        settings = override_settings(BATCH_CONCURRENCY=1, BATCH_MAX_REQUESTS=4)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        cache.clear()
+        self.user = User.objects.create_user(username="member", password="pass")
+        self.client = APIClient()
+        token = AccessToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def batch(self, paths, **extra):
+        return self.client.post(
+            "/api/batch/", {"requests": paths}, format="json", **extra
+        )
+
+    def test_runs_each_path_with_one_token_check(self):
+        from unittest import mock
+
+        from backend.authentication import CachedJWTAuthentication
+
+        with mock.patch.object(
+            CachedJWTAuthentication,
+            "authenticate",
+            autospec=True,
+            side_effect=CachedJWTAuthentication.authenticate,
+        ) as authenticate:
+            response = self.batch(
+                [
+                    "/api/me/",
+                    "/api/events/me/followed-events/?page_size=5",
+                    "/api/clubs/admin/clubs/",
+                    "/api/nowhere/",
+                ],
+                HTTP_IF_NONE_MATCH="*",
+            )
+
+        self.assertEqual(authenticate.call_count, 1)
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["responses"]
+        self.assertEqual([r["status"] for r in results], [200, 200, 403, 404])
+        self.assertEqual(results[0]["body"]["username"], "member")
+        self.assertEqual(results[1]["path"], "/api/events/me/followed-events/?page_size=5")
+        self.assertEqual(results[1]["body"]["results"], [])
+
+    def test_limits_and_errors(self):
+        self.assertEqual(self.batch(["/api/me/"] * 5).status_code, 400)
+        self.assertEqual(self.batch(["/admin/"]).status_code, 400)
+        self.assertEqual(self.batch("/api/me/").status_code, 400)
+        nested = self.batch(["/api/batch/"]).json()["responses"][0]
+        self.assertEqual(nested["status"], 400)
+
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer broken")
+        self.assertEqual(self.batch(["/api/me/"]).status_code, 401)
+
+        self.client.credentials()
+        anonymous = self.batch(["/api/me/", "/api/clubs/"]).json()["responses"]
+        self.assertEqual([r["status"] for r in anonymous], [401, 200])
+
+    def test_a_failing_view_only_fails_its_entry(self):
+        from unittest import mock
+
+        from django.http import HttpRequest
+
+        from backend.batch import sub_request
+        from users.views import MeView
+
+        with mock.patch.object(MeView, "get_object", side_effect=RuntimeError):
+            with self.assertLogs("backend.batch", "ERROR"):
+                response = self.batch(["/api/me/", "/api/clubs/"])
+        self.assertEqual(response.status_code, 200)
+        statuses = [r["status"] for r in response.json()["responses"]]
+        self.assertEqual(statuses, [500, 200])
+
+        request = sub_request(HttpRequest(), "/api/me/", None, None)
+        self.assertTrue(request.user.is_anonymous)
+
+
+class ConcurrentBatchTests(TransactionTestCase):
+    def test_sub_requests_run_on_worker_threads(self):
+        from django.test import override_settings
+
+        user = User.objects.create_user(username="member", password="pass")
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+
+        with override_settings(BATCH_CONCURRENCY=3):
+            response = client.post(
+                "/api/batch/",
+                {"requests": ["/api/me/", "/api/clubs/", "/api/events/"]},
+                format="json",
+            )
+
+        results = response.json()["responses"]
+        self.assertEqual([r["status"] for r in results], [200, 200, 200])
+        self.assertEqual(results[0]["body"]["id"], user.pk)
+
+
+class UsersQueryBudgetTests(querybudget.QueryBudgetTestCase):
+    budgets = [
+        Budget("GET", "/api/me/", "anon", 0, 401),
+        Budget("GET", "/api/me/", "user", 0, 200),
+        Budget("GET", "/api/me/", "admin", 0, 200),
+        Budget("PATCH", "/api/me/", "user", 1, 200, {"email": "me@example.com"}),
+        Budget(
+            "POST", "/api/register/", "anon", 2, 201,
+            {"username": "newcomer", "email": "n@example.com", "password": "s3cret-pass"},
+            HASHING_MS,
+        ),
+        Budget(
+            "POST", "/api/login/", "anon", 2, 200,
+            {"username": "budget-login", "password": "s3cret-pass"},
+            HASHING_MS,
+        ),
+        Budget(
+            "POST", "/api/auth/login/", "anon", 1, 401,
+            {"username": "budget-login", "password": "wrong"},
+            HASHING_MS,
+        ),
+        Budget(
+            "POST", "/api/auth/refresh/", "anon", 13, 200, {"refresh": "{refresh}"}
+        ),
+        Budget("POST", "/api/logout/", "anon", 7, 205, {"refresh": "{logout}"}),
+        Budget("GET", "/api/admin/users/", "anon", 0, 401),
+        Budget("GET", "/api/admin/users/", "user", 0, 403),
+        Budget("GET", "/api/admin/users/", "admin", 1, 200),
+        Budget(
+            "POST", "/api/admin/users/", "admin", 2, 201,
+            {"username": "created", "email": "c@example.com", "password": "s3cret-pass"},
+            HASHING_MS,
+        ),
+        Budget("GET", "/api/admin/users/{user}/", "admin", 1, 200),
+        Budget(
+            "PATCH", "/api/admin/users/{user}/", "admin", 2, 200,
+            {"email": "changed@example.com"},
+        ),
+        Budget("DELETE", "/api/admin/users/{spare_user}/", "admin", 17, 204),
+        Budget(
+            "POST", "/api/me/password/", "anon", 0, 401,
+            {"old_password": "s3cret-pass", "new_password": "n3w-s3cret-pass"},
+        ),
+        Budget(
+            "POST", "/api/me/password/", "user", 1, 400,
+            {"old_password": "wrong", "new_password": "n3w-s3cret-pass"},
+            HASHING_MS,
+        ),
+        # Last: it changes the password the login rows use.
+        Budget(
+            "POST", "/api/me/password/", "login", 2, 200,
+            {"old_password": "s3cret-pass", "new_password": "n3w-s3cret-pass"},
+            HASHING_MS,
+        ),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.login_user = User.objects.create_user(
+            username="budget-login", password="s3cret-pass"
+        )
+
+    def url_ids(self):
+        from backend.tokens import blacklist_filter
+
+        ids = super().url_ids()
+        ids["refresh"] = str(RefreshToken.for_user(self.login_user))
+        ids["logout"] = str(RefreshToken.for_user(self.login_user))
+        # Refreshes are measured on a synced blacklist filter, as in a
+        # process that has served one before.
+        blacklist_filter.reset()
+        blacklist_filter.sync()
+        return ids
+
+    def client_for(self, role):
+        if role != "login":
+            return super().client_for(role)
+        client = APIClient()
+        client.force_authenticate(self.login_user)
+        return client
@@ -1,9 +1,14 @@
+from asgiref.sync import sync_to_async
 from rest_framework import generics, status
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import update_last_login
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.permissions import AllowAny
-from .serializers import UserSerializer
+from .serializers import LoginSerializer, PasswordChangeSerializer, UserSerializer
 from rest_framework import generics, permissions
 from .serializers import AdminUserSerializer
 from .permissions import IsAdmin
@@ -11,15 +16,101 @@ from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 
+from backend.asyncviews import AsyncAPIView
+from backend.conditional import ConditionalGetMixin
+from backend.hashing import amake_password, averify_password, server_timing
+from backend.images import save_with_variants
+from backend.tokens import FastRefreshToken
+
 User = get_user_model()
 
 
-# -------- REGISTER --------
-class RegisterView(generics.CreateAPIView):
-    queryset = User.objects.all()
-    serializer_class = UserSerializer
+# -------- LOGIN / REGISTER / PASSWORD (async) --------
+# The password hashing runs in the bounded pool of backend.hashing and the
+# worker stays free for other requests meanwhile; HashingOverloaded is
+# answered with a 503.
+
+class LoginView(AsyncAPIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    async def post(self, request):
+        serializer = LoginSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        username = serializer.validated_data["username"]
+        password = serializer.validated_data["password"]
+
+        user = await User.objects.filter(**{User.USERNAME_FIELD: username}).afirst()
+        if user is None:
+            # Same cost as a real check, so usernames can't be probed by timing.
+            wait_ms, _ = await amake_password(password)
+            valid = False
+        else:
+            wait_ms, (valid, rehash) = await averify_password(password, user.password)
+            if valid and rehash:
+                extra_ms, user.password = await amake_password(password)
+                wait_ms += extra_ms
+                await user.asave(update_fields=["password"])
+
+        if not valid or not api_settings.USER_AUTHENTICATION_RULE(user):
+            return server_timing(
+                Response(
+                    {"detail": "No active account found with the given credentials"},
+                    status=status.HTTP_401_UNAUTHORIZED,
+                ),
+                wait_ms,
+            )
+
+        refresh = await sync_to_async(RefreshToken.for_user)(user)
+        if api_settings.UPDATE_LAST_LOGIN:
+            await sync_to_async(update_last_login)(None, user)
+        return server_timing(
+            Response({"refresh": str(refresh), "access": str(refresh.access_token)}),
+            wait_ms,
+        )
+
+
+class RegisterView(AsyncAPIView):
+    authentication_classes = []
     permission_classes = [AllowAny]
 
+    async def post(self, request):
+        serializer = UserSerializer(
+            data=request.data, context={"request": request, "password_hashed": True}
+        )
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+        wait_ms, encoded = await amake_password(serializer.validated_data["password"])
+        await sync_to_async(save_with_variants)(serializer, password=encoded)
+        data = await sync_to_async(lambda: serializer.data)()
+        return server_timing(Response(data, status=status.HTTP_201_CREATED), wait_ms)
+
+
+class ChangePasswordView(AsyncAPIView):
+    permission_classes = [IsAuthenticated]
+
+    async def post(self, request):
+        serializer = PasswordChangeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        # The authenticated user only carries the columns auth needs.
+        user = await User.objects.aget(pk=request.user.pk)
+
+        wait_ms, (valid, _) = await averify_password(data["old_password"], user.password)
+        if not valid:
+            return server_timing(
+                Response({"old_password": ["Wrong password."]}, status=400), wait_ms
+            )
+        try:
+            await sync_to_async(validate_password)(data["new_password"], user)
+        except ValidationError as exc:
+            return Response({"new_password": exc.messages}, status=400)
+        extra_ms, user.password = await amake_password(data["new_password"])
+        # The post_save signal drops the cached user.
+        await user.asave(update_fields=["password", "updated_at"])
+        return server_timing(
+            Response({"message": "Password changed"}), wait_ms + extra_ms
+        )
+
 
 # -------- LOGOUT --------
 class LogoutView(generics.GenericAPIView):
@@ -28,7 +119,7 @@ class LogoutView(generics.GenericAPIView):
     def post(self, request):
         try:
             refresh_token = request.data["refresh"]
-            token = RefreshToken(refresh_token)
+            token = FastRefreshToken(refresh_token)
             token.blacklist()
 
             return Response({"message": "Logout successful"}, status=status.HTTP_205_RESET_CONTENT)
@@ -36,14 +127,23 @@ class LogoutView(generics.GenericAPIView):
             return Response({"error": "Invalid refresh token"}, status=status.HTTP_400_BAD_REQUEST)
 
 # -------- CURRENT USER --------
-class MeView(generics.RetrieveUpdateAPIView):
+class MeView(ConditionalGetMixin, generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser, JSONParser]
 
     def get_object(self):
+        # Authentication loaded every column UserSerializer reads
+        # (AUTH_USER_FIELDS); saving writes only those, never the password.
         return self.request.user
 
+    def perform_update(self, serializer):
+        save_with_variants(serializer)
+
+    def get_validators(self):
+        # The user row is already loaded by authentication.
+        return self.request.user.updated_at, None
+
     def get_serializer_context(self):
         return {"request": self.request}
 
@@ -54,6 +154,9 @@ class AdminUserListCreateView(generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated, IsAdmin]
     parser_classes = [MultiPartParser, FormParser, JSONParser]
 
+    def perform_create(self, serializer):
+        save_with_variants(serializer)
+
     def get_serializer_context(self):
         return {"request": self.request}
 
@@ -64,5 +167,8 @@ class AdminUserDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated, IsAdmin]
     parser_classes = [MultiPartParser, FormParser, JSONParser]
 
+    def perform_update(self, serializer):
+        save_with_variants(serializer)
+
     def get_serializer_context(self):
         return {"request": self.request}
\ No newline at end of file
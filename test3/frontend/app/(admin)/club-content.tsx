@@ -26,7 +26,7 @@ export default function ClubContent() {
   const fetchPosts = async () => {
     const res = await fetch(`${API_URL}/clubs/${clubId}/posts/`);
     const data = await res.json();
-    setPosts(data);
+    setPosts(data.results);
   };
 
   useEffect(() => {
@@ -29,7 +29,7 @@ export default function AdminClubs() {
       });
 
       const data = await res.json();
-      setClubs(data);
+      setClubs(data.results);
     } catch (err) {
       console.log("Admin clubs error:", err);
     }
@@ -116,7 +116,10 @@ export default function AdminClubs() {
               </Text>
 
               {item.image && (
-                <Image source={{ uri: item.image }} style={styles.image} />
+                <Image
+                  source={{ uri: item.image_variants?.medium || item.image }}
+                  style={styles.image}
+                />
               )}
 
               {item.content && (
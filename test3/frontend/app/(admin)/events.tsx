@@ -26,12 +26,12 @@ export default function AdminEvents() {
   const fetchEvents = async () => {
     try {
       const token = await AsyncStorage.getItem("access");
-      const res = await fetch(`${API_URL}/events/`, {
+      const res = await fetch(`${API_URL}/events/?page_size=100`, {
         headers: { Authorization: `Bearer ${token}` },
       });
       if (!res.ok) throw new Error("Failed to fetch events");
       const data = await res.json();
-      setEvents(data);
+      setEvents(data.results);
     } catch (err) {
       console.error(err);
       Alert.alert("Error", "Failed to load events");
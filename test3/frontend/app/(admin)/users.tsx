@@ -24,7 +24,7 @@ export default function Users() {
     });
 
     const data = await res.json();
-    setUsers(data);
+    setUsers(data.results);
   };
 
   const filteredUsers = users.filter((u: any) =>
@@ -22,14 +22,14 @@ export default function ClubScreen() {
   const fetchClubs = async () => {
     try {
       const token = await AsyncStorage.getItem("access");
-      const res = await fetch(`${API_URL}/clubs/`, {
+      const res = await fetch(`${API_URL}/clubs/?omit=description`, {
         headers: {
           Authorization: `Bearer ${token}`,
         },
       });
 
       const data = await res.json();
-      setClubs(data);
+      setClubs(data.results);
     } catch (err) {
       console.log("Error fetching clubs:", err);
     } finally {
@@ -79,13 +79,14 @@ export default function ClubScreen() {
               <Image
                 source={{
                   uri:
+                    club.image_variants?.medium ||
                     club.image ||
                     "https://via.placeholder.com/400x200.png?text=Club",
                 }}
                 style={styles.image}
               />
               <Text style={styles.title}>{club.name}</Text>
-              <Text style={styles.desc}>{club.description}</Text>
+              <Text style={styles.desc}>{club.excerpt}</Text>
             </TouchableOpacity>
 
             <View style={styles.footer}>
@@ -10,9 +10,10 @@ const API_URL = "http://localhost:8001/api";
 interface Event {
   id: number;
   title: string;
-  description: string;
+  excerpt: string;
   date: string;
-  followers: number[]; // ids des users
+  followers_count: number;
+  is_followed: boolean; // pour l'utilisateur connecté
 }
 
 export default function EventsScreen({ onFollowChange }: { onFollowChange?: () => void }) {
@@ -30,17 +31,18 @@ export default function EventsScreen({ onFollowChange }: { onFollowChange?: () =
       if (!token) return;
 
       try {
-        const res = await fetch(`${API_URL}/events/`, {
+        // Seulement les événements à venir, pas tout l'historique
+        const res = await fetch(`${API_URL}/events/?upcoming=1&page_size=100&omit=description`, {
           headers: { Authorization: `Bearer ${token}` },
         });
         if (!res.ok) throw new Error("Erreur fetch events");
 
         const data = await res.json();
-        setEvents(data);
+        setEvents(data.results);
 
         // Marquer les jours avec events
         const marks: any = {};
-        data.forEach((e: Event) => {
+        data.results.forEach((e: Event) => {
           const day = e.date.split("T")[0];
           marks[day] = { marked: true, dotColor: "#FFCC00" };
         });
@@ -76,19 +78,17 @@ export default function EventsScreen({ onFollowChange }: { onFollowChange?: () =
       });
       const data = await res.json();
 
-      // Mettre à jour localement le followers
-      setEvents(prev =>
-        prev.map(ev =>
-          ev.id === event.id
-            ? {
-                ...ev,
-                followers: data.followed
-                  ? [...ev.followers, 1]
-                  : ev.followers.filter(u => u !== 1),
-              }
-            : ev
-        )
-      );
+      // Mettre à jour localement l'état suivi et le compteur
+      const update = (ev: Event) =>
+        ev.id === event.id && ev.is_followed !== data.followed
+          ? {
+              ...ev,
+              is_followed: data.followed,
+              followers_count: ev.followers_count + (data.followed ? 1 : -1),
+            }
+          : ev;
+      setEvents(prev => prev.map(update));
+      setEventsOfDay(prev => prev.map(update));
 
       // Update liste des events suivis dans Profile
       onFollowChange?.();
@@ -140,12 +140,12 @@ export default function EventsScreen({ onFollowChange }: { onFollowChange?: () =
               return (
                 <View style={styles.eventCard}>
                   <Text style={styles.eventTitle}>{item.title}</Text>
-                  <Text>{item.description}</Text>
+                  <Text>{item.excerpt}</Text>
                   
 
                   <TouchableOpacity
                     style={{
-                      backgroundColor: item.followers.includes(1) ? "#ff4d4d" : "#04C2FF",
+                      backgroundColor: item.is_followed ? "#ff4d4d" : "#04C2FF",
                       padding: 10,
                       borderRadius: 10,
                       marginTop: 8,
@@ -157,7 +157,7 @@ export default function EventsScreen({ onFollowChange }: { onFollowChange?: () =
                     <Text style={{ color: "#fff", fontWeight: "bold" }}>
                       {updatingEventId === item.id
                         ? "..."
-                        : item.followers.includes(1)
+                        : item.is_followed
                         ? "Unfollow"
                         : "Follow"}
                     </Text>
@@ -35,8 +35,26 @@ export default function Profile() {
     if (!token) return router.replace("/login");
 
     try {
-      const resUser = await fetch(`${API_URL}/me/`, { headers: { Authorization: `Bearer ${token}` } });
-      const userData = await resUser.json();
+      // Un seul aller-retour pour le profil, les likes et les events suivis
+      const res = await fetch(`${API_URL}/batch/`, {
+        method: "POST",
+        headers: {
+          Authorization: `Bearer ${token}`,
+          "Content-Type": "application/json",
+        },
+        body: JSON.stringify({
+          requests: [
+            "/api/me/",
+            "/api/clubs/me/liked-posts/?omit=content",
+            "/api/events/me/followed-events/?omit=description",
+          ],
+        }),
+      });
+      if (!res.ok) throw new Error("Erreur batch");
+      const [me, liked, followed] = (await res.json()).responses;
+      if (me.status !== 200) throw new Error("Session expirée");
+
+      const userData = me.body;
       setUser(userData);
       if (userData.profile_image) {
         const img = userData.profile_image.startsWith("http")
@@ -45,16 +63,8 @@ export default function Profile() {
         setPreview(`${img}?t=${Date.now()}`);
       }
 
-      const resLiked = await fetch(`${API_URL}/clubs/me/liked-posts/`, {
-      headers: { Authorization: `Bearer ${token}` },
-    });
-    const likedData = await resLiked.json();
-    setLikedPosts(likedData);
-      const resEvents = await fetch(`${API_URL}/events/me/followed-events/`, {
-        headers: { Authorization: `Bearer ${token}` },
-      });
-      const eventsData = await resEvents.json();
-      setFollowedEvents(eventsData);
+      setLikedPosts(liked.body.results);
+      setFollowedEvents(followed.body.results);
     } catch (err) {
       console.error(err);
       await AsyncStorage.multiRemove(["access", "refresh"]);
@@ -165,7 +175,7 @@ export default function Profile() {
           return (
             <View style={styles.eventCard}>
               <Text style={styles.eventTitle}>{item.title}</Text>
-              <Text style={styles.eventDesc}>{item.description}</Text>
+              <Text style={styles.eventDesc}>{item.excerpt}</Text>
               <Text style={styles.eventTime}>{time}</Text>
               <TouchableOpacity
                 style={styles.unfollowButton}
@@ -190,7 +200,7 @@ export default function Profile() {
   likedPosts.map((post) => (
     <View key={post.id} style={styles.eventCard}>
       <Text style={styles.eventTitle}>{post.title}</Text>
-      <Text style={styles.eventDesc}>{post.content}</Text>
+      <Text style={styles.eventDesc}>{post.excerpt}</Text>
       <Text style={{ fontSize: 12, color: "#666" }}>
         📅 {new Date(post.created_at).toLocaleDateString()}
       </Text>
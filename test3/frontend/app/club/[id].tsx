@@ -1,4 +1,4 @@
-import React, { useEffect, useState } from "react";
+import React, { useEffect, useRef, useState } from "react";
 import {
   View,
   Text,
@@ -24,6 +24,8 @@ export default function ClubDetail() {
   const { id } = useLocalSearchParams();
   const [club, setClub] = useState<any>(null);
   const [loading, setLoading] = useState(true);
+  // WebSocket ouvert : les compteurs de likes arrivent en direct
+  const live = useRef(false);
 
   /* =======================
      Fetch club details
@@ -56,6 +58,88 @@ export default function ClubDetail() {
     fetchClub();
   }, [id]);
 
+  /* =======================
+     Mises à jour en direct (WebSocket)
+     Nouveaux posts, modifications, suppressions et compteurs de likes
+  ======================== */
+  useEffect(() => {
+    const WS_URL = API_URL.replace(/^http/, "ws").replace(/\/api$/, "");
+    let socket: WebSocket | null = null;
+    let lastSeq: number | null = null;
+    let retry: ReturnType<typeof setTimeout> | null = null;
+    let closed = false;
+    // Échecs d'affilée : on espace les tentatives, puis on abandonne
+    // (serveur sans WebSocket, ex. runserver) et on se contente des rechargements
+    let failures = 0;
+
+    const applyMessage = (msg: any) => {
+      setClub((prev: any) => {
+        if (!prev) return prev;
+        const posts = prev.posts || [];
+        switch (msg.type) {
+          case "post.created":
+            if (posts.some((p: any) => p.id === msg.post.id)) return prev;
+            return { ...prev, posts: [msg.post, ...posts] };
+          case "post.updated":
+            return {
+              ...prev,
+              posts: posts.map((p: any) =>
+                p.id === msg.post.id ? { ...msg.post, is_liked: p.is_liked } : p
+              ),
+            };
+          case "post.deleted":
+            return { ...prev, posts: posts.filter((p: any) => p.id !== msg.id) };
+          case "post.likes":
+            return {
+              ...prev,
+              posts: posts.map((p: any) =>
+                msg.likes[p.id] !== undefined
+                  ? { ...p, likes_count: msg.likes[p.id] }
+                  : p
+              ),
+            };
+          default:
+            return prev;
+        }
+      });
+    };
+
+    const connect = () => {
+      const query = lastSeq !== null ? `?last_seq=${lastSeq}` : "";
+      socket = new WebSocket(`${WS_URL}/ws/clubs/${id}/${query}`);
+      socket.onopen = () => {
+        live.current = true;
+        failures = 0;
+      };
+      socket.onmessage = (event) => {
+        const msg = JSON.parse(event.data);
+        lastSeq = msg.seq;
+        applyMessage(msg);
+      };
+      socket.onclose = (event) => {
+        const wasLive = live.current;
+        live.current = false;
+        if (closed || event.code === 4404) return;
+        // Trop en retard : on recharge tout avant de se reconnecter
+        if (event.code === 1013) {
+          lastSeq = null;
+          fetchClub();
+        }
+        if (!wasLive) failures += 1;
+        if (failures >= 5) return;
+        retry = setTimeout(connect, Math.min(3000 * 2 ** failures, 60000));
+      };
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      live.current = false;
+      if (retry) clearTimeout(retry);
+      socket?.close();
+    };
+  }, [id]);
+
   /* =======================
      Loading state
   ======================== */
@@ -74,15 +158,26 @@ export default function ClubDetail() {
   const token = await AsyncStorage.getItem("access");
   if (!token) return;
 
-  await fetch(`${API_URL}/clubs/posts/${postId}/like/`, {
+  const res = await fetch(`${API_URL}/clubs/posts/${postId}/like/`, {
     method: "POST",
     headers: {
       Authorization: `Bearer ${token}`,
     },
   });
-
-  // refresh club pour mettre à jour likes
-  fetchClub();
+  if (!res.ok) return;
+  const { liked } = await res.json();
+
+  // Mise à jour locale ; le compteur exact arrive ensuite par le WebSocket
+  setClub((prev: any) => ({
+    ...prev,
+    posts: prev.posts.map((p: any) =>
+      p.id === postId && p.is_liked !== liked
+        ? { ...p, is_liked: liked, likes_count: p.likes_count + (liked ? 1 : -1) }
+        : p
+    ),
+  }));
+  // Sans WebSocket connecté, rien ne corrigera le compteur : on recharge
+  if (!live.current) fetchClub();
 };
 
 const formatDate = (date: string) => {